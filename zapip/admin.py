@@ -4,7 +4,15 @@ from zapip.models import Application, ZoomMeeting
 
 
 class ApplicationAdmin(admin.ModelAdmin):
-    list_display = ("id", "external_id", "name", "created", "updated")
+    list_display = (
+        "id",
+        "external_id",
+        "name",
+        "max_concurrency",
+        "rate_limit",
+        "created",
+        "updated",
+    )
     search_fields = ("external_id", "name")
     readonly_fields = ("id", "created", "updated")
 
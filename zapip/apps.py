@@ -5,3 +5,7 @@ from django.utils.translation import gettext_lazy as _
 class ZapipAppConfig(AppConfig):
     name = "zapip"
     verbose_name = _("Zapip")
+
+    def ready(self):
+        # Connects signal receivers
+        from zapip import cache  # noqa: F401
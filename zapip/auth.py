@@ -1,9 +1,13 @@
+import asyncio
+import hmac
 import logging
 from functools import wraps
-from typing import Any, Callable, Dict, Optional
+from typing import Any, Callable, NamedTuple, Optional, Tuple
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.http import HttpResponse
 from django.http.request import HttpRequest
 
@@ -12,81 +16,189 @@ from zapip.utils import ZapipResponseForbidden, valid_uuid
 logger = logging.getLogger(__name__)
 
 
-def valid_header_authentication(request: HttpRequest) -> bool:
+class GatewayIdentity(NamedTuple):
     """
-    Validates that all headers defined in settings.HEADER_AUTH are present
-    and equal to the expected value.
+    The ids set by the API gateway on an accepted request.
     """
+
+    api: str
+    application: str
+    subscription: str
+
+
+class AuthConfig(NamedTuple):
+    # (header name, expected value) pairs, or None if header auth is disabled
+    header_auth: Optional[Tuple[Tuple[str, bytes], ...]]
+    # header names in the order of the GatewayIdentity fields
+    gateway_headers: Tuple[str, str, str]
+
+
+_auth_config: Optional[AuthConfig] = None
+
+
+def load_auth_config() -> AuthConfig:
     if not hasattr(settings, "HEADER_AUTH"):
         raise ImproperlyConfigured("HEADER_AUTH is not set")
-    if settings.HEADER_AUTH is None:
-        return True
-    for name, value in settings.HEADER_AUTH.items():
-        if request.headers.get(name) != value:
-            return False
-    return True
+    header_auth = None
+    if settings.HEADER_AUTH is not None:
+        header_auth = tuple(
+            (name, value.encode()) for name, value in settings.HEADER_AUTH.items()
+        )
+    return AuthConfig(
+        header_auth=header_auth,
+        gateway_headers=(
+            settings.GATEWAY_API_ID_HEADER,
+            settings.GATEWAY_APPLICATION_ID_HEADER,
+            settings.GATEWAY_SUBSCRIPTION_ID_HEADER,
+        ),
+    )
 
 
-def header_auth_required(view_func: Callable[[HttpRequest], HttpResponse]):
+def get_auth_config() -> AuthConfig:
+    """
+    Returns the header names and expected values, read from settings once.
+    """
+    global _auth_config
+    config = _auth_config
+    if config is None:
+        config = _auth_config = load_auth_config()
+    return config
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs: Any) -> None:
+    global _auth_config
+    if setting == "HEADER_AUTH" or setting.startswith("GATEWAY_"):
+        _auth_config = None
+
+
+def valid_header_authentication(request: HttpRequest) -> bool:
+    """
+    Validates that all headers defined in settings.HEADER_AUTH are present
+    and equal to the expected value.
+
+    Values are compared in constant time, and all headers are always checked.
+    """
+    header_auth = get_auth_config().header_auth
+    if header_auth is None:
+        return True
+    headers = request.headers
+    valid = True
+    for name, expected in header_auth:
+        value = headers.get(name)
+        if value is None:
+            valid = False
+        elif not hmac.compare_digest(value.encode(), expected):
+            valid = False
+    return valid
+
+
+def header_auth_required(view_func: Callable[..., Any]):
     """
     Wraps a view and denies requests where the headers don't validate.
+
+    Works for both sync and async views.
     """
 
-    @wraps(view_func)
-    def _wrapped_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
-        if valid_header_authentication(request):
-            return view_func(request, *args, **kwargs)
+    def _denied() -> HttpResponse:
         return ZapipResponseForbidden(
             data={
                 "error": "unauthenticated-proxy",
             }
         )
 
-    return _wrapped_view
+    if asyncio.iscoroutinefunction(view_func):
 
+        @wraps(view_func)
+        async def _wrapped_async_view(
+            request: HttpRequest, *args: Any, **kwargs: Any
+        ) -> HttpResponse:
+            if valid_header_authentication(request):
+                return await view_func(request, *args, **kwargs)
+            return _denied()
 
-def get_gateway_headers(request: HttpRequest) -> Dict[str, Optional[str]]:
-    wanted_headers = {
-        "api": settings.GATEWAY_API_ID_HEADER,
-        "application": settings.GATEWAY_APPLICATION_ID_HEADER,
-        "subscription": settings.GATEWAY_SUBSCRIPTION_ID_HEADER,
-    }
-    return {
-        name: request.headers.get(header) for name, header in wanted_headers.items()
-    }
+        return _wrapped_async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if valid_header_authentication(request):
+            return view_func(request, *args, **kwargs)
+        return _denied()
+
+    return _wrapped_view
 
 
-def valid_gateway_headers(headers: Dict[str, Optional[str]]) -> bool:
+def get_gateway_identity(request: HttpRequest) -> Optional[GatewayIdentity]:
     """
-    Validates that headers expected to be set by the API gateway are set.
+    Returns the ids set by the API gateway, or None unless all are valid UUIDs.
 
     The required headers are defined on the following settings:
       - GATEWAY_API_ID_HEADER
       - GATEWAY_APPLICATION_ID_HEADER
       - GATEWAY_SUBSCRIPTION_ID_HEADER
     """
-    return all(
-        [(isinstance(value, str) and valid_uuid(value)) for value in headers.values()]
+    api_header, application_header, subscription_header = (
+        get_auth_config().gateway_headers
     )
+    headers = request.headers
+    api = headers.get(api_header)
+    application = headers.get(application_header)
+    subscription = headers.get(subscription_header)
+    if (
+        api is None
+        or application is None
+        or subscription is None
+        or not valid_uuid(api)
+        or not valid_uuid(application)
+        or not valid_uuid(subscription)
+    ):
+        return None
+    return GatewayIdentity(api, application, subscription)
+
+
+def accept_gateway_headers(request: HttpRequest) -> bool:
+    """
+    Sets request.gateway_identity if the expected gateway headers are valid.
+    """
+    identity = get_gateway_identity(request)
+    if identity is not None:
+        logger.debug("Request accepted with gateway identity %r", identity)
+        request.gateway_identity = identity
+        return True
+    logger.info("Request denied with invalid gateway headers")
+    return False
 
 
-def gateway_headers_required(view_func: Callable[[HttpRequest], HttpResponse]):
+def gateway_headers_required(view_func: Callable[..., Any]):
     """
     Wraps a view and denies requests where expected gateway headers are missing.
+
+    Works for both sync and async views.
     """
 
-    @wraps(view_func)
-    def _wrapped_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
-        gateway_headers = get_gateway_headers(request)
-        if valid_gateway_headers(gateway_headers):
-            logger.info("Request accepted with gateway headers %r", gateway_headers)
-            request.gateway_headers = gateway_headers
-            return view_func(request, *args, **kwargs)
-        logger.info("Request denied with gateway headers %r", gateway_headers)
+    def _denied() -> HttpResponse:
         return ZapipResponseForbidden(
             data={
                 "error": "missing-headers",
             }
         )
 
+    if asyncio.iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def _wrapped_async_view(
+            request: HttpRequest, *args: Any, **kwargs: Any
+        ) -> HttpResponse:
+            if accept_gateway_headers(request):
+                return await view_func(request, *args, **kwargs)
+            return _denied()
+
+        return _wrapped_async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        if accept_gateway_headers(request):
+            return view_func(request, *args, **kwargs)
+        return _denied()
+
     return _wrapped_view
@@ -0,0 +1,375 @@
+"""
+Batched meeting operations, for clients scheduling many meetings at once.
+
+POST /zoom/v2/batch takes {"operations": [...]}, where each operation is one of
+
+    {"method": "create", "user_id": "...", "body": {...}}
+    {"method": "get", "meeting_id": 1234, "params": {...}}
+    {"method": "update", "meeting_id": 1234, "body": {...}}
+    {"method": "delete", "meeting_id": 1234, "params": {...}}
+
+and responds with {"results": [...]}, holding {"status", "source", "body"} for
+each operation in the same order. "source" is "zoom" for proxied responses and
+"zapip" for errors from the proxy, like the X-Zapip-Response-From header.
+
+Every upstream call takes a token from the rate quota of the application, the
+first one paid for by the batch request itself, so batching does not get
+around the quota. Calls over the quota are answered with 429. Ownership of
+all referenced meetings is checked with one query, upstream calls run
+concurrently with at most ZAPIP_BATCH_CONCURRENCY in flight, and
+all created meetings are saved with one bulk_create, or one journal append
+with ZAPIP_WRITE_BEHIND.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+import httpx
+from django.conf import settings
+from requests.models import Response
+
+from zapip import metrics, mirror, response_cache, retention
+from zapip.cache import (
+    aowned_meetings,
+    forget_meeting_owner,
+    owned_meetings,
+    remember_meeting_owner,
+)
+from zapip.journal import arecord_meetings, record_meetings
+from zapip.limits import ApplicationThrottled, get_limiter
+from zapip.models import Application, ZoomMeeting
+from zapip.zoom import (
+    AsyncZoomClient,
+    ZoomClient,
+    ZoomRateLimited,
+    ZoomUnavailable,
+    get_async_zoom_client,
+    get_zoom_client,
+)
+
+logger = logging.getLogger(__name__)
+
+METHODS = {"create", "get", "update", "delete"}
+
+Result = Dict[str, Any]
+
+
+class BatchError(ValueError):
+    """
+    The batch request is malformed.
+    """
+
+
+class Operation(NamedTuple):
+    method: str
+    user_id: Optional[str]
+    meeting_id: Optional[int]
+    body: Optional[bytes]
+    params: Dict[str, Any]
+
+
+def parse_operations(content: bytes) -> List[Operation]:
+    """
+    Parses and validates the operations of a batch request body.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        raise BatchError("request body is not valid JSON")
+    items = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise BatchError("operations must be a non-empty list")
+    if len(items) > settings.ZAPIP_BATCH_MAX_OPERATIONS:
+        raise BatchError(
+            "at most {} operations are allowed".format(
+                settings.ZAPIP_BATCH_MAX_OPERATIONS
+            )
+        )
+    return [_parse_operation(index, item) for index, item in enumerate(items)]
+
+
+def _parse_operation(index: int, item: Any) -> Operation:
+    if not isinstance(item, dict) or item.get("method") not in METHODS:
+        raise BatchError(
+            "operation {}: method must be one of {}".format(
+                index, ", ".join(sorted(METHODS))
+            )
+        )
+    method = item["method"]
+    user_id = item.get("user_id")
+    meeting_id = item.get("meeting_id")
+    if method == "create":
+        if not isinstance(user_id, str) or not user_id:
+            raise BatchError("operation {}: user_id is required".format(index))
+        meeting_id = None
+    else:
+        if not isinstance(meeting_id, int) or isinstance(meeting_id, bool):
+            raise BatchError("operation {}: meeting_id is required".format(index))
+        user_id = None
+    params = item.get("params", {})
+    if not isinstance(params, dict):
+        raise BatchError("operation {}: params must be an object".format(index))
+    body = None
+    if "body" in item and method in ("create", "update"):
+        body = json.dumps(item["body"]).encode()
+    return Operation(method, user_id, meeting_id, body, params)
+
+
+def _zapip_result(status: int, error: str, detail: str, **extra: Any) -> Result:
+    result = {
+        "status": status,
+        "source": "zapip",
+        "body": {"error": error, "detail": detail},
+    }
+    result.update(extra)
+    return result
+
+
+def _zoom_result(zoom_response: Union[Response, httpx.Response]) -> Result:
+    body: Any = None
+    if zoom_response.content:
+        try:
+            body = zoom_response.json()
+        except ValueError:
+            body = zoom_response.text
+    return {"status": zoom_response.status_code, "source": "zoom", "body": body}
+
+
+def _rejected(operation: Operation, owned: Set[int]) -> Optional[Result]:
+    if operation.user_id == "me":
+        return _zapip_result(
+            403, "forbidden-user-id", "user_id path argument cannot be 'me'"
+        )
+    if operation.meeting_id is not None and operation.meeting_id not in owned:
+        return _zapip_result(
+            403,
+            "unknown-meeting-id",
+            "meeting id is not known to the proxy or not associated with your application",
+        )
+    return None
+
+
+def _admitted(
+    application: Application, pending: List[int], results: List[Optional[Result]]
+) -> List[int]:
+    """
+    Takes a rate token for each pending call but the first, which the batch
+    request has paid for, and answers the calls over the quota with 429.
+    """
+    limiter = get_limiter()
+    admitted = pending[:1]
+    for index in pending[1:]:
+        try:
+            limiter.check_rate(application)
+        except ApplicationThrottled as exc:
+            metrics.application_throttled_total.inc(exc.reason)
+            results[index] = _zapip_result(
+                429,
+                "application-throttled",
+                "too many requests from your application, try again later",
+                retry_after=max(1, math.ceil(exc.retry_after)),
+            )
+        else:
+            admitted.append(index)
+    if len(admitted) < len(pending):
+        logger.info(
+            "Throttled %d of %d batch operations for application %s",
+            len(pending) - len(admitted),
+            len(pending),
+            application.external_id,
+        )
+    return admitted
+
+
+def _failed(exc: Exception) -> Result:
+    if isinstance(exc, ZoomRateLimited):
+        logger.info("Shedding batch operation: %s", exc)
+        return _zapip_result(
+            429,
+            "rate-limited",
+            "too many requests to zoom, try again later",
+            retry_after=math.ceil(exc.retry_after),
+        )
+    assert isinstance(exc, ZoomUnavailable)
+    logger.warning("Zoom unavailable: %s", exc)
+    extra = {}
+    if exc.retry_after is not None:
+        extra["retry_after"] = math.ceil(exc.retry_after)
+    return _zapip_result(
+        503, "zoom-unavailable", "zoom could not be reached, try again later", **extra
+    )
+
+
+def _call_kwargs(operation: Operation) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {
+        "headers": {"content-type": "application/json"},
+        "data": operation.body,
+        "params": operation.params,
+    }
+    if operation.method == "create":
+        kwargs["user_id"] = operation.user_id
+    else:
+        kwargs["meeting_id"] = operation.meeting_id
+    return kwargs
+
+
+def _call(zoom: ZoomClient, operation: Operation) -> Result:
+    handler = getattr(zoom, operation.method + "_meeting")
+    try:
+        zoom_response = handler(**_call_kwargs(operation))
+    except (ZoomRateLimited, ZoomUnavailable) as exc:
+        return _failed(exc)
+    return _zoom_result(zoom_response)
+
+
+async def _acall(
+    zoom: AsyncZoomClient, operation: Operation, semaphore: asyncio.Semaphore
+) -> Result:
+    handler = getattr(zoom, operation.method + "_meeting")
+    async with semaphore:
+        try:
+            zoom_response = await handler(**_call_kwargs(operation))
+        except (ZoomRateLimited, ZoomUnavailable) as exc:
+            return _failed(exc)
+    return _zoom_result(zoom_response)
+
+
+def _new_meetings(
+    application: Application,
+    operations: List[Operation],
+    results: List[Result],
+) -> List[ZoomMeeting]:
+    meetings = []
+    for operation, result in zip(operations, results):
+        if operation.method != "create" or result["status"] != 201:
+            continue
+        body = result["body"]
+        meeting_id = body.get("id") if isinstance(body, dict) else None
+        if not isinstance(meeting_id, int) or isinstance(meeting_id, bool):
+            logger.warning(
+                "Not saving meeting created for user_id=%r without an id: %r",
+                operation.user_id,
+                meeting_id,
+            )
+            continue
+        meetings.append(
+            ZoomMeeting(
+                user_id=operation.user_id,
+                meeting_id=meeting_id,
+                application=application,
+            )
+        )
+    return meetings
+
+
+def _changed_meetings(
+    operations: List[Operation], results: List[Result]
+) -> Tuple[List[int], List[int]]:
+    """
+    Returns the ids of meetings successfully updated or deleted, and of those
+    deleted.
+    """
+    changed, deleted = [], []
+    for operation, result in zip(operations, results):
+        if operation.method not in ("update", "delete"):
+            continue
+        if result["source"] == "zoom" and 200 <= result["status"] < 300:
+            changed.append(operation.meeting_id)
+            if operation.method == "delete" and result["status"] == 204:
+                deleted.append(operation.meeting_id)
+    return changed, deleted
+
+
+def run_batch(application: Application, operations: List[Operation]) -> List[Result]:
+    """
+    Runs the operations of a batch for an application, returning one result
+    per operation.
+    """
+    owned = owned_meetings(
+        application, {o.meeting_id for o in operations if o.meeting_id is not None}
+    )
+    results: List[Optional[Result]] = [_rejected(o, owned) for o in operations]
+    pending = [index for index, result in enumerate(results) if result is None]
+    pending = _admitted(application, pending, results)
+    zoom = get_zoom_client()
+    workers = min(settings.ZAPIP_BATCH_CONCURRENCY, len(pending))
+    if workers > 1:
+        # run the calls in copies of this context, so they count towards the
+        # upstream timings of the request
+        context = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            called = list(
+                executor.map(
+                    lambda index: context.copy().run(_call, zoom, operations[index]),
+                    pending,
+                )
+            )
+    else:
+        called = [_call(zoom, operations[index]) for index in pending]
+    for index, result in zip(pending, called):
+        results[index] = result
+    meetings = _new_meetings(application, operations, results)  # type: ignore
+    if meetings and settings.ZAPIP_WRITE_BEHIND:
+        record_meetings(meetings)
+    elif meetings:
+        ZoomMeeting.objects.bulk_create(meetings, ignore_conflicts=True)
+    changed, deleted = _changed_meetings(operations, results)  # type: ignore
+    for meeting_id in changed:
+        response_cache.invalidate_meeting(meeting_id)
+        if settings.ZAPIP_MEETING_MIRROR:
+            mirror.clear_meeting(meeting_id)
+    if deleted:
+        retention.mark_deleted(deleted)
+    return _remember(meetings, deleted, results)  # type: ignore
+
+
+async def arun_batch(
+    application: Application, operations: List[Operation]
+) -> List[Result]:
+    """
+    Async version of run_batch.
+    """
+    owned = await aowned_meetings(
+        application, {o.meeting_id for o in operations if o.meeting_id is not None}
+    )
+    results: List[Optional[Result]] = [_rejected(o, owned) for o in operations]
+    pending = [index for index, result in enumerate(results) if result is None]
+    pending = _admitted(application, pending, results)
+    zoom = get_async_zoom_client()
+    semaphore = asyncio.Semaphore(max(1, settings.ZAPIP_BATCH_CONCURRENCY))
+    called = await asyncio.gather(
+        *(_acall(zoom, operations[index], semaphore) for index in pending)
+    )
+    for index, result in zip(pending, called):
+        results[index] = result
+    meetings = _new_meetings(application, operations, results)  # type: ignore
+    if meetings and settings.ZAPIP_WRITE_BEHIND:
+        await arecord_meetings(meetings)
+    elif meetings:
+        await ZoomMeeting.objects.abulk_create(meetings, ignore_conflicts=True)
+    changed, deleted = _changed_meetings(operations, results)  # type: ignore
+    for meeting_id in changed:
+        await response_cache.ainvalidate_meeting(meeting_id)
+        if settings.ZAPIP_MEETING_MIRROR:
+            await mirror.aclear_meeting(meeting_id)
+    if deleted:
+        await retention.amark_deleted(deleted)
+    return _remember(meetings, deleted, results)  # type: ignore
+
+
+def _remember(
+    meetings: List[ZoomMeeting], deleted: List[int], results: List[Result]
+) -> List[Result]:
+    for meeting in meetings:
+        remember_meeting_owner(meeting)
+    for meeting_id in deleted:
+        forget_meeting_owner(meeting_id)
+    logger.info(
+        "Ran batch of %d operations, saved %d meetings", len(results), len(meetings)
+    )
+    return results
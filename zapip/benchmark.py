@@ -0,0 +1,400 @@
+"""
+Benchmarks for the proxy hot path.
+
+Drives the proxy views against FakeZoomServer, a local stand-in for Zoom with
+configurable latency and payload size, and times each layer of a proxied call
+separately. Results can be saved as a baseline and compared with later runs.
+Run through the benchmark management command.
+"""
+
+import itertools
+import json
+import logging
+import math
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.handlers.base import BaseHandler
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+from django.test import Client, RequestFactory
+from django.urls import path
+
+from zapip import cache
+from zapip.auth import accept_gateway_headers, valid_header_authentication
+from zapip.views import proxy_zoom_response
+from zapip.zoom import build_zoom_client
+
+logger = logging.getLogger(__name__)
+
+MEETING_PATH = re.compile(r"^/v2/meetings/(\d+)")
+USER_MEETINGS_PATH = re.compile(r"^/v2/users/([^/]+)/meetings")
+TOKEN_PATH = re.compile(r"^/oauth/token")
+
+BENCH_HEADER_AUTH = {"X-Zapip-Benchmark": "benchmark"}
+
+
+class FakeZoomServer:
+    """
+    A threaded HTTP server answering the meeting endpoints like Zoom would,
+    after sleeping for latency seconds, with a payload_size bytes agenda.
+    Also issues OAuth access tokens valid for token_lifetime seconds.
+    """
+
+    def __init__(
+        self, latency: float = 0.0, payload_size: int = 1024, token_lifetime: int = 3600
+    ):
+        self.latency = latency
+        self.payload_size = payload_size
+        self.token_lifetime = token_lifetime
+        self.tokens_issued = 0
+        self._ids = itertools.count(90000000000)
+        self._tokens_lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return "http://{}:{}/".format(host, port)
+
+    @property
+    def token_url(self) -> str:
+        return self.url + "oauth/token"
+
+    def __enter__(self) -> "FakeZoomServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def meeting(self, meeting_id: int) -> bytes:
+        return json.dumps(
+            {
+                "id": meeting_id,
+                "topic": "Benchmark",
+                "agenda": "x" * self.payload_size,
+            }
+        ).encode()
+
+    def token(self) -> bytes:
+        with self._tokens_lock:
+            self.tokens_issued += 1
+            value = "fake-token-{}".format(self.tokens_issued)
+        return json.dumps(
+            {
+                "access_token": value,
+                "token_type": "bearer",
+                "expires_in": self.token_lifetime,
+            }
+        ).encode()
+
+    def _handler_class(self) -> Callable[..., BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def _reply(self, status: int, body: bytes = b"") -> None:
+                length = int(self.headers.get("content-length") or 0)
+                if length:
+                    self.rfile.read(length)
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self) -> None:
+                if USER_MEETINGS_PATH.match(self.path):
+                    self._reply(201, server.meeting(next(server._ids)))
+                elif TOKEN_PATH.match(self.path):
+                    self._reply(200, server.token())
+                else:
+                    self._reply(404)
+
+            def do_GET(self) -> None:
+                match = MEETING_PATH.match(self.path)
+                if match:
+                    self._reply(200, server.meeting(int(match.group(1))))
+                else:
+                    self._reply(404)
+
+            def do_PATCH(self) -> None:
+                self._reply(204 if MEETING_PATH.match(self.path) else 404)
+
+            def do_DELETE(self) -> None:
+                self._reply(204 if MEETING_PATH.match(self.path) else 404)
+
+        return Handler
+
+
+def meta_key(header: str) -> str:
+    """
+    The request.META key of an HTTP header.
+    """
+    return "HTTP_" + header.upper().replace("-", "_")
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of sorted samples.
+    """
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, math.ceil(pct / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+def summarize(samples: List[float], elapsed: float) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "throughput": len(samples) / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+    }
+
+
+def _noop_view(request: HttpRequest, **kwargs: Any) -> HttpResponse:
+    return HttpResponse()
+
+
+# Used as request.urlconf, so that LeanRouteMiddleware resolves the noop view
+urlpatterns = [path("zoom/v2/meetings/<int:meeting_id>", _noop_view)]
+
+
+class _NoopViewHandler(BaseHandler):
+    """
+    The configured middleware stack around a view which does nothing.
+    """
+
+    def _get_response(self, request: HttpRequest) -> HttpResponse:
+        return _noop_view(request)
+
+
+class Benchmark:
+    """
+    Times each layer of a proxied call, iterations times per layer after
+    warmup untimed calls.
+
+    Layers are run in threads when concurrency is above 1. The full-stack
+    layers then need a database which allows concurrent connections.
+    """
+
+    LAYERS = [
+        "middleware",
+        "header_auth",
+        "gateway_headers",
+        "orm",
+        "orm_cached",
+        "proxy_response",
+        "upstream",
+        "create_meeting",
+        "get_meeting",
+    ]
+
+    def __init__(
+        self,
+        server: FakeZoomServer,
+        iterations: int = 200,
+        concurrency: int = 1,
+        layers: Optional[List[str]] = None,
+        warmup: int = 20,
+    ):
+        self.server = server
+        self.iterations = iterations
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.layers = layers or self.LAYERS
+        self.factory = RequestFactory()
+        self.user_id = "benchmark@example.com"
+        self.application_id = str(uuid.uuid4())
+        self.meta = {meta_key(name): value for name, value in BENCH_HEADER_AUTH.items()}
+        self.meta.update(
+            {
+                meta_key(settings.GATEWAY_API_ID_HEADER): str(uuid.uuid4()),
+                meta_key(settings.GATEWAY_APPLICATION_ID_HEADER): self.application_id,
+                meta_key(settings.GATEWAY_SUBSCRIPTION_ID_HEADER): str(uuid.uuid4()),
+            }
+        )
+
+    def run(self) -> Dict[str, Dict[str, float]]:
+        results = {}
+        for layer in self.layers:
+            operation = getattr(self, "_prepare_" + layer)()
+            results[layer] = self._time(operation)
+        return results
+
+    def _time(self, operation: Callable[[], Any]) -> Dict[str, float]:
+        def timed(_: int) -> float:
+            start = time.perf_counter()
+            operation()
+            return time.perf_counter() - start
+
+        for _ in range(self.warmup):
+            operation()
+        start = time.perf_counter()
+        if self.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                samples = list(executor.map(timed, range(self.iterations)))
+        else:
+            samples = [timed(i) for i in range(self.iterations)]
+        return summarize(samples, time.perf_counter() - start)
+
+    def _request(self) -> HttpRequest:
+        return self.factory.get("/zoom/v2/meetings/1", **self.meta)
+
+    def _create_meeting(self, client: Client) -> int:
+        response = client.post(
+            "/zoom/v2/users/{}/meetings".format(self.user_id),
+            data=json.dumps({"topic": "Benchmark"}),
+            content_type="application/json",
+            **self.meta
+        )
+        if response.status_code != 201:
+            raise RuntimeError(
+                "Creating a meeting failed with {}".format(response.status_code)
+            )
+        if response.streaming:
+            return json.loads(b"".join(response.streaming_content))["id"]
+        return response.json()["id"]
+
+    def _prepare_middleware(self) -> Callable[[], Any]:
+        handler = _NoopViewHandler()
+        handler.load_middleware()
+
+        def operation() -> HttpResponse:
+            request = self._request()
+            request.urlconf = __name__
+            return handler.get_response(request)
+
+        return operation
+
+    def _prepare_header_auth(self) -> Callable[[], Any]:
+        request = self._request()
+        return lambda: valid_header_authentication(request)
+
+    def _prepare_gateway_headers(self) -> Callable[[], Any]:
+        request = self._request()
+        return lambda: accept_gateway_headers(request)
+
+    def _prepare_orm(self) -> Callable[[], Any]:
+        meeting_id = self._create_meeting(Client())
+        external_id = self.application_id
+
+        def operation() -> None:
+            cache.reset_caches()
+            application = cache.get_application(external_id)
+            cache.is_meeting_owner(application, meeting_id)
+
+        return operation
+
+    def _prepare_orm_cached(self) -> Callable[[], Any]:
+        meeting_id = self._create_meeting(Client())
+        external_id = self.application_id
+
+        def operation() -> None:
+            application = cache.get_application(external_id)
+            cache.is_meeting_owner(application, meeting_id)
+
+        return operation
+
+    def _prepare_proxy_response(self) -> Callable[[], Any]:
+        zoom_response = build_zoom_client().get_meeting(meeting_id=1, data=b"")
+        zoom_response.content  # read the body up front
+        return lambda: proxy_zoom_response(zoom_response)
+
+    def _prepare_upstream(self) -> Callable[[], Any]:
+        client = build_zoom_client()
+        return lambda: client.get_meeting(meeting_id=1, data=b"").content
+
+    def _prepare_create_meeting(self) -> Callable[[], Any]:
+        local = threading.local()
+
+        def operation() -> None:
+            if not hasattr(local, "client"):
+                local.client = Client()
+            self._create_meeting(local.client)
+
+        return operation
+
+    def _prepare_get_meeting(self) -> Callable[[], Any]:
+        meeting_id = self._create_meeting(Client())
+        path = "/zoom/v2/meetings/{}".format(meeting_id)
+        local = threading.local()
+
+        def operation() -> None:
+            if not hasattr(local, "client"):
+                local.client = Client()
+            response = local.client.get(path, **self.meta)
+            if response.status_code != 200:
+                raise RuntimeError(
+                    "Reading a meeting failed with {}".format(response.status_code)
+                )
+            if response.streaming:
+                b"".join(response.streaming_content)
+
+        return operation
+
+
+def benchmark_settings(server: FakeZoomServer) -> Dict[str, Any]:
+    """
+    Settings to run the benchmark with: Zoom is the fake server, header
+    authentication is enabled and Zapip does not limit the call rate.
+    """
+    return {
+        "ZOOM_API_BASE_URL": server.url,
+        "HEADER_AUTH": BENCH_HEADER_AUTH,
+        "ZOOM_API_RATE_LIMITS": {},
+        "ALLOWED_HOSTS": list(settings.ALLOWED_HOSTS) + ["testserver"],
+    }
+
+
+def compare(
+    baseline: Dict[str, Dict[str, float]],
+    results: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[Dict[str, Any]]:
+    """
+    Compares latency percentiles of results with a baseline.
+
+    Returns a row per layer and percentile present in both, with the relative
+    change, flagged as a regression if it is slower by more than threshold
+    (a fraction, 0.1 is 10%).
+    """
+    rows = []
+    for layer, stats in results.items():
+        if layer not in baseline:
+            continue
+        for key in ("p50", "p95", "p99"):
+            before = baseline[layer].get(key, 0.0)
+            after = stats[key]
+            change = (after - before) / before if before else 0.0
+            rows.append(
+                {
+                    "layer": layer,
+                    "percentile": key,
+                    "baseline": before,
+                    "current": after,
+                    "change": change,
+                    "regression": change > threshold,
+                }
+            )
+    return rows
@@ -0,0 +1,317 @@
+"""
+In-process caches for rows the proxy looks up on every request.
+
+Caches are per process. Invalidation through model signals only reaches the
+process where the change happened, so other processes may serve stale entries
+until they expire.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+)
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from zapip.journal import ajournalled_owners, journalled_owners
+from zapip.models import Application, ZoomMeeting
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    """
+    A thread-safe, size-bounded LRU cache where entries expire after ttl seconds.
+
+    A maxsize of 0 disables the cache. Every invalidation bumps a generation
+    counter; passing the generation read before loading a value to set() keeps
+    a slow loader from caching a value that was invalidated meanwhile.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V, generation: Optional[int] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (self.clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+
+_caches: Dict[str, LRUCache[Any]] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str) -> LRUCache[Any]:
+    """
+    Returns the named process-wide cache, sized by the ZAPIP_<NAME>_CACHE_SIZE
+    and ZAPIP_<NAME>_CACHE_TTL settings.
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                prefix = "ZAPIP_{}_CACHE".format(name.upper())
+                cache = LRUCache(
+                    maxsize=getattr(settings, prefix + "_SIZE"),
+                    ttl=getattr(settings, prefix + "_TTL"),
+                )
+                _caches[name] = cache
+    return cache
+
+
+def cache_stats() -> List[Tuple[str, Dict[str, int]]]:
+    """
+    Returns hits, misses and size of each process-wide cache.
+    """
+    with _caches_lock:
+        caches = list(_caches.items())
+    return [
+        (name, {"hits": cache.hits, "misses": cache.misses, "size": len(cache)})
+        for name, cache in caches
+    ]
+
+
+def reset_caches() -> None:
+    """
+    Drops all process-wide caches.
+    """
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.clear()
+        _caches.clear()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs: Any) -> None:
+    if setting.startswith("ZAPIP_") and setting.endswith(("_CACHE_SIZE", "_CACHE_TTL")):
+        reset_caches()
+
+
+def get_application(external_id: str) -> Application:
+    """
+    Returns the Application with the given external id, creating it if needed.
+    """
+    cache = get_cache("application")
+    application = cache.get(external_id)
+    if application is None:
+        generation = cache.generation
+        application, _ = Application.objects.get_or_create(external_id=external_id)
+        cache.set(external_id, application, generation=generation)
+    return application
+
+
+async def aget_application(external_id: str) -> Application:
+    """
+    Async version of get_application.
+    """
+    cache = get_cache("application")
+    application = cache.get(external_id)
+    if application is None:
+        generation = cache.generation
+        application, _ = await Application.objects.aget_or_create(
+            external_id=external_id
+        )
+        cache.set(external_id, application, generation=generation)
+    return application
+
+
+@receiver(post_save, sender=Application)
+@receiver(post_delete, sender=Application)
+def _invalidate_application(
+    instance: Application, created: bool = False, **kwargs: Any
+) -> None:
+    # A new row cannot be cached yet. For changes, external_id may have been
+    # edited, so the old key is unknown.
+    if not created:
+        get_cache("application").clear()
+
+
+def is_meeting_owner(application: Application, meeting_id: int) -> bool:
+    """
+    Checks whether a meeting is associated with an application.
+
+    Only ownership is cached, so a meeting created by another process is
+    found in the database right away. Meetings still in the write-behind
+    journal are found there. Meetings marked as deleted have no owner.
+    """
+    cache = get_cache("meeting_owner")
+    if cache.get(meeting_id) == application.pk:
+        return True
+    generation = cache.generation
+    row = (
+        ZoomMeeting.objects.filter(application=application, meeting_id=meeting_id)
+        .values_list("deleted_at")
+        .first()
+    )
+    if row is not None:
+        owned = row[0] is None
+    else:
+        owned = journalled_owners([meeting_id]).get(meeting_id) == application.pk
+    if owned:
+        cache.set(meeting_id, application.pk, generation=generation)
+    return owned
+
+
+async def ais_meeting_owner(application: Application, meeting_id: int) -> bool:
+    """
+    Async version of is_meeting_owner.
+    """
+    cache = get_cache("meeting_owner")
+    if cache.get(meeting_id) == application.pk:
+        return True
+    generation = cache.generation
+    row = (
+        await ZoomMeeting.objects.filter(application=application, meeting_id=meeting_id)
+        .values_list("deleted_at")
+        .afirst()
+    )
+    if row is not None:
+        owned = row[0] is None
+    else:
+        owners = await ajournalled_owners([meeting_id])
+        owned = owners.get(meeting_id) == application.pk
+    if owned:
+        cache.set(meeting_id, application.pk, generation=generation)
+    return owned
+
+
+def owned_meetings(application: Application, meeting_ids: Iterable[int]) -> Set[int]:
+    """
+    Returns the given meeting ids which are associated with an application,
+    with at most one query for those not in the cache.
+    """
+    cache = get_cache("meeting_owner")
+    owned = set()
+    unknown = []
+    for meeting_id in meeting_ids:
+        if cache.get(meeting_id) == application.pk:
+            owned.add(meeting_id)
+        else:
+            unknown.append(meeting_id)
+    if unknown:
+        generation = cache.generation
+        found = set()
+        for meeting_id, deleted_at in ZoomMeeting.objects.filter(
+            application=application, meeting_id__in=unknown
+        ).values_list("meeting_id", "deleted_at"):
+            found.add(meeting_id)
+            if deleted_at is None:
+                cache.set(meeting_id, application.pk, generation=generation)
+                owned.add(meeting_id)
+        for meeting_id, owner in journalled_owners(set(unknown) - found).items():
+            if owner == application.pk:
+                owned.add(meeting_id)
+    return owned
+
+
+async def aowned_meetings(
+    application: Application, meeting_ids: Iterable[int]
+) -> Set[int]:
+    """
+    Async version of owned_meetings.
+    """
+    cache = get_cache("meeting_owner")
+    owned = set()
+    unknown = []
+    for meeting_id in meeting_ids:
+        if cache.get(meeting_id) == application.pk:
+            owned.add(meeting_id)
+        else:
+            unknown.append(meeting_id)
+    if unknown:
+        generation = cache.generation
+        found = set()
+        async for meeting_id, deleted_at in ZoomMeeting.objects.filter(
+            application=application, meeting_id__in=unknown
+        ).values_list("meeting_id", "deleted_at"):
+            found.add(meeting_id)
+            if deleted_at is None:
+                cache.set(meeting_id, application.pk, generation=generation)
+                owned.add(meeting_id)
+        journalled = await ajournalled_owners(set(unknown) - found)
+        for meeting_id, owner in journalled.items():
+            if owner == application.pk:
+                owned.add(meeting_id)
+    return owned
+
+
+def remember_meeting_owner(meeting: ZoomMeeting) -> None:
+    get_cache("meeting_owner").set(meeting.meeting_id, meeting.application_id)
+
+
+def forget_meeting_owner(meeting_id: int) -> None:
+    get_cache("meeting_owner").delete(meeting_id)
+
+
+@receiver(post_save, sender=ZoomMeeting)
+@receiver(post_delete, sender=ZoomMeeting)
+def _invalidate_meeting_owner(
+    instance: ZoomMeeting, created: bool = False, **kwargs: Any
+) -> None:
+    if not created:
+        forget_meeting_owner(instance.meeting_id)
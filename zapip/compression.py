@@ -0,0 +1,140 @@
+"""
+Negotiation of response compression between clients, the proxy and Zoom.
+
+The encodings a client accepts are forwarded to Zoom, limited to those the
+proxy can decode. Streamed responses in an encoding the client accepts are
+relayed as the compressed bytes Zoom sent, without decoding them. Responses
+read into memory are compressed once, with brotli or gzip as the client
+prefers, when ZAPIP_COMPRESS_RESPONSES is enabled and they are at least
+ZAPIP_COMPRESS_MIN_SIZE bytes.
+
+Brotli needs the optional brotli package, without it only gzip is offered.
+"""
+
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# encodings requests and httpx decode, in our order of preference
+DECODABLE_ENCODINGS: List[str] = (["br"] if brotli is not None else []) + [
+    "gzip",
+    "deflate",
+]
+# encodings we compress with, in our order of preference
+RESPONSE_ENCODINGS: List[str] = (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """
+    Returns the quality of each coding in an Accept-Encoding header.
+    """
+    qualities = {}
+    for item in value.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def _quality(qualities: Dict[str, float], encoding: str) -> float:
+    if encoding in qualities:
+        return qualities[encoding]
+    return qualities.get("*", 0.0)
+
+
+def accepts(accept_encoding: Optional[str], encoding: str) -> bool:
+    """
+    Whether a client sending accept_encoding accepts a body in encoding.
+    """
+    if accept_encoding is None:
+        return False
+    return _quality(parse_accept_encoding(accept_encoding), encoding.lower()) > 0
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Returns the encoding to compress a response with, or None.
+    """
+    if accept_encoding is None:
+        return None
+    qualities = parse_accept_encoding(accept_encoding)
+    best, best_quality = None, 0.0
+    for encoding in RESPONSE_ENCODINGS:
+        quality = _quality(qualities, encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def upstream_accept_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Returns the Accept-Encoding to send to Zoom for a client's, or None to
+    leave it to the HTTP client.
+    """
+    if accept_encoding is None:
+        return None
+    qualities = parse_accept_encoding(accept_encoding)
+    encodings = [e for e in DECODABLE_ENCODINGS if _quality(qualities, e) > 0]
+    return ", ".join(encodings) or "identity"
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(content, quality=settings.ZAPIP_COMPRESS_BROTLI_QUALITY)
+    assert encoding == "gzip"
+    return gzip.compress(content, compresslevel=settings.ZAPIP_COMPRESS_GZIP_LEVEL)
+
+
+def encode(
+    content: bytes, accept_encoding: Optional[str]
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Compresses a response body for a client, returning the body and its
+    encoding, or the body as is and None.
+    """
+    if (
+        not settings.ZAPIP_COMPRESS_RESPONSES
+        or len(content) < settings.ZAPIP_COMPRESS_MIN_SIZE
+    ):
+        return content, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return content, None
+    return compress(content, encoding), encoding
+
+
+def compress_response(response: HttpResponse, accept_encoding: Optional[str]) -> None:
+    """
+    Compresses a response built by the proxy itself, like a cached or
+    mirrored meeting, and sets Content-Encoding and Vary as on proxied
+    responses. A strong ETag is made weak, since it names the plain body.
+    """
+    if accept_encoding is None or not settings.ZAPIP_COMPRESS_RESPONSES:
+        return
+    patch_vary_headers(response, ["Accept-Encoding"])
+    content, encoding = encode(response.content, accept_encoding)
+    if encoding is None:
+        return
+    response.content = content
+    response["Content-Encoding"] = encoding
+    response["Content-Length"] = str(len(content))
+    etag = response.get("ETag")
+    if etag is not None and not etag.startswith("W/"):
+        response["ETag"] = "W/" + etag
@@ -0,0 +1,288 @@
+"""
+Write-behind journal for ZoomMeeting rows.
+
+With ZAPIP_WRITE_BEHIND enabled, the create views append new meetings to a
+local SQLite journal in WAL mode, instead of inserting them into the database
+while the client waits. A background thread in each process, or the
+flush_meeting_journal management command, moves journal entries into the
+database in batches.
+
+Until an entry is flushed, ownership checks find it in the in-process owner
+cache, or failing that in the journal. Processes on other hosts do not see
+the journal, so they only find a meeting once it has been flushed.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, close_old_connections, transaction
+from django.dispatch import receiver
+
+from zapip.models import ZoomMeeting
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meeting (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    application_id INTEGER NOT NULL,
+    user_id TEXT NOT NULL,
+    meeting_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS meeting_meeting_id ON meeting (meeting_id);
+"""
+
+_journal: Optional["MeetingJournal"] = None
+_journal_lock = threading.Lock()
+
+
+class MeetingJournal:
+    """
+    A durable, multi-process queue of ZoomMeeting rows waiting to be inserted.
+
+    Every thread uses its own SQLite connection. Appends are committed with
+    synchronous=FULL, so an acknowledged meeting survives a crash.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._flush_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=FULL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def append(self, meetings: Iterable[ZoomMeeting]) -> None:
+        rows = [(m.application_id, m.user_id, m.meeting_id) for m in meetings]
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO meeting (application_id, user_id, meeting_id) "
+                "VALUES (?, ?, ?)",
+                rows,
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def owners(self, meeting_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Returns the application id of journalled meetings, by meeting id.
+        """
+        meeting_ids = list(meeting_ids)
+        if not meeting_ids:
+            return {}
+        rows = self._connection().execute(
+            "SELECT meeting_id, application_id FROM meeting "
+            "WHERE meeting_id IN ({}) ORDER BY id".format(
+                ", ".join("?" * len(meeting_ids))
+            ),
+            meeting_ids,
+        )
+        return dict(rows.fetchall())
+
+    def discard(self, meeting_ids: Iterable[int]) -> None:
+        """
+        Removes journalled meetings, so they are never inserted.
+        """
+        meeting_ids = list(meeting_ids)
+        if not meeting_ids:
+            return
+        self._connection().execute(
+            "DELETE FROM meeting WHERE meeting_id IN ({})".format(
+                ", ".join("?" * len(meeting_ids))
+            ),
+            meeting_ids,
+        )
+
+    def pending(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM meeting").fetchone()[0]
+
+    def flush(self, batch_size: int) -> int:
+        """
+        Inserts journalled meetings into the database, batch_size rows per
+        statement, and returns the number of entries flushed.
+
+        Entries are removed from the journal after they are inserted, so a
+        crash in between, or a concurrent flush from another process, at
+        worst inserts a row twice, which is ignored. Entries which cannot be
+        inserted at all are logged and dropped.
+        """
+        flushed = 0
+        with self._flush_lock:
+            connection = self._connection()
+            while True:
+                rows = connection.execute(
+                    "SELECT id, application_id, user_id, meeting_id FROM meeting "
+                    "ORDER BY id LIMIT ?",
+                    (batch_size,),
+                ).fetchall()
+                if not rows:
+                    break
+                meetings = [
+                    ZoomMeeting(
+                        application_id=application_id,
+                        user_id=user_id,
+                        meeting_id=meeting_id,
+                    )
+                    for _, application_id, user_id, meeting_id in rows
+                ]
+                try:
+                    with transaction.atomic():
+                        ZoomMeeting.objects.bulk_create(meetings, ignore_conflicts=True)
+                except IntegrityError:
+                    self._insert_one_by_one(meetings)
+                connection.execute("DELETE FROM meeting WHERE id <= ?", (rows[-1][0],))
+                flushed += len(rows)
+        if flushed:
+            logger.info("Flushed %d meetings from the journal", flushed)
+        return flushed
+
+    def _insert_one_by_one(self, meetings: List[ZoomMeeting]) -> None:
+        """
+        Inserts the meetings of a batch which failed one at a time, dropping
+        those which still fail, like meetings of a deleted application, so
+        they do not hold up the rest of the journal.
+        """
+        for meeting in meetings:
+            try:
+                with transaction.atomic():
+                    ZoomMeeting.objects.bulk_create([meeting], ignore_conflicts=True)
+            except IntegrityError as exc:
+                logger.warning(
+                    "Dropping journalled meeting_id=%r of application_id=%r "
+                    "for user_id=%r: %s",
+                    meeting.meeting_id,
+                    meeting.application_id,
+                    meeting.user_id,
+                    exc,
+                )
+
+
+class JournalFlusher(threading.Thread):
+    """
+    Flushes a journal every interval seconds until stopped.
+    """
+
+    def __init__(self, journal: MeetingJournal, interval: float, batch_size: int):
+        super().__init__(name="zapip-journal-flusher", daemon=True)
+        self.journal = journal
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.journal.flush(self.batch_size)
+            except Exception:
+                logger.exception("Flushing the meeting journal failed")
+            finally:
+                close_old_connections()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+_flusher: Optional[JournalFlusher] = None
+
+
+def get_journal() -> MeetingJournal:
+    """
+    Returns the journal of this process, starting its flusher if configured.
+    """
+    global _journal, _flusher
+    with _journal_lock:
+        if _journal is None:
+            _journal = MeetingJournal(settings.ZAPIP_WRITE_BEHIND_JOURNAL)
+        interval = settings.ZAPIP_WRITE_BEHIND_INTERVAL
+        if interval > 0 and (_flusher is None or not _flusher.is_alive()):
+            _flusher = JournalFlusher(
+                _journal, interval, settings.ZAPIP_WRITE_BEHIND_BATCH_SIZE
+            )
+            _flusher.start()
+        return _journal
+
+
+def reset_journal() -> None:
+    """
+    Stops the flusher and forgets the journal, so it is reopened from settings.
+    """
+    global _journal, _flusher
+    with _journal_lock:
+        if _flusher is not None:
+            _flusher.stop()
+        _journal = None
+        _flusher = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs) -> None:
+    if setting.startswith("ZAPIP_WRITE_BEHIND"):
+        reset_journal()
+
+
+def record_meetings(meetings: List[ZoomMeeting]) -> None:
+    """
+    Journals new, unsaved meetings, to be inserted by a later flush.
+    """
+    get_journal().append(meetings)
+
+
+async def arecord_meetings(meetings: List[ZoomMeeting]) -> None:
+    """
+    Async version of record_meetings, which appends from a worker thread.
+    """
+    await sync_to_async(record_meetings, thread_sensitive=False)(meetings)
+
+
+def discard_meetings(meeting_ids: Iterable[int]) -> None:
+    """
+    Removes not yet flushed meetings, if write-behind is enabled.
+    """
+    if settings.ZAPIP_WRITE_BEHIND:
+        get_journal().discard(meeting_ids)
+
+
+async def adiscard_meetings(meeting_ids: Iterable[int]) -> None:
+    """
+    Async version of discard_meetings, which deletes from a worker thread.
+    """
+    if settings.ZAPIP_WRITE_BEHIND:
+        await sync_to_async(discard_meetings, thread_sensitive=False)(list(meeting_ids))
+
+
+def journalled_owners(meeting_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Returns the owners of not yet flushed meetings, if write-behind is enabled.
+    """
+    if not settings.ZAPIP_WRITE_BEHIND:
+        return {}
+    return get_journal().owners(meeting_ids)
+
+
+async def ajournalled_owners(meeting_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Async version of journalled_owners, which reads from a worker thread.
+    """
+    if not settings.ZAPIP_WRITE_BEHIND:
+        return {}
+    return await sync_to_async(journalled_owners, thread_sensitive=False)(
+        list(meeting_ids)
+    )
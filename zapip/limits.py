@@ -0,0 +1,308 @@
+"""
+Per-application limits on the proxy views, so one application bursting
+requests cannot take every worker from the others.
+
+Each application has at most max_concurrency requests in progress in a
+process. Further requests wait in a first-come, first-served queue of at most
+ZAPIP_APPLICATION_QUEUE_SIZE, for at most ZAPIP_APPLICATION_QUEUE_TIMEOUT
+seconds, and are turned away with 429 and Retry-After beyond that. A rate
+quota of rate_limit requests per second, with bursts of rate_burst, is
+enforced with a token bucket, answering 429 right away when exceeded.
+
+Limits are read from the Application row, where empty fields fall back to
+the ZAPIP_APPLICATION_* settings, and None there means unlimited. Like the
+other in-process state, limits apply per worker process.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+from asyncio import AbstractEventLoop
+from collections import deque
+from functools import wraps
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+
+from zapip import metrics
+from zapip.cache import aget_application, get_application
+from zapip.models import Application
+from zapip.utils import ZapipResponseTooManyRequests
+from zapip.zoom import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class ApplicationThrottled(Exception):
+    """
+    Raised when a request exceeds the limits of its application.
+    """
+
+    def __init__(self, application: str, reason: str, retry_after: float):
+        super().__init__(
+            "Application {} over its {} limit, retry after {:.2f}s".format(
+                application, reason, retry_after
+            )
+        )
+        self.application = application
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """
+    A request queued for a slot, woken by the request releasing it.
+    """
+
+    def __init__(self, loop: Optional[AbstractEventLoop] = None):
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def grant(self) -> bool:
+        if self.loop is None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            # the loop is closed, nobody is waiting anymore
+            return False
+        return True
+
+    def _resolve(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ApplicationSlots:
+    """
+    Admits at most max_concurrency requests at a time, queueing up to
+    queue_size more in arrival order.
+
+    A released slot is handed to the first waiter directly, so requests that
+    arrive later cannot overtake the queue.
+    """
+
+    def __init__(self, max_concurrency: int, queue_size: int):
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.in_flight = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def _admit_or_queue(self, waiter: _Waiter) -> Optional[bool]:
+        """
+        Takes a slot and returns True, queues the waiter and returns None, or
+        returns False if the queue is full.
+        """
+        with self._lock:
+            if self.in_flight < self.max_concurrency and not self._waiters:
+                self.in_flight += 1
+                return True
+            if len(self._waiters) >= self.queue_size:
+                return False
+            self._waiters.append(waiter)
+            return None
+
+    def _give_up(self, waiter: _Waiter) -> bool:
+        """
+        Removes a waiter which timed out, and returns whether it was granted a
+        slot meanwhile, in which case the caller holds it.
+        """
+        with self._lock:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                return True
+            return False
+
+    def acquire(self, timeout: float) -> bool:
+        waiter = _Waiter()
+        admitted = self._admit_or_queue(waiter)
+        if admitted is not None:
+            return admitted
+        if waiter.event.wait(timeout):
+            return True
+        return self._give_up(waiter)
+
+    async def aacquire(self, timeout: float) -> bool:
+        waiter = _Waiter(asyncio.get_running_loop())
+        admitted = self._admit_or_queue(waiter)
+        if admitted is not None:
+            return admitted
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            return self._give_up(waiter)
+        except asyncio.CancelledError:
+            if self._give_up(waiter):
+                self.release()
+            raise
+        return True
+
+    def release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft().grant():
+                    return
+            self.in_flight -= 1
+
+
+class ApplicationLimiter:
+    """
+    Holds the slots and token buckets of every application seen by this
+    process, following changes to their limits.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slots: Dict[str, ApplicationSlots] = {}
+        self._buckets: Dict[str, Tuple[Tuple[float, float], TokenBucket]] = {}
+
+    def _rate_limit(self, application: Application) -> Optional[Tuple[float, float]]:
+        rate = application.rate_limit
+        if rate is None:
+            rate = settings.ZAPIP_APPLICATION_RATE_LIMIT
+        if rate is None or rate <= 0:
+            return None
+        burst = application.rate_burst
+        if burst is None:
+            burst = settings.ZAPIP_APPLICATION_RATE_BURST
+        return rate, float(max(1, burst or math.ceil(rate)))
+
+    def check_rate(self, application: Application) -> None:
+        """
+        Takes a token from the rate quota of the application, or raises
+        ApplicationThrottled.
+        """
+        limit = self._rate_limit(application)
+        if limit is None:
+            return
+        key = application.external_id
+        with self._lock:
+            entry = self._buckets.get(key)
+            if entry is None or entry[0] != limit:
+                entry = self._buckets[key] = (
+                    limit,
+                    TokenBucket(rate=limit[0], capacity=limit[1]),
+                )
+        bucket = entry[1]
+        if bucket.reserve(0.0) is None:
+            raise ApplicationThrottled(key, "rate", bucket.wait_time())
+
+    def slots(self, application: Application) -> Optional[ApplicationSlots]:
+        """
+        Returns the slots of the application, or None if its concurrency is
+        unlimited.
+        """
+        max_concurrency = application.max_concurrency
+        if max_concurrency is None:
+            max_concurrency = settings.ZAPIP_APPLICATION_MAX_CONCURRENCY
+        if max_concurrency is None:
+            return None
+        key = application.external_id
+        with self._lock:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = self._slots[key] = ApplicationSlots(
+                    max_concurrency, settings.ZAPIP_APPLICATION_QUEUE_SIZE
+                )
+            slots.max_concurrency = max_concurrency
+            return slots
+
+
+_limiter = ApplicationLimiter()
+
+
+def get_limiter() -> ApplicationLimiter:
+    return _limiter
+
+
+def reset_limiter() -> None:
+    global _limiter
+    _limiter = ApplicationLimiter()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs: Any) -> None:
+    if setting.startswith("ZAPIP_APPLICATION_"):
+        reset_limiter()
+
+
+def throttled_response(exc: ApplicationThrottled) -> ZapipResponseTooManyRequests:
+    logger.info("Throttling request: %s", exc)
+    metrics.application_throttled_total.inc(exc.reason)
+    response = ZapipResponseTooManyRequests(
+        data={
+            "error": "application-throttled",
+            "detail": "too many requests from your application, try again later",
+        }
+    )
+    response["Retry-After"] = str(max(1, math.ceil(exc.retry_after)))
+    return response
+
+
+def application_limits(view_func: Callable[..., Any]):
+    """
+    Wraps a view and applies the limits of the requesting application.
+
+    Must be applied after gateway_headers_required, which identifies the
+    application. Works for both sync and async views.
+    """
+    if asyncio.iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def _wrapped_async_view(
+            request: HttpRequest, *args: Any, **kwargs: Any
+        ) -> HttpResponse:
+            limiter = get_limiter()
+            application = await aget_application(request.gateway_identity.application)
+            timeout = settings.ZAPIP_APPLICATION_QUEUE_TIMEOUT
+            try:
+                limiter.check_rate(application)
+                slots = limiter.slots(application)
+                if slots is not None and not await slots.aacquire(timeout):
+                    raise ApplicationThrottled(
+                        application.external_id, "concurrency", timeout
+                    )
+            except ApplicationThrottled as exc:
+                return throttled_response(exc)
+            if slots is None:
+                return await view_func(request, *args, **kwargs)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                slots.release()
+
+        return _wrapped_async_view
+
+    @wraps(view_func)
+    def _wrapped_view(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
+        limiter = get_limiter()
+        application = get_application(request.gateway_identity.application)
+        timeout = settings.ZAPIP_APPLICATION_QUEUE_TIMEOUT
+        try:
+            limiter.check_rate(application)
+            slots = limiter.slots(application)
+            if slots is not None and not slots.acquire(timeout):
+                raise ApplicationThrottled(
+                    application.external_id, "concurrency", timeout
+                )
+        except ApplicationThrottled as exc:
+            return throttled_response(exc)
+        if slots is None:
+            return view_func(request, *args, **kwargs)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            slots.release()
+
+    return _wrapped_view
@@ -0,0 +1,135 @@
+"""
+Listing of the meetings an application owns, from the proxy's own records.
+
+GET /zoom/v2/users/{userId}/meetings lists the meetings of one user, and
+GET /zoom/v2/meetings all meetings of the application. Both take Zoom's
+page_size and next_page_token query parameters and respond like Zoom's
+list meetings API, with {"page_size", "next_page_token", "meetings"}, where
+next_page_token is empty on the last page. total_records is left out, as
+counting would not take constant time.
+
+Pages use keyset pagination on (created, id), which the indexes on
+(application, user_id, created, id) and (application, created, id) cover,
+so every page is one index range scan however many meetings there are.
+Meetings journalled with ZAPIP_WRITE_BEHIND are listed once flushed, and
+meetings marked as deleted are left out.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from django.db.models import Q, QuerySet
+
+from zapip.models import Application, ZoomMeeting
+
+DEFAULT_PAGE_SIZE = 30
+MAX_PAGE_SIZE = 300
+
+
+class ListingError(ValueError):
+    """
+    The listing request has invalid query parameters.
+    """
+
+
+class Page(NamedTuple):
+    size: int
+    after: Optional["Cursor"]
+
+
+class Cursor(NamedTuple):
+    created: datetime.datetime
+    pk: int
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    raw = json.dumps([cursor.created.isoformat(), cursor.pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Cursor:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created, pk = json.loads(raw)
+        cursor = Cursor(datetime.datetime.fromisoformat(created), int(pk))
+    except (binascii.Error, TypeError, ValueError):
+        raise ListingError("next_page_token is invalid")
+    if cursor.created.tzinfo is None:
+        raise ListingError("next_page_token is invalid")
+    return cursor
+
+
+def parse_page(params: Dict[str, str]) -> Page:
+    """
+    Parses the page_size and next_page_token query parameters.
+    """
+    size = DEFAULT_PAGE_SIZE
+    if params.get("page_size"):
+        try:
+            size = int(params["page_size"])
+        except ValueError:
+            raise ListingError("page_size must be an integer")
+        if not 1 <= size <= MAX_PAGE_SIZE:
+            raise ListingError(
+                "page_size must be between 1 and {}".format(MAX_PAGE_SIZE)
+            )
+    token = params.get("next_page_token")
+    return Page(size, decode_cursor(token) if token else None)
+
+
+def _query(
+    application: Application, user_id: Optional[str], page: Page
+) -> "QuerySet[Any]":
+    meetings = ZoomMeeting.objects.filter(
+        application=application, deleted_at__isnull=True
+    )
+    if user_id is not None:
+        meetings = meetings.filter(user_id=user_id)
+    if page.after is not None:
+        meetings = meetings.filter(
+            Q(created__gt=page.after.created)
+            | Q(created=page.after.created, pk__gt=page.after.pk)
+        )
+    # one extra row tells whether there is a next page
+    return meetings.order_by("created", "pk").values_list(
+        "pk", "created", "user_id", "meeting_id", "mirror"
+    )[: page.size + 1]
+
+
+def _build(page: Page, rows: List[tuple]) -> Dict[str, Any]:
+    next_page_token = ""
+    if len(rows) > page.size:
+        rows = rows[: page.size]
+        next_page_token = encode_cursor(Cursor(rows[-1][1], rows[-1][0]))
+    meetings = []
+    for _, created, user_id, meeting_id, mirrored in rows:
+        meeting = dict(mirrored) if isinstance(mirrored, dict) else {}
+        meeting.update(id=meeting_id, user_id=user_id, created_at=created.isoformat())
+        meetings.append(meeting)
+    return {
+        "page_size": page.size,
+        "next_page_token": next_page_token,
+        "meetings": meetings,
+    }
+
+
+def list_meetings(
+    application: Application, user_id: Optional[str], page: Page
+) -> Dict[str, Any]:
+    """
+    Returns a page of the meetings of an application, of one user if user_id
+    is given. Mirrored meeting details are included where present.
+    """
+    return _build(page, list(_query(application, user_id, page)))
+
+
+async def alist_meetings(
+    application: Application, user_id: Optional[str], page: Page
+) -> Dict[str, Any]:
+    """
+    Async version of list_meetings.
+    """
+    return _build(page, [row async for row in _query(application, user_id, page)])
@@ -0,0 +1,174 @@
+"""
+Logging helpers: a queue-backed handler, sampling of access records, and the
+upstream timings reported in them.
+
+AccessLogMiddleware writes one record per request to the "zapip.access" logger,
+with the route, status, duration and time spent calling Zoom as fields, which
+the JSON formatter turns into keys. Successful requests can be sampled with
+ZAPIP_ACCESS_LOG_SAMPLE_RATE, while failures are always logged.
+
+This module is imported while logging is configured, before apps are loaded,
+so it must not import models.
+"""
+
+import contextvars
+import copy
+import logging
+import os
+import queue
+import random
+import time
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+from typing import IO, Any, Dict, Optional
+
+from django.conf import settings
+
+from zapip import metrics
+
+access_logger = logging.getLogger("zapip.access")
+
+_upstream: "contextvars.ContextVar[Optional[UpstreamTiming]]" = contextvars.ContextVar(
+    "zapip_upstream", default=None
+)
+
+
+class UpstreamTiming:
+    """
+    Number of calls to Zoom made for a request, and the time they took.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+
+def start_request() -> UpstreamTiming:
+    timing = UpstreamTiming()
+    _upstream.set(timing)
+    return timing
+
+
+def record_upstream(seconds: float) -> None:
+    """
+    Adds a call to Zoom to the timings of the current request, if any.
+    """
+    timing = _upstream.get()
+    if timing is not None:
+        timing.calls += 1
+        timing.seconds += seconds
+
+
+class SampleSuccessFilter(logging.Filter):
+    """
+    Passes a ZAPIP_ACCESS_LOG_SAMPLE_RATE fraction of access records for
+    requests which succeeded, and all other records.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        status = getattr(record, "status", None)
+        if status is None or status >= 400 or record.levelno >= logging.WARNING:
+            return True
+        rate = settings.ZAPIP_ACCESS_LOG_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+
+_queue_handlers: "weakref.WeakSet[QueueStreamHandler]" = weakref.WeakSet()
+
+
+class QueueStreamHandler(QueueHandler):
+    """
+    A StreamHandler which formats and writes records in a background thread.
+
+    Records are enqueued with their message merged and exception rendered, so
+    request threads never wait for the stream. If the queue is full, records
+    are dropped rather than blocking the request, and counted in
+    zapip_log_records_dropped_total.
+    """
+
+    def __init__(self, stream: Optional[IO[str]] = None, maxsize: int = 10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        _queue_handlers.add(self)
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        # formatting happens in the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            metrics.log_records_dropped_total.inc()
+
+    def flush(self) -> None:
+        # wait until the listener has written everything enqueued so far
+        self.queue.join()  # type: ignore
+        self.target.flush()
+
+    def close(self) -> None:
+        # logging.shutdown may close handlers more than once
+        if self.listener._thread is not None:  # type: ignore
+            self.listener.stop()
+        self.target.close()
+        super().close()
+
+    def _restart(self) -> None:
+        # the listener thread does not survive fork, and the queue's lock may
+        # have been held by it when the process was forked
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+
+def _restart_after_fork() -> None:
+    for handler in list(_queue_handlers):
+        handler._restart()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def log_access(
+    method: str,
+    path: str,
+    route: str,
+    status: int,
+    started: float,
+    timing: UpstreamTiming,
+    fields: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Writes the access record of a finished request.
+    """
+    if not access_logger.isEnabledFor(logging.INFO):
+        return
+    extra = {
+        "method": method,
+        "path": path,
+        "route": route,
+        "status": status,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+        "upstream_calls": timing.calls,
+        "upstream_ms": round(timing.seconds * 1000, 3),
+    }
+    if fields:
+        extra.update(fields)
+    access_logger.info("%s %s %s", method, path, status, extra=extra)
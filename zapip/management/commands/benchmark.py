@@ -0,0 +1,176 @@
+import json
+import logging
+from typing import Any, Dict
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from zapip.benchmark import Benchmark, FakeZoomServer, benchmark_settings, compare
+from zapip.cache import reset_caches
+from zapip.zoom import reset_shared_zoom_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the proxy hot path layer by layer against a local stand-in "
+        "for Zoom. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--iterations", type=int, default=200, help="Calls per layer."
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Untimed calls per layer before measuring.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Threads per layer. Full-stack layers need a database which "
+            "allows concurrent writers above 1.",
+        )
+        parser.add_argument(
+            "--latency",
+            type=float,
+            default=0.0,
+            help="Latency of the fake Zoom server in milliseconds.",
+        )
+        parser.add_argument(
+            "--payload-size",
+            type=int,
+            default=1024,
+            help="Size in bytes of the meeting agenda returned by the fake Zoom server.",
+        )
+        parser.add_argument(
+            "--layer",
+            action="append",
+            choices=Benchmark.LAYERS,
+            help="Layer to run, may be repeated. Defaults to all layers.",
+        )
+        parser.add_argument("--save", metavar="PATH", help="Save results as JSON.")
+        parser.add_argument(
+            "--compare", metavar="PATH", help="Compare with a saved baseline."
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Percent slowdown counted as a regression when comparing.",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error if a regression is found.",
+        )
+        parser.add_argument(
+            "--with-logging",
+            action="store_true",
+            help="Keep INFO logging enabled, to include its cost.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        baseline = None
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                baseline = json.load(f)["results"]
+
+        if not options["with_logging"]:
+            logging.disable(logging.INFO)
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            logging.disable(logging.NOTSET)
+
+        self._print_results(results)
+        if options["save"]:
+            with open(options["save"], "w") as f:
+                json.dump(
+                    {"options": self._run_options(options), "results": results},
+                    f,
+                    indent=2,
+                )
+            self.stdout.write("Saved results to {}".format(options["save"]))
+        if baseline is not None:
+            self._compare(baseline, results, options)
+
+    def _run_options(self, options: Dict[str, Any]) -> Dict[str, Any]:
+        keys = ["iterations", "concurrency", "latency", "payload_size"]
+        return {key: options[key] for key in keys}
+
+    def _run(self, options: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+        server = FakeZoomServer(
+            latency=options["latency"] / 1000, payload_size=options["payload_size"]
+        )
+        with server, override_settings(**benchmark_settings(server)):
+            reset_caches()
+            reset_shared_zoom_client()
+            benchmark = Benchmark(
+                server,
+                iterations=options["iterations"],
+                concurrency=options["concurrency"],
+                layers=options["layer"],
+                warmup=options["warmup"],
+            )
+            return benchmark.run()
+
+    def _print_results(self, results: Dict[str, Dict[str, float]]) -> None:
+        row = "{:<16} {:>7} {:>10} {:>10} {:>10} {:>10}"
+        self.stdout.write(
+            row.format("layer", "count", "req/s", "p50 ms", "p95 ms", "p99 ms")
+        )
+        for layer, stats in results.items():
+            self.stdout.write(
+                row.format(
+                    layer,
+                    stats["count"],
+                    "{:.1f}".format(stats["throughput"]),
+                    "{:.3f}".format(stats["p50"] * 1000),
+                    "{:.3f}".format(stats["p95"] * 1000),
+                    "{:.3f}".format(stats["p99"] * 1000),
+                )
+            )
+
+    def _compare(
+        self,
+        baseline: Dict[str, Dict[str, float]],
+        results: Dict[str, Dict[str, float]],
+        options: Dict[str, Any],
+    ) -> None:
+        rows = compare(baseline, results, options["threshold"] / 100)
+        row = "{:<16} {:<4} {:>12} {:>12} {:>9}"
+        self.stdout.write("")
+        self.stdout.write(
+            row.format("layer", "pct", "baseline ms", "current ms", "change")
+        )
+        for r in rows:
+            line = row.format(
+                r["layer"],
+                r["percentile"],
+                "{:.3f}".format(r["baseline"] * 1000),
+                "{:.3f}".format(r["current"] * 1000),
+                "{:+.1f}%".format(r["change"] * 100),
+            )
+            if r["regression"]:
+                line = self.style.ERROR(line + "  regression")
+            self.stdout.write(line)
+        regressions = [r for r in rows if r["regression"]]
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(
+                "{} percentile(s) regressed by more than {}%".format(
+                    len(regressions), options["threshold"]
+                )
+            )
@@ -0,0 +1,23 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from zapip.journal import MeetingJournal
+
+
+class Command(BaseCommand):
+    help = "Move meetings from the write-behind journal into the database."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ZAPIP_WRITE_BEHIND_BATCH_SIZE,
+            help="Meetings inserted per statement.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        journal = MeetingJournal(settings.ZAPIP_WRITE_BEHIND_JOURNAL)
+        flushed = journal.flush(options["batch_size"])
+        self.stdout.write("Flushed {} meetings".format(flushed))
@@ -0,0 +1,69 @@
+import gzip
+from typing import IO, Any, Optional
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+from zapip.retention import expired_meetings, purge_meetings
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive and delete meetings past their retention, in batches. Safe to "
+        "interrupt and run again."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.ZAPIP_PURGE_BATCH_SIZE,
+            help="Meetings to delete per transaction.",
+        )
+        parser.add_argument(
+            "--max-batches",
+            type=int,
+            default=None,
+            help="Batches to purge at most in this run.",
+        )
+        parser.add_argument(
+            "--archive",
+            default=None,
+            help="Append purged rows as JSON lines to this file, gzipped if it "
+            "ends with .gz.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the meetings which would be purged.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options["dry_run"]:
+            count = sum(meetings.count() for meetings in expired_meetings())
+            self.stdout.write("Would purge {} meetings".format(count))
+            return
+        archive: Optional[IO[str]] = None
+        path = options["archive"]
+        if path is not None:
+            if path.endswith(".gz"):
+                archive = gzip.open(path, "at", encoding="utf-8")
+            else:
+                archive = open(path, "a", encoding="utf-8")
+        try:
+            purged = purge_meetings(
+                options["batch_size"],
+                options["max_batches"],
+                archive,
+                options["pause"],
+            )
+        finally:
+            if archive is not None:
+                archive.close()
+        self.stdout.write("Purged {} meetings".format(purged))
@@ -0,0 +1,30 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from zapip.mirror import sync_meetings
+from zapip.zoom import get_zoom_client
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the mirrored details of meetings from Zoom, least recently "
+        "mirrored first."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=0,
+            help="Only refresh mirrors older than this many seconds.",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=None, help="Meetings to refresh at most."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        synced, failed = sync_meetings(
+            get_zoom_client(), options["older_than"], options["limit"]
+        )
+        self.stdout.write("Synced {} meetings, {} failed".format(synced, failed))
@@ -0,0 +1,351 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Metrics are kept per process, without any external service. Recording a
+sample takes a lock and a few dict operations. Values which are cheap to read
+on demand, like cache statistics and connection pool usage, are collected when
+the metrics are rendered rather than on the hot path.
+"""
+
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _labels(self, values: Labels) -> Dict[str, str]:
+        return dict(zip(self.labelnames, values))
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type_name = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def get(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield self.name, self._labels(labels), value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: counts per bucket (plus +Inf), sum
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[labels] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def count(self, *labels: str) -> int:
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._values.items()
+            ]
+        for labels, counts, total in values:
+            label_dict = self._labels(labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield self.name + "_bucket", dict(
+                    label_dict, le=_format_value(bound)
+                ), cumulative
+            yield self.name + "_sum", label_dict, total
+            yield self.name + "_count", label_dict, cumulative
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """
+    Holds metrics, and collectors which produce samples when rendering.
+
+    A collector returns (metric name, type, help, samples) tuples.
+    """
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[
+            Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]]
+        ] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))  # type: ignore
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))  # type: ignore
+
+    def add_collector(
+        self,
+        collector: Callable[[], Iterable[Tuple[str, str, str, Iterable[Sample]]]],
+    ) -> None:
+        self.collectors.append(collector)
+
+    def clear(self) -> None:
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def render(self) -> str:
+        families = [
+            (metric.name, metric.type_name, metric.help, metric.samples())
+            for metric in self.metrics.values()
+        ]
+        for collector in self.collectors:
+            families.extend(collector())
+        lines = []
+        for name, type_name, help, samples in families:
+            lines.append("# HELP {} {}".format(name, help))
+            lines.append("# TYPE {} {}".format(name, type_name))
+            for sample_name, labels, value in samples:
+                lines.append(
+                    "{}{} {}".format(
+                        sample_name, _format_labels(labels), _format_value(value)
+                    )
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.counter(
+    "zapip_requests_total",
+    "Requests handled by Zapip.",
+    ["route", "method", "status"],
+)
+request_duration = registry.histogram(
+    "zapip_request_duration_seconds",
+    "Time spent handling requests, including the upstream call.",
+    ["route", "method"],
+)
+request_db_queries = registry.histogram(
+    "zapip_request_db_queries",
+    "Database queries per request.",
+    ["route", "method"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+upstream_requests_total = registry.counter(
+    "zapip_upstream_requests_total",
+    "Calls to Zoom, by endpoint class and status. Status is 'error' if no "
+    "response was received.",
+    ["endpoint", "method", "status"],
+)
+upstream_duration = registry.histogram(
+    "zapip_upstream_duration_seconds",
+    "Time until Zoom responded, per call attempt.",
+    ["endpoint", "method"],
+)
+response_cache_requests_total = registry.counter(
+    "zapip_response_cache_requests_total",
+    "Response cache lookups, by result.",
+    ["endpoint", "result"],
+)
+
+coalesced_requests_total = registry.counter(
+    "zapip_coalesced_requests_total",
+    "Reads which shared the Zoom response of an identical call in flight, by "
+    "whether it was in this process or another worker.",
+    ["scope"],
+)
+
+application_throttled_total = registry.counter(
+    "zapip_application_throttled_total",
+    "Requests turned away for exceeding the limits of their application, by "
+    "whether the rate or concurrency limit was hit.",
+    ["reason"],
+)
+
+token_fetches_total = registry.counter(
+    "zapip_token_fetches_total",
+    "Zoom OAuth access tokens fetched by this process, by result.",
+    ["result"],
+)
+
+webhook_events_total = registry.counter(
+    "zapip_webhook_events_total",
+    "Meeting events received from Zoom webhooks, by event.",
+    ["event"],
+)
+
+log_records_dropped_total = registry.counter(
+    "zapip_log_records_dropped_total",
+    "Log records dropped because the queue of their handler was full.",
+)
+# exported as 0 until a record is dropped
+log_records_dropped_total.inc(amount=0)
+
+
+def _collect_caches() -> Iterable[Tuple[str, str, str, Iterable[Sample]]]:
+    from zapip.cache import cache_stats
+
+    stats = cache_stats()
+    yield (
+        "zapip_cache_hits_total",
+        "counter",
+        "In-process cache hits.",
+        [("zapip_cache_hits_total", {"cache": n}, s["hits"]) for n, s in stats],
+    )
+    yield (
+        "zapip_cache_misses_total",
+        "counter",
+        "In-process cache misses.",
+        [("zapip_cache_misses_total", {"cache": n}, s["misses"]) for n, s in stats],
+    )
+    yield (
+        "zapip_cache_entries",
+        "gauge",
+        "Entries in in-process caches.",
+        [("zapip_cache_entries", {"cache": n}, s["size"]) for n, s in stats],
+    )
+
+
+def _collect_pools() -> Iterable[Tuple[str, str, str, Iterable[Sample]]]:
+    from zapip.zoom import pool_stats
+
+    stats = pool_stats()
+    yield (
+        "zapip_upstream_pool_connections_total",
+        "counter",
+        "Connections opened to the upstream by the shared Zoom client.",
+        [
+            ("zapip_upstream_pool_connections_total", {"host": h}, s["connections"])
+            for h, s in stats
+        ],
+    )
+    yield (
+        "zapip_upstream_pool_requests_total",
+        "counter",
+        "Requests sent over pooled connections by the shared Zoom client.",
+        [
+            ("zapip_upstream_pool_requests_total", {"host": h}, s["requests"])
+            for h, s in stats
+        ],
+    )
+    yield (
+        "zapip_upstream_pool_idle_connections",
+        "gauge",
+        "Idle connections kept in the pool of the shared Zoom client.",
+        [
+            ("zapip_upstream_pool_idle_connections", {"host": h}, s["idle"])
+            for h, s in stats
+        ],
+    )
+
+
+def _collect_journal() -> Iterable[Tuple[str, str, str, Iterable[Sample]]]:
+    from django.conf import settings
+
+    from zapip.journal import get_journal
+
+    if not settings.ZAPIP_WRITE_BEHIND:
+        return
+    yield (
+        "zapip_journal_pending_meetings",
+        "gauge",
+        "Meetings in the write-behind journal, waiting to be flushed.",
+        [("zapip_journal_pending_meetings", {}, get_journal().pending())],
+    )
+
+
+registry.add_collector(_collect_caches)
+registry.add_collector(_collect_pools)
+registry.add_collector(_collect_journal)
@@ -0,0 +1,269 @@
+import time
+from typing import Any, Callable, Optional
+
+from asgiref.sync import (
+    async_to_sync,
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+from django.urls import Resolver404, ResolverMatch, get_resolver
+from log_request_id import local
+from log_request_id import middleware as log_request_id
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from zapip import log, metrics
+
+
+def _route(request: HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.route or match.view_name or "unknown"
+
+
+class MetricsMiddleware:
+    """
+    Records request counts and latency per route and method.
+
+    Routes are labelled by their URL pattern, so meeting ids do not end up in
+    label values. For sync requests, database queries are counted as well.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.is_async:
+            return self.__acall__(request)
+        queries = [0]
+
+        def count_queries(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            response = self.get_response(request)
+        self._record(request, response, started)
+        metrics.request_db_queries.observe(
+            queries[0], _route(request), request.method or ""
+        )
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    def _record(self, request: HttpRequest, response: HttpResponse, started: float):
+        route = _route(request)
+        method = request.method or ""
+        metrics.request_duration.observe(time.perf_counter() - started, route, method)
+        metrics.requests_total.inc(route, method, str(response.status_code))
+
+
+class AccessLogMiddleware:
+    """
+    Writes one access record per request, with its timings, to "zapip.access".
+
+    Replaces the several INFO lines the views used to log per request. Calls
+    to Zoom made while handling the request are counted and timed through a
+    context variable, which the response headers added by zapip complement.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    # response headers included in the record, by field name
+    response_fields = {
+        "source": "X-Zapip-Response-From",
+        "cache": "X-Zapip-Cache",
+        "mirror": "X-Zapip-Mirror",
+    }
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.is_async:
+            return self.__acall__(request)
+        timing = log.start_request()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._log(request, response, started, timing)
+        return response
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        timing = log.start_request()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._log(request, response, started, timing)
+        return response
+
+    def _log(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        started: float,
+        timing: log.UpstreamTiming,
+    ) -> None:
+        fields = {}
+        for field, header in self.response_fields.items():
+            value = response.get(header)
+            if value is not None:
+                fields[field] = value
+        identity = getattr(request, "gateway_identity", None)
+        if identity is not None:
+            fields["application"] = identity.application
+        log.log_access(
+            request.method or "",
+            request.path,
+            _route(request),
+            response.status_code,
+            started,
+            timing,
+            fields,
+        )
+
+
+class LeanRouteMiddleware:
+    """
+    Calls the view directly for paths under ZAPIP_LEAN_PATH_PREFIXES.
+
+    The proxy API views are csrf-exempt, have no sessions and authenticate
+    clients through headers, so the session, authentication, message, CSRF,
+    static file and clickjacking middleware placed after this one only add
+    overhead on those routes. Other routes, like the admin, still go through
+    the whole stack. Paths which do not resolve are left to the full stack too,
+    so that 404s and APPEND_SLASH behave as before.
+
+    Place it after SecurityMiddleware. The Host header is validated against
+    ALLOWED_HOSTS here, as CommonMiddleware would have done.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        self.get_response = get_response
+        self.prefixes = tuple(settings.ZAPIP_LEAN_PATH_PREFIXES)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def resolve(self, request: HttpRequest) -> Optional[ResolverMatch]:
+        if not request.path_info.startswith(self.prefixes):
+            return None
+        resolver = get_resolver(getattr(request, "urlconf", None))
+        try:
+            match = resolver.resolve(request.path_info)
+        except Resolver404:
+            return None
+        # raises DisallowedHost, answered with 400
+        request.get_host()
+        request.resolver_match = match
+        return match
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.is_async:
+            return self.__acall__(request)
+        match = self.resolve(request)
+        if match is None:
+            return self.get_response(request)
+        view = match.func
+        if iscoroutinefunction(view):
+            view = async_to_sync(view)
+        return view(request, *match.args, **match.kwargs)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        match = self.resolve(request)
+        if match is None:
+            return await self.get_response(request)
+        view = match.func
+        if not iscoroutinefunction(view):
+            view = sync_to_async(view, thread_sensitive=True)
+        return await view(request, *match.args, **match.kwargs)
+
+
+class RequestIDMiddleware(log_request_id.RequestIDMiddleware):
+    """
+    log_request_id's RequestIDMiddleware, which can also run async.
+
+    A sync-only middleware makes Django run the whole chain above it in a
+    worker thread under ASGI, so every request to an async view would hold a
+    thread while waiting for Zoom.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any]):
+        super().__init__(get_response)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        local.request_id = request.id = request_id = self._get_request_id(request)
+        response = await self.get_response(request)
+        if self.request_id_response_header:
+            response[self.request_id_response_header] = request_id
+        if self.log_requests and "favicon" not in request.path:
+            log_request_id.logger.info(self.get_log_message(request, response))
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware, which can also run async.
+
+    Static files are served from a worker thread, while other requests are
+    passed on without leaving the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], Any], **kwargs: Any):
+        super().__init__(get_response, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Any:
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request: HttpRequest) -> Any:
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(
+                request.path_info
+            )
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(
+                static_file, request
+            )
+        return await self.get_response(request)
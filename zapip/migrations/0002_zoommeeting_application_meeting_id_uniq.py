@@ -0,0 +1,41 @@
+# Generated by Django 4.1.3 on 2026-10-18 13:25
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_meetings(apps, schema_editor):
+    """
+    Keeps only the first row of each (application, meeting_id), which the
+    constraint below requires.
+    """
+    ZoomMeeting = apps.get_model("zapip", "ZoomMeeting")
+    duplicates = (
+        ZoomMeeting.objects.values("application_id", "meeting_id")
+        .annotate(first=Min("pk"), rows=Count("pk"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for duplicate in list(duplicates):
+        ZoomMeeting.objects.filter(
+            application_id=duplicate["application_id"],
+            meeting_id=duplicate["meeting_id"],
+        ).exclude(pk=duplicate["first"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zapip", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_meetings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="zoommeeting",
+            constraint=models.UniqueConstraint(
+                fields=("application", "meeting_id"),
+                name="zapip_zoommeeting_application_meeting_id_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.1.3 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zapip", "0002_zoommeeting_application_meeting_id_uniq"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="zoommeeting",
+            name="mirror",
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="zoommeeting",
+            name="mirrored_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.1.3 on 2026-10-18 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zapip", "0003_zoommeeting_mirror"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="zoommeeting",
+            index=models.Index(
+                fields=["application", "user_id", "created", "id"],
+                name="zapip_zoommeeting_user_list",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="zoommeeting",
+            index=models.Index(
+                fields=["application", "created", "id"],
+                name="zapip_zoommeeting_app_list",
+            ),
+        ),
+    ]
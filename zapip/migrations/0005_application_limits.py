@@ -0,0 +1,36 @@
+# Generated by Django 4.1.3 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zapip", "0004_zoommeeting_list_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="max_concurrency",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Requests handled at the same time", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="application",
+            name="rate_burst",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Requests allowed at once above the rate",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="application",
+            name="rate_limit",
+            field=models.FloatField(
+                blank=True, help_text="Requests per second", null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1.3 on 2026-10-18 13:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zapip", "0005_application_limits"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="webhook_secret",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Signs forwarded events, like Zoom's secret token",
+                max_length=128,
+            ),
+        ),
+        migrations.AddField(
+            model_name="application",
+            name="webhook_url",
+            field=models.URLField(blank=True, default=""),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.1.3 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("zapip", "0006_application_webhook"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="application",
+            name="retention_days",
+            field=models.PositiveIntegerField(
+                blank=True, help_text="Days meetings are kept after creation", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="zoommeeting",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="zoommeeting",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="zapip_zoommeeting_deleted",
+            ),
+        ),
+    ]
@@ -0,0 +1,184 @@
+"""
+Optional local mirror of meeting details, stored with each ZoomMeeting.
+
+With ZAPIP_MEETING_MIRROR enabled, the body of every successful proxied
+GET /meetings/{meetingId} is saved as the mirror of the meeting, and the
+sync_meeting_mirror management command refreshes mirrors from Zoom. A
+successful PATCH or DELETE clears the mirror, since Zoom does not return the
+changed meeting.
+
+Clients opt in to mirrored reads per request with an X-Zapip-Accept-Stale
+header, giving the age in seconds they accept, capped at
+ZAPIP_MEETING_MIRROR_MAX_STALE. Requests with query parameters always go to
+Zoom, as the mirror only holds the default representation.
+"""
+
+import datetime
+import json
+import logging
+from typing import Any, NamedTuple, Optional, Tuple, Union
+
+import httpx
+from django.conf import settings
+from django.db.models import F, Min, Q
+from django.http import HttpResponse
+from django.http.request import HttpRequest
+from django.utils import timezone
+from requests.models import Response
+
+from zapip import compression
+from zapip.models import Application, ZoomMeeting
+from zapip.utils import ZoomResponse
+from zapip.zoom import ZoomClient, ZoomRateLimited, ZoomUnavailable
+
+logger = logging.getLogger(__name__)
+
+ACCEPT_STALE_HEADER = "X-Zapip-Accept-Stale"
+
+
+class MirroredMeeting(NamedTuple):
+    data: Any
+    mirrored_at: datetime.datetime
+
+
+def enabled_for(request: HttpRequest) -> bool:
+    """
+    Whether the response to a GET request would be mirrored.
+    """
+    return settings.ZAPIP_MEETING_MIRROR and not request.GET
+
+
+def accepted_staleness(request: HttpRequest) -> Optional[int]:
+    """
+    Returns the age in seconds of mirrored details the client accepts, or None
+    if the request must go to Zoom.
+    """
+    if not enabled_for(request):
+        return None
+    value = request.headers.get(ACCEPT_STALE_HEADER)
+    if value is None or not value.isdigit():
+        return None
+    return min(int(value), settings.ZAPIP_MEETING_MIRROR_MAX_STALE)
+
+
+def _fresh(application: Application, meeting_id: int, max_stale: int):
+    return ZoomMeeting.objects.filter(
+        application=application,
+        meeting_id=meeting_id,
+        mirrored_at__gte=timezone.now() - datetime.timedelta(seconds=max_stale),
+    ).values_list("mirror", "mirrored_at")
+
+
+def get_meeting(
+    application: Application, meeting_id: int, max_stale: int
+) -> Optional[MirroredMeeting]:
+    row = _fresh(application, meeting_id, max_stale).first()
+    return MirroredMeeting(*row) if row is not None else None
+
+
+async def aget_meeting(
+    application: Application, meeting_id: int, max_stale: int
+) -> Optional[MirroredMeeting]:
+    row = await _fresh(application, meeting_id, max_stale).afirst()
+    return MirroredMeeting(*row) if row is not None else None
+
+
+def build_response(
+    mirrored: MirroredMeeting, accept_encoding: Optional[str]
+) -> HttpResponse:
+    response = ZoomResponse(
+        content=json.dumps(mirrored.data), content_type="application/json"
+    )
+    age = (timezone.now() - mirrored.mirrored_at).total_seconds()
+    response["Age"] = str(max(0, int(age)))
+    response["X-Zapip-Mirror"] = "HIT"
+    compression.compress_response(response, accept_encoding)
+    return response
+
+
+def _mirror_values(
+    zoom_response: Union[Response, httpx.Response],
+) -> Optional[Tuple[Any, datetime.datetime]]:
+    try:
+        return zoom_response.json(), timezone.now()
+    except ValueError:
+        logger.warning("Not mirroring meeting details which are not JSON")
+        return None
+
+
+def update_meeting(
+    meeting_id: int, zoom_response: Union[Response, httpx.Response]
+) -> None:
+    values = _mirror_values(zoom_response)
+    if values is not None:
+        ZoomMeeting.objects.filter(meeting_id=meeting_id).update(
+            mirror=values[0], mirrored_at=values[1]
+        )
+
+
+async def aupdate_meeting(
+    meeting_id: int, zoom_response: Union[Response, httpx.Response]
+) -> None:
+    values = _mirror_values(zoom_response)
+    if values is not None:
+        await ZoomMeeting.objects.filter(meeting_id=meeting_id).aupdate(
+            mirror=values[0], mirrored_at=values[1]
+        )
+
+
+def clear_meeting(meeting_id: int) -> None:
+    ZoomMeeting.objects.filter(meeting_id=meeting_id).update(
+        mirror=None, mirrored_at=None
+    )
+
+
+async def aclear_meeting(meeting_id: int) -> None:
+    await ZoomMeeting.objects.filter(meeting_id=meeting_id).aupdate(
+        mirror=None, mirrored_at=None
+    )
+
+
+def sync_meetings(
+    zoom: ZoomClient, older_than: int = 0, limit: Optional[int] = None
+) -> Tuple[int, int]:
+    """
+    Refreshes mirrors from Zoom, least recently mirrored first, skipping those
+    mirrored less than older_than seconds ago.
+
+    Stops early if Zoom is rate limited or unavailable. Returns the number of
+    meetings refreshed and the number which failed.
+    """
+    meetings = ZoomMeeting.objects.filter(deleted_at__isnull=True)
+    if older_than:
+        cutoff = timezone.now() - datetime.timedelta(seconds=older_than)
+        meetings = meetings.filter(
+            Q(mirrored_at__lt=cutoff) | Q(mirrored_at__isnull=True)
+        )
+    # grouped, as a meeting may be owned by several applications
+    rows = (
+        meetings.values("meeting_id")
+        .annotate(oldest=Min("mirrored_at"))
+        .order_by(F("oldest").asc(nulls_first=True), "meeting_id")[:limit]
+    )
+    meeting_ids = [row["meeting_id"] for row in rows]
+    synced = failed = 0
+    for meeting_id in meeting_ids:
+        try:
+            zoom_response = zoom.get_meeting(meeting_id=meeting_id, data=None)
+        except (ZoomRateLimited, ZoomUnavailable) as exc:
+            logger.warning("Stopping meeting sync: %s", exc)
+            failed += 1
+            break
+        if zoom_response.status_code == 200:
+            update_meeting(meeting_id, zoom_response)
+            synced += 1
+        else:
+            logger.info(
+                "Zoom responded with %s for meeting %s",
+                zoom_response.status_code,
+                meeting_id,
+            )
+            if zoom_response.status_code == 404:
+                clear_meeting(meeting_id)
+            failed += 1
+    return synced, failed
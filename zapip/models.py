@@ -18,6 +18,30 @@ class Application(BaseModel):
 
     name = models.CharField(max_length=64, blank=True, null=True)
     external_id = models.CharField(max_length=64, unique=True)
+    # Limits on the requests of the application, see zapip.limits. Empty
+    # fields use the ZAPIP_APPLICATION_* settings.
+    max_concurrency = models.PositiveIntegerField(
+        blank=True, null=True, help_text="Requests handled at the same time"
+    )
+    rate_limit = models.FloatField(
+        blank=True, null=True, help_text="Requests per second"
+    )
+    rate_burst = models.PositiveIntegerField(
+        blank=True, null=True, help_text="Requests allowed at once above the rate"
+    )
+    # Days meetings are kept, see zapip.retention. Empty uses
+    # ZAPIP_MEETING_RETENTION_DAYS.
+    retention_days = models.PositiveIntegerField(
+        blank=True, null=True, help_text="Days meetings are kept after creation"
+    )
+    # Where Zoom meeting events are forwarded to, see zapip.webhooks
+    webhook_url = models.URLField(blank=True, default="")
+    webhook_secret = models.CharField(
+        max_length=128,
+        blank=True,
+        default="",
+        help_text="Signs forwarded events, like Zoom's secret token",
+    )
 
     def __str__(self):
         return str(self.name)
@@ -32,6 +56,36 @@ class ZoomMeeting(BaseModel):
     application = models.ForeignKey("Application", on_delete=models.PROTECT)
     user_id = models.CharField(max_length=128)
     meeting_id = models.BigIntegerField()
+    # Last known meeting details from Zoom, see zapip.mirror
+    mirror = models.JSONField(blank=True, null=True)
+    mirrored_at = models.DateTimeField(blank=True, null=True)
+    # When the meeting was deleted in Zoom, the row is purged later
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["application", "meeting_id"],
+                name="zapip_zoommeeting_application_meeting_id_uniq",
+            ),
+        ]
+        # keyset pagination of listings, see zapip.listing
+        indexes = [
+            models.Index(
+                fields=["application", "user_id", "created", "id"],
+                name="zapip_zoommeeting_user_list",
+            ),
+            models.Index(
+                fields=["application", "created", "id"],
+                name="zapip_zoommeeting_app_list",
+            ),
+            # purging of deleted meetings, see zapip.retention
+            models.Index(
+                fields=["deleted_at"],
+                name="zapip_zoommeeting_deleted",
+                condition=models.Q(deleted_at__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return "{} ({})".format(self.user_id, self.meeting_id)
@@ -0,0 +1,191 @@
+"""
+Opt-in cache of Zoom responses for GET /meetings/{meetingId}.
+
+Entries are stored in the Django cache configured by ZAPIP_RESPONSE_CACHE_ALIAS,
+keyed by meeting, application and query parameters, and kept for the number of
+seconds configured for the endpoint in ZAPIP_RESPONSE_CACHE_TTLS. Cached and
+freshly proxied GET responses carry an ETag, so clients sending If-None-Match
+get a 304 back.
+
+Every meeting has a version token in the cache, which is part of the entry
+keys. Deleting the token invalidates all entries for the meeting at once.
+Callers read the version before calling Zoom and store the response under
+that version, so a response fetched while the meeting was being changed is
+never served.
+"""
+
+import hashlib
+import logging
+import uuid
+from typing import Dict, NamedTuple, Optional, Union
+from urllib.parse import urlencode
+
+import httpx
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.http import HttpResponse
+from django.http.request import HttpRequest, QueryDict
+from django.utils.http import parse_etags, quote_etag
+from requests.models import Response
+
+from zapip import compression, metrics
+from zapip.models import Application
+from zapip.utils import ZoomResponse
+
+logger = logging.getLogger(__name__)
+
+GET_MEETING = "get_meeting"
+
+
+class CachedResponse(NamedTuple):
+    status: int
+    content: bytes
+    headers: Dict[str, str]
+    etag: str
+
+
+def get_ttl(endpoint: str) -> int:
+    """
+    Returns the cache TTL in seconds for an endpoint, 0 if it is not cached.
+    """
+    return settings.ZAPIP_RESPONSE_CACHE_TTLS.get(endpoint, 0)
+
+
+def get_response_cache() -> BaseCache:
+    return caches[settings.ZAPIP_RESPONSE_CACHE_ALIAS]
+
+
+def make_etag(content: bytes) -> str:
+    return quote_etag(hashlib.sha256(content).hexdigest()[:32])
+
+
+def etag_matches(request: HttpRequest, etag: str) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    # weak comparison, as compressed responses carry a weak ETag
+    etags = [e[2:] if e.startswith("W/") else e for e in parse_etags(if_none_match)]
+    return "*" in etags or etag in etags
+
+
+def _version_key(meeting_id: int) -> str:
+    return "zapip:{}:{}:version".format(GET_MEETING, meeting_id)
+
+
+def _entry_key(
+    version: str, application: Application, meeting_id: int, params: QueryDict
+) -> str:
+    query = urlencode(sorted(params.lists()), doseq=True)
+    query_hash = hashlib.sha256(query.encode()).hexdigest()
+    return "zapip:{}:{}:{}:{}:{}".format(
+        GET_MEETING, meeting_id, version, application.pk, query_hash
+    )
+
+
+def _to_cached_response(
+    zoom_response: Union[Response, httpx.Response], excluded_headers: set
+) -> CachedResponse:
+    content = zoom_response.content
+    headers = {
+        header: value
+        for header, value in zoom_response.headers.items()
+        if header.lower() not in excluded_headers and header.lower() != "etag"
+    }
+    return CachedResponse(
+        status=zoom_response.status_code,
+        content=content,
+        headers=headers,
+        etag=make_etag(content),
+    )
+
+
+def build_response(
+    request: HttpRequest, cached: CachedResponse, cache_status: str
+) -> HttpResponse:
+    """
+    Builds a response to the client from a cached entry, honouring
+    If-None-Match and compressing it as the client accepts.
+    """
+    metrics.response_cache_requests_total.inc(GET_MEETING, cache_status.lower())
+    if etag_matches(request, cached.etag):
+        response = ZoomResponse(status=304)
+    else:
+        response = ZoomResponse(content=cached.content, status=cached.status)
+        for header, value in cached.headers.items():
+            response[header] = value
+    response["ETag"] = cached.etag
+    response["X-Zapip-Cache"] = cache_status
+    compression.compress_response(response, request.headers.get("Accept-Encoding"))
+    return response
+
+
+def get_version(meeting_id: int) -> str:
+    return get_response_cache().get_or_set(
+        _version_key(meeting_id), uuid.uuid4().hex, None
+    )
+
+
+async def aget_version(meeting_id: int) -> str:
+    return await get_response_cache().aget_or_set(
+        _version_key(meeting_id), uuid.uuid4().hex, None
+    )
+
+
+def get_meeting(
+    version: str, application: Application, meeting_id: int, params: QueryDict
+) -> Optional[CachedResponse]:
+    return get_response_cache().get(
+        _entry_key(version, application, meeting_id, params)
+    )
+
+
+async def aget_meeting(
+    version: str, application: Application, meeting_id: int, params: QueryDict
+) -> Optional[CachedResponse]:
+    return await get_response_cache().aget(
+        _entry_key(version, application, meeting_id, params)
+    )
+
+
+def set_meeting(
+    version: str,
+    application: Application,
+    meeting_id: int,
+    params: QueryDict,
+    zoom_response: Union[Response, httpx.Response],
+    excluded_headers: set,
+) -> CachedResponse:
+    cached = _to_cached_response(zoom_response, excluded_headers)
+    get_response_cache().set(
+        _entry_key(version, application, meeting_id, params),
+        cached,
+        get_ttl(GET_MEETING),
+    )
+    return cached
+
+
+async def aset_meeting(
+    version: str,
+    application: Application,
+    meeting_id: int,
+    params: QueryDict,
+    zoom_response: Union[Response, httpx.Response],
+    excluded_headers: set,
+) -> CachedResponse:
+    cached = _to_cached_response(zoom_response, excluded_headers)
+    await get_response_cache().aset(
+        _entry_key(version, application, meeting_id, params),
+        cached,
+        get_ttl(GET_MEETING),
+    )
+    return cached
+
+
+def invalidate_meeting(meeting_id: int) -> None:
+    logger.debug("Invalidating cached responses for meeting_id=%r", meeting_id)
+    get_response_cache().delete(_version_key(meeting_id))
+
+
+async def ainvalidate_meeting(meeting_id: int) -> None:
+    logger.debug("Invalidating cached responses for meeting_id=%r", meeting_id)
+    await get_response_cache().adelete(_version_key(meeting_id))
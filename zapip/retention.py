@@ -0,0 +1,138 @@
+"""
+Lifecycle of ZoomMeeting rows.
+
+Meetings deleted in Zoom, through the proxy or as reported by webhooks, are
+marked with deleted_at rather than removed, so the proxy still recognises
+their ids. Marked meetings no longer authorize requests. The purge_meetings
+management command removes rows in batches:
+
+- meetings deleted more than ZAPIP_DELETED_MEETING_RETENTION_DAYS ago
+- meetings created more than retention_days ago, as set on their
+  Application, or ZAPIP_MEETING_RETENTION_DAYS by default
+
+Each batch is written to an optional JSON lines archive before it is deleted
+in its own transaction, so an interrupted purge resumes where it stopped, at
+worst archiving the last batch twice.
+"""
+
+import datetime
+import json
+import logging
+import time
+from typing import IO, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from zapip.cache import forget_meeting_owner
+from zapip.journal import adiscard_meetings, discard_meetings
+from zapip.models import Application, ZoomMeeting
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FIELDS = [
+    "id",
+    "application__external_id",
+    "user_id",
+    "meeting_id",
+    "created",
+    "updated",
+    "deleted_at",
+    "mirror",
+    "mirrored_at",
+]
+
+
+def mark_deleted(meeting_ids: Iterable[int]) -> None:
+    """
+    Marks meetings as deleted, so they no longer authorize requests.
+
+    Meetings still in the write-behind journal are dropped from it instead.
+    """
+    meeting_ids = list(meeting_ids)
+    ZoomMeeting.objects.filter(
+        meeting_id__in=meeting_ids, deleted_at__isnull=True
+    ).update(deleted_at=timezone.now())
+    discard_meetings(meeting_ids)
+    for meeting_id in meeting_ids:
+        forget_meeting_owner(meeting_id)
+
+
+async def amark_deleted(meeting_ids: Iterable[int]) -> None:
+    """
+    Async version of mark_deleted.
+    """
+    meeting_ids = list(meeting_ids)
+    await ZoomMeeting.objects.filter(
+        meeting_id__in=meeting_ids, deleted_at__isnull=True
+    ).aupdate(deleted_at=timezone.now())
+    await adiscard_meetings(meeting_ids)
+    for meeting_id in meeting_ids:
+        forget_meeting_owner(meeting_id)
+
+
+def expired_meetings(
+    now: Optional[datetime.datetime] = None,
+) -> "List[QuerySet[ZoomMeeting]]":
+    """
+    Returns querysets of the meetings due for purging under the retention
+    policy, one for deleted meetings and one per application.
+    """
+    now = now or timezone.now()
+    expired = []
+    days = settings.ZAPIP_DELETED_MEETING_RETENTION_DAYS
+    if days is not None:
+        expired.append(
+            ZoomMeeting.objects.filter(
+                deleted_at__lt=now - datetime.timedelta(days=days)
+            )
+        )
+    default_days = settings.ZAPIP_MEETING_RETENTION_DAYS
+    for application_id, days in Application.objects.values_list("pk", "retention_days"):
+        if days is None:
+            days = default_days
+        if days is None:
+            continue
+        expired.append(
+            ZoomMeeting.objects.filter(
+                application_id=application_id,
+                created__lt=now - datetime.timedelta(days=days),
+            )
+        )
+    return expired
+
+
+def purge_meetings(
+    batch_size: int,
+    max_batches: Optional[int] = None,
+    archive: Optional[IO[str]] = None,
+    pause: float = 0.0,
+) -> int:
+    """
+    Archives and deletes expired meetings, batch_size rows at a time, and
+    returns the number of rows purged.
+
+    Stops after max_batches batches, if given, and sleeps pause seconds
+    between batches to spread the load on the database.
+    """
+    purged = batches = 0
+    for meetings in expired_meetings():
+        while max_batches is None or batches < max_batches:
+            rows = list(meetings.order_by("pk").values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                break
+            if archive is not None:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+                archive.flush()
+            with transaction.atomic():
+                ZoomMeeting.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+            purged += len(rows)
+            batches += 1
+            logger.info("Purged batch of %d meetings", len(rows))
+            if pause:
+                time.sleep(pause)
+    return purged
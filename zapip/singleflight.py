@@ -0,0 +1,263 @@
+"""
+Coalescing of identical concurrent GET /meetings/{meetingId} calls to Zoom.
+
+With ZAPIP_COALESCE_READS set, only one call per meeting and query string is
+in flight at a time. Requests arriving meanwhile wait for it and share its
+response, which is read fully rather than streamed. Callers must have checked
+that the requesting application may read the meeting.
+
+"process" coalesces the threads (sync views) or tasks (async views) of a
+worker. "shared" additionally coalesces across workers through a lock in the
+Django cache named by ZAPIP_COALESCE_CACHE_ALIAS: the worker holding the lock
+calls Zoom and stores the response, the others poll for it. If the lock
+holder fails, waiting workers call Zoom themselves.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+import weakref
+from asyncio import AbstractEventLoop
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    MutableMapping,
+    Optional,
+    TypeVar,
+    Union,
+)
+from urllib.parse import urlencode
+
+import httpx
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from requests.models import Response
+
+from zapip import metrics
+from zapip.zoom import AsyncZoomClient, ZoomClient
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# seconds between checks for the response of another worker
+POLL_INTERVAL = 0.01
+
+
+class UpstreamResult:
+    """
+    A fully read response from Zoom, which can be shared between requests and
+    stored in a cache.
+
+    Has the attributes of requests and httpx responses which the views use.
+    """
+
+    def __init__(
+        self, status_code: int, content: bytes, headers: Dict[str, str], reason: str
+    ):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.reason = reason
+
+    @classmethod
+    def from_response(
+        cls, response: Union[Response, httpx.Response]
+    ) -> "UpstreamResult":
+        if isinstance(response, httpx.Response):
+            reason = response.reason_phrase
+        else:
+            reason = response.reason
+        return cls(
+            response.status_code, response.content, dict(response.headers), reason
+        )
+
+    @property
+    def reason_phrase(self) -> str:
+        return self.reason
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time across threads; concurrent callers
+    with the same key get the result, or exception, of the call in flight.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if call is None:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.coalesced_requests_total.inc("process")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight:
+    """
+    Async version of SingleFlight, for the tasks of one event loop.
+
+    The call runs in its own task, so a caller being cancelled, e.g. because
+    its client went away, does not cancel the call for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            metrics.coalesced_requests_total.inc("process")
+        return await asyncio.shield(task)
+
+
+_flight = SingleFlight()
+_async_flights: MutableMapping[AbstractEventLoop, AsyncSingleFlight] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _key(meeting_id: int, params: Optional[Dict[str, Any]]) -> str:
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return "get_meeting:{}:{}".format(meeting_id, query)
+
+
+def _cache() -> BaseCache:
+    return caches[settings.ZAPIP_COALESCE_CACHE_ALIAS]
+
+
+def _shared(key: str, fn: Callable[[], UpstreamResult]) -> UpstreamResult:
+    cache = _cache()
+    timeout = settings.ZAPIP_COALESCE_TIMEOUT
+    lock_key = "zapip:coalesce:{}:lock".format(key)
+    token = uuid.uuid4().hex
+    if not cache.add(lock_key, token, timeout):
+        token = cache.get(lock_key)
+        result_key = "zapip:coalesce:{}:{}".format(key, token)
+        deadline = time.monotonic() + timeout
+        while token is not None and time.monotonic() < deadline:
+            result = cache.get(result_key)
+            if result is not None:
+                metrics.coalesced_requests_total.inc("shared")
+                return result
+            if cache.get(lock_key) != token:
+                # finished or failed; the response is stored before unlocking
+                result = cache.get(result_key)
+                if result is not None:
+                    metrics.coalesced_requests_total.inc("shared")
+                    return result
+                break
+            time.sleep(POLL_INTERVAL)
+        return fn()
+    try:
+        result = fn()
+        cache.set("zapip:coalesce:{}:{}".format(key, token), result, timeout)
+        return result
+    finally:
+        cache.delete(lock_key)
+
+
+async def _ashared(
+    key: str, fn: Callable[[], Awaitable[UpstreamResult]]
+) -> UpstreamResult:
+    cache = _cache()
+    timeout = settings.ZAPIP_COALESCE_TIMEOUT
+    lock_key = "zapip:coalesce:{}:lock".format(key)
+    token = uuid.uuid4().hex
+    if not await cache.aadd(lock_key, token, timeout):
+        token = await cache.aget(lock_key)
+        result_key = "zapip:coalesce:{}:{}".format(key, token)
+        deadline = time.monotonic() + timeout
+        while token is not None and time.monotonic() < deadline:
+            result = await cache.aget(result_key)
+            if result is not None:
+                metrics.coalesced_requests_total.inc("shared")
+                return result
+            if await cache.aget(lock_key) != token:
+                result = await cache.aget(result_key)
+                if result is not None:
+                    metrics.coalesced_requests_total.inc("shared")
+                    return result
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        return await fn()
+    try:
+        result = await fn()
+        await cache.aset("zapip:coalesce:{}:{}".format(key, token), result, timeout)
+        return result
+    finally:
+        await cache.adelete(lock_key)
+
+
+def get_meeting(zoom: ZoomClient, meeting_id: int, **kwargs: Any) -> UpstreamResult:
+    """
+    Calls zoom.get_meeting, coalesced with identical concurrent calls.
+    """
+    key = _key(meeting_id, kwargs.get("params"))
+
+    def call() -> UpstreamResult:
+        response = zoom.get_meeting(meeting_id=meeting_id, stream=False, **kwargs)
+        return UpstreamResult.from_response(response)
+
+    if settings.ZAPIP_COALESCE_READS == "shared":
+        return _flight.do(key, lambda: _shared(key, call))
+    return _flight.do(key, call)
+
+
+async def aget_meeting(
+    zoom: AsyncZoomClient, meeting_id: int, **kwargs: Any
+) -> UpstreamResult:
+    """
+    Async version of get_meeting.
+    """
+    key = _key(meeting_id, kwargs.get("params"))
+    loop = asyncio.get_running_loop()
+    flight = _async_flights.get(loop)
+    if flight is None:
+        flight = _async_flights[loop] = AsyncSingleFlight()
+
+    async def call() -> UpstreamResult:
+        response = await zoom.get_meeting(meeting_id=meeting_id, stream=False, **kwargs)
+        return UpstreamResult.from_response(response)
+
+    if settings.ZAPIP_COALESCE_READS == "shared":
+        return await flight.do(key, lambda: _ashared(key, call))
+    return await flight.do(key, call)
@@ -7,10 +7,13 @@ from django.http.request import HttpRequest
 from django.test import RequestFactory, TestCase
 from django.test.utils import override_settings
 from zapip.auth import (
+    GatewayIdentity,
     gateway_headers_required,
-    get_gateway_headers,
+    get_auth_config,
+    get_gateway_identity,
     header_auth_required,
 )
+from zapip.utils import valid_uuid
 
 
 @header_auth_required
@@ -66,6 +69,10 @@ class HeaderAuthTestCase(TestCase):
     def test_valid_header_auth_raises_ImproperlyConfigured_if_unconfigured(self):
         self.assertRaises(ImproperlyConfigured, restricted_view, self.request)
 
+    def test_reads_settings_once(self):
+        with self.settings(HEADER_AUTH={"Authorization": "correct"}):
+            self.assertIs(get_auth_config(), get_auth_config())
+
     def test_sets_headers_and_data_on_denial(self):
         with self.settings(HEADER_AUTH={"Authorization": "correct"}):
             response = restricted_view(self.request)
@@ -114,14 +121,55 @@ class GatewayHeaderTestCase(TestCase):
         response = gateway_header_view(self.request)
         self.assertEqual(response.status_code, 403)
 
-    def test_get_gateway_headers(self):
+    def test_get_gateway_identity(self):
         self.set_expected_headers()
-        headers = get_gateway_headers(self.request)
-        self.assertEqual(headers["api"], self.uuid_one)
-        self.assertEqual(headers["application"], self.uuid_two)
-        self.assertEqual(headers["subscription"], self.uuid_three)
+        identity = get_gateway_identity(self.request)
+        self.assertEqual(
+            identity, GatewayIdentity(self.uuid_one, self.uuid_two, self.uuid_three)
+        )
+
+    def test_sets_gateway_identity_on_request(self):
+        self.set_expected_headers()
+        gateway_header_view(self.request)
+        self.assertEqual(self.request.gateway_identity.application, self.uuid_two)
+
+    def test_logs_accepted_requests_at_debug_level(self):
+        self.set_expected_headers()
+        with self.assertLogs("zapip.auth", "DEBUG") as logs:
+            gateway_header_view(self.request)
+        self.assertEqual([r.levelname for r in logs.records], ["DEBUG"])
+
+    def test_denies_uuids_not_in_standard_form(self):
+        self.set_expected_headers()
+        self.request.headers[settings.GATEWAY_API_ID_HEADER] = self.uuid_one.upper()
+        response = gateway_header_view(self.request)
+        self.assertEqual(response.status_code, 403)
+
+    def test_reloads_header_names_when_settings_change(self):
+        self.request.headers = {
+            "X-Other-Api": self.uuid_one,
+            settings.GATEWAY_APPLICATION_ID_HEADER: self.uuid_two,
+            settings.GATEWAY_SUBSCRIPTION_ID_HEADER: self.uuid_three,
+        }
+        self.assertIsNone(get_gateway_identity(self.request))
+        with self.settings(GATEWAY_API_ID_HEADER="X-Other-Api"):
+            self.assertIsNotNone(get_gateway_identity(self.request))
+        self.assertIsNone(get_gateway_identity(self.request))
 
     def test_sets_headers_and_data_on_denial(self):
         response = gateway_header_view(self.request)
         self.assertEqual(response.get("x-zapip-response-from"), "zapip")
         self.assertEqual(response.content, b'{"error": "missing-headers"}')
+
+
+class ValidUUIDTestCase(TestCase):
+    def test_accepts_standard_form(self):
+        self.assertTrue(valid_uuid(str(uuid.uuid4())))
+
+    def test_rejects_other_forms(self):
+        value = uuid.uuid4()
+        self.assertFalse(valid_uuid(value.hex))
+        self.assertFalse(valid_uuid(str(value).upper()))
+        self.assertFalse(valid_uuid("{{{}}}".format(value)))
+        self.assertFalse(valid_uuid(str(value) + "\n"))
+        self.assertFalse(valid_uuid(""))
@@ -0,0 +1,207 @@
+import itertools
+import json
+import uuid
+from typing import Any
+from unittest import mock
+
+import httpx
+import requests_mock
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from zapip import urls
+from zapip.batch import BatchError, parse_operations
+from zapip.limits import reset_limiter
+from zapip.models import Application, ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+from zapip.tests.test_views_async import FakeZoom
+
+urlpatterns = urls.async_urlpatterns
+
+
+@override_settings(HEADER_AUTH=None)
+class BatchTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.meeting_ids = itertools.count(self.meeting_id)
+
+    def mock_create(self, mock: Any, user_id: str):
+        mock.post(
+            self.zoom_url("/v2/users/{}/meetings".format(user_id)),
+            status_code=201,
+            json=lambda request, context: {"id": next(self.meeting_ids)},
+            headers={"content-type": "application/json"},
+        )
+
+    def batch(self, operations: Any):
+        return self.client.post(
+            "/zoom/v2/batch",
+            data=json.dumps({"operations": operations}),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+
+    @requests_mock.Mocker()
+    def test_creates_meetings_with_one_insert(self, mock: Any):
+        self.mock_create(mock, "a@example.com")
+        self.mock_create(mock, "b@example.com")
+        operations = [
+            {"method": "create", "user_id": "a@example.com", "body": {"topic": "A"}},
+            {"method": "create", "user_id": "b@example.com", "body": {"topic": "B"}},
+            {"method": "create", "user_id": "a@example.com", "body": {"topic": "C"}},
+        ]
+        Application.objects.create(external_id=self.application_id)
+        with self.assertNumQueries(2):
+            # application lookup, bulk insert
+            response = self.batch(operations)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [201, 201, 201])
+        self.assertEqual({r["source"] for r in results}, {"zoom"})
+        ids = {r["body"]["id"] for r in results}
+        self.assertEqual(
+            set(ZoomMeeting.objects.values_list("meeting_id", flat=True)), ids
+        )
+
+    @requests_mock.Mocker()
+    def test_skips_created_meetings_without_an_id(self, mock: Any):
+        self.mock_create(mock, "a@example.com")
+        mock.post(
+            self.zoom_url("/v2/users/b@example.com/meetings"),
+            status_code=201,
+            text="Created",
+        )
+        mock.post(
+            self.zoom_url("/v2/users/c@example.com/meetings"),
+            status_code=201,
+            json={"id": "123"},
+        )
+        operations = [
+            {"method": "create", "user_id": "a@example.com"},
+            {"method": "create", "user_id": "b@example.com"},
+            {"method": "create", "user_id": "c@example.com"},
+        ]
+        with self.assertLogs("zapip.batch", "WARNING"):
+            response = self.batch(operations)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [201, 201, 201])
+        self.assertEqual(results[1]["body"], "Created")
+        self.assertEqual(
+            list(ZoomMeeting.objects.values_list("meeting_id", flat=True)),
+            [self.meeting_id],
+        )
+
+    @requests_mock.Mocker()
+    def test_each_operation_takes_a_rate_token(self, mock: Any):
+        reset_limiter()
+        self.mock_create(mock, "a@example.com")
+        Application.objects.create(
+            external_id=self.application_id, rate_limit=0.1, rate_burst=2
+        )
+        operations = [
+            {"method": "create", "user_id": "a@example.com"},
+            {"method": "create", "user_id": "a@example.com"},
+            {"method": "create", "user_id": "a@example.com"},
+            {"method": "create", "user_id": "me"},
+        ]
+        response = self.batch(operations)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [201, 201, 429, 403])
+        self.assertEqual(results[2]["body"]["error"], "application-throttled")
+        self.assertGreaterEqual(results[2]["retry_after"], 9)
+        self.assertEqual(ZoomMeeting.objects.count(), 2)
+        response = self.batch(operations[:1])
+        self.assertEqual(response.status_code, 429)
+
+    @requests_mock.Mocker()
+    def test_checks_ownership_per_operation(self, mock: Any):
+        self._create_meeting(mock)
+        url = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(
+            url,
+            json={"id": self.meeting_id},
+            headers={"content-type": "application/json"},
+        )
+        mock.delete(url, status_code=204)
+        operations = [
+            {"method": "get", "meeting_id": self.meeting_id},
+            {"method": "get", "meeting_id": 1},
+            {"method": "delete", "meeting_id": self.meeting_id},
+            {"method": "create", "user_id": "me"},
+        ]
+        response = self.batch(operations)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [200, 403, 204, 403])
+        self.assertEqual(results[0]["body"], {"id": self.meeting_id})
+        self.assertEqual(results[1]["body"]["error"], "unknown-meeting-id")
+        self.assertIsNone(results[2]["body"])
+        self.assertEqual(results[3]["body"]["error"], "forbidden-user-id")
+
+    def test_does_not_touch_meetings_of_other_applications(self):
+        other = Application.objects.create(external_id=str(uuid.uuid4()))
+        ZoomMeeting.objects.create(
+            user_id=self.user_id, meeting_id=self.meeting_id, application=other
+        )
+        response = self.batch([{"method": "delete", "meeting_id": self.meeting_id}])
+        self.assertEqual(response.json()["results"][0]["status"], 403)
+
+    @override_settings(ZAPIP_BATCH_MAX_OPERATIONS=2)
+    def test_rejects_invalid_batches(self):
+        invalid = [
+            [],
+            [{"method": "create"}],
+            [{"method": "get", "meeting_id": "1"}],
+            [{"method": "launch", "meeting_id": 1}],
+            [{"method": "get", "meeting_id": 1}] * 3,
+        ]
+        for operations in invalid:
+            with self.subTest(operations=operations):
+                response = self.batch(operations)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["error"], "invalid-batch")
+
+    def test_parse_operations(self):
+        operations = parse_operations(
+            b'{"operations": [{"method": "update", "meeting_id": 1, "body": {}}]}'
+        )
+        self.assertEqual(operations[0].meeting_id, 1)
+        self.assertEqual(operations[0].body, b"{}")
+        self.assertRaises(BatchError, parse_operations, b"not json")
+
+
+@override_settings(HEADER_AUTH=None, ROOT_URLCONF=__name__)
+class AsyncBatchTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = AsyncClient()
+        self.zoom = FakeZoom(self.meeting_id)
+        patcher = mock.patch(
+            "zapip.batch.get_async_zoom_client", side_effect=self.zoom.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def gateway_headers(self):
+        return {
+            "X_API": self.api_id,
+            "X_API_APPLICATION": self.application_id,
+            "X_API_SUBSCRIPTION": self.subscription_id,
+        }
+
+    async def test_runs_operations(self):
+        operations = [
+            {"method": "create", "user_id": self.user_id, "body": {"topic": "A"}},
+            {"method": "get", "meeting_id": self.meeting_id},
+        ]
+        response = await self.client.post(
+            "/zoom/v2/batch",
+            data=json.dumps({"operations": operations}),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [201, 403])
+        self.assertTrue(
+            await ZoomMeeting.objects.filter(meeting_id=self.meeting_id).aexists()
+        )
+        self.assertIsInstance(self.zoom.requests[0], httpx.Request)
+        self.assertEqual(json.loads(self.zoom.requests[0].content), {"topic": "A"})
@@ -0,0 +1,67 @@
+import requests
+from django.test import TestCase
+from django.test.utils import override_settings
+from zapip.benchmark import (
+    Benchmark,
+    FakeZoomServer,
+    benchmark_settings,
+    compare,
+    percentile,
+)
+from zapip.cache import reset_caches
+
+
+class FakeZoomServerTestCase(TestCase):
+    def test_answers_meeting_endpoints(self):
+        with FakeZoomServer(payload_size=10) as server:
+            created = requests.post(server.url + "v2/users/foo/meetings", json={})
+            meeting_id = created.json()["id"]
+            fetched = requests.get(server.url + "v2/meetings/{}".format(meeting_id))
+            deleted = requests.delete(server.url + "v2/meetings/{}".format(meeting_id))
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(fetched.json()["agenda"], "x" * 10)
+        self.assertEqual(deleted.status_code, 204)
+
+
+class BenchmarkTestCase(TestCase):
+    def test_runs_layers(self):
+        with FakeZoomServer() as server:
+            with override_settings(**benchmark_settings(server)):
+                reset_caches()
+                results = Benchmark(
+                    server,
+                    iterations=3,
+                    warmup=1,
+                    layers=["gateway_headers", "orm", "get_meeting"],
+                ).run()
+        self.assertEqual(list(results), ["gateway_headers", "orm", "get_meeting"])
+        self.assertEqual(results["get_meeting"]["count"], 3)
+        self.assertGreater(results["get_meeting"]["p50"], 0)
+
+    def test_follows_gateway_header_settings(self):
+        with FakeZoomServer() as server:
+            with override_settings(
+                GATEWAY_APPLICATION_ID_HEADER="X-Other-Application",
+                **benchmark_settings(server)
+            ):
+                reset_caches()
+                results = Benchmark(
+                    server, iterations=1, warmup=0, layers=["get_meeting"]
+                ).run()
+        self.assertEqual(results["get_meeting"]["count"], 1)
+
+    def test_percentile(self):
+        samples = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([], 50), 0)
+        samples = [float(i) for i in range(1, 26)]
+        self.assertEqual(percentile(samples[:5], 50), 3)
+        self.assertEqual(percentile(samples, 90), 23)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"orm": {"p50": 1.0, "p95": 2.0, "p99": 3.0}}
+        results = {"orm": {"p50": 1.05, "p95": 2.5, "p99": 3.0}}
+        rows = compare(baseline, results, threshold=0.1)
+        regressions = [r["percentile"] for r in rows if r["regression"]]
+        self.assertEqual(regressions, ["p95"])
@@ -0,0 +1,140 @@
+import uuid
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.db import IntegrityError
+from zapip.cache import (
+    LRUCache,
+    forget_meeting_owner,
+    get_application,
+    is_meeting_owner,
+    remember_meeting_owner,
+    reset_caches,
+)
+from zapip.models import Application, ZoomMeeting
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LRUCacheTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache: LRUCache[str] = LRUCache(maxsize=2, ttl=10, clock=self.clock)
+
+    def test_get_returns_set_value(self):
+        self.cache.set("a", "A")
+        self.assertEqual(self.cache.get("a"), "A")
+        self.assertIsNone(self.cache.get("b"))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set("a", "A")
+        self.cache.set("b", "B")
+        self.cache.get("a")
+        self.cache.set("c", "C")
+        self.assertEqual(self.cache.get("a"), "A")
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(len(self.cache), 2)
+
+    def test_entries_expire(self):
+        self.cache.set("a", "A")
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_set_ignored_if_invalidated_since_generation(self):
+        generation = self.cache.generation
+        self.cache.delete("a")
+        self.cache.set("a", "stale", generation=generation)
+        self.assertIsNone(self.cache.get("a"))
+
+    def test_zero_maxsize_disables_cache(self):
+        cache: LRUCache[str] = LRUCache(maxsize=0, ttl=10)
+        cache.set("a", "A")
+        self.assertIsNone(cache.get("a"))
+
+
+class ApplicationCacheTestCase(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.external_id = str(uuid.uuid4())
+
+    def test_creates_application(self):
+        application = get_application(self.external_id)
+        self.assertTrue(
+            Application.objects.filter(
+                pk=application.pk, external_id=self.external_id
+            ).exists()
+        )
+
+    def test_second_lookup_is_cached(self):
+        application = get_application(self.external_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_application(self.external_id), application)
+
+    def test_save_invalidates(self):
+        application = get_application(self.external_id)
+        application.name = "Renamed"
+        application.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_application(self.external_id).name, "Renamed")
+
+    def test_delete_invalidates(self):
+        application = get_application(self.external_id)
+        application.delete()
+        self.assertNotEqual(get_application(self.external_id).pk, application.pk)
+
+    @override_settings(ZAPIP_APPLICATION_CACHE_SIZE=0)
+    def test_can_be_disabled(self):
+        get_application(self.external_id)
+        with self.assertNumQueries(1):
+            get_application(self.external_id)
+
+
+class MeetingOwnerCacheTestCase(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.application = Application.objects.create(external_id=str(uuid.uuid4()))
+        self.other_application = Application.objects.create(
+            external_id=str(uuid.uuid4())
+        )
+        self.meeting = ZoomMeeting.objects.create(
+            application=self.application, user_id="foo", meeting_id=1234
+        )
+
+    def test_owner_lookup_is_cached(self):
+        self.assertTrue(is_meeting_owner(self.application, 1234))
+        with self.assertNumQueries(0):
+            self.assertTrue(is_meeting_owner(self.application, 1234))
+
+    def test_remembered_meeting_needs_no_query(self):
+        remember_meeting_owner(self.meeting)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_meeting_owner(self.application, 1234))
+
+    def test_other_application_is_not_owner(self):
+        remember_meeting_owner(self.meeting)
+        self.assertFalse(is_meeting_owner(self.other_application, 1234))
+        self.assertFalse(is_meeting_owner(self.application, 5678))
+
+    def test_forget_meeting_owner(self):
+        remember_meeting_owner(self.meeting)
+        forget_meeting_owner(1234)
+        with self.assertNumQueries(1):
+            is_meeting_owner(self.application, 1234)
+
+    def test_moving_meeting_invalidates(self):
+        remember_meeting_owner(self.meeting)
+        self.meeting.application = self.other_application
+        self.meeting.save()
+        self.assertFalse(is_meeting_owner(self.application, 1234))
+
+    def test_meeting_id_unique_per_application(self):
+        with self.assertRaises(IntegrityError):
+            ZoomMeeting.objects.create(
+                application=self.application, user_id="bar", meeting_id=1234
+            )
@@ -0,0 +1,210 @@
+import gzip
+import json
+import uuid
+from typing import Any
+from unittest import mock
+
+import httpx
+import requests_mock
+from django.core.cache import caches
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from zapip import compression, urls
+from zapip.models import ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+from zapip.zoom import AsyncZoomClient
+
+urlpatterns = urls.async_urlpatterns
+
+PAYLOAD = {"id": 12340001234, "agenda": "x" * 4000}
+
+
+class NegotiationTestCase(SimpleTestCase):
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            compression.parse_accept_encoding("gzip, br;q=0.5, *;q=0"),
+            {"gzip": 1.0, "br": 0.5, "*": 0.0},
+        )
+
+    def test_accepts(self):
+        self.assertTrue(compression.accepts("gzip, deflate", "gzip"))
+        self.assertFalse(compression.accepts("gzip;q=0", "gzip"))
+        self.assertTrue(compression.accepts("*", "deflate"))
+        self.assertFalse(compression.accepts(None, "gzip"))
+
+    def test_choose_encoding(self):
+        self.assertEqual(compression.choose_encoding("gzip"), "gzip")
+        self.assertIsNone(compression.choose_encoding("identity"))
+        self.assertIsNone(compression.choose_encoding(None))
+        if "br" in compression.RESPONSE_ENCODINGS:
+            self.assertEqual(compression.choose_encoding("gzip, br"), "br")
+            self.assertEqual(compression.choose_encoding("gzip, br;q=0.5"), "gzip")
+
+    def test_upstream_accept_encoding(self):
+        self.assertEqual(compression.upstream_accept_encoding("gzip"), "gzip")
+        self.assertEqual(compression.upstream_accept_encoding("zstd"), "identity")
+        self.assertIsNone(compression.upstream_accept_encoding(None))
+
+
+@override_settings(HEADER_AUTH=None)
+class CompressedResponseTestCase(ZapipTestCase):
+    def get(self, mock: Any, accept_encoding: str, **kwargs: Any):
+        if not ZoomMeeting.objects.exists():
+            self._create_meeting(mock)
+        mock.get(self.zoom_url("/v2/meetings/{}".format(self.meeting_id)), **kwargs)
+        return self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            HTTP_ACCEPT_ENCODING=accept_encoding,
+            **self.gateway_headers()
+        )
+
+    @requests_mock.Mocker()
+    def test_compresses_response_once_for_client(self, mock: Any):
+        response = self.get(mock, "gzip", json=PAYLOAD)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), PAYLOAD)
+        self.assertEqual(mock.last_request.headers["Accept-Encoding"], "gzip")
+
+    @requests_mock.Mocker()
+    def test_small_or_unaccepted_responses_are_not_compressed(self, mock: Any):
+        response = self.get(mock, "gzip", json={"id": self.meeting_id})
+        self.assertNotIn("Content-Encoding", response)
+        response = self.get(mock, "identity", json=PAYLOAD)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(mock.last_request.headers["Accept-Encoding"], "identity")
+
+    @override_settings(ZAPIP_STREAM_RESPONSES=True)
+    @requests_mock.Mocker()
+    def test_streamed_response_is_relayed_compressed(self, mock: Any):
+        body = gzip.compress(json.dumps(PAYLOAD).encode())
+        response = self.get(
+            mock,
+            "gzip, deflate",
+            content=body,
+            headers={"Content-Encoding": "gzip", "Content-Length": str(len(body))},
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Length"], str(len(body)))
+        self.assertEqual(b"".join(response.streaming_content), body)
+
+    @override_settings(ZAPIP_STREAM_RESPONSES=True)
+    @requests_mock.Mocker()
+    def test_streamed_response_is_decoded_for_other_clients(self, mock: Any):
+        body = gzip.compress(json.dumps(PAYLOAD).encode())
+        response = self.get(
+            mock, "br;q=0", content=body, headers={"Content-Encoding": "gzip"}
+        )
+        self.assertNotIn("Content-Encoding", response)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), PAYLOAD)
+
+    @override_settings(ZAPIP_STREAM_RESPONSES=True)
+    @requests_mock.Mocker()
+    def test_compressed_create_response_is_relayed(self, mock: Any):
+        body = gzip.compress(json.dumps(PAYLOAD).encode())
+        mock.post(
+            self.zoom_url("/v2/users/{}/meetings".format(self.user_id)),
+            status_code=201,
+            content=body,
+            headers={"Content-Encoding": "gzip", "Content-Length": str(len(body))},
+        )
+        response = self.client.post(
+            "/zoom/v2/users/{}/meetings".format(self.user_id),
+            data={"topic": "Test"},
+            HTTP_ACCEPT_ENCODING="gzip",
+            **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Content-Encoding", response)
+        self.assertNotIn("Content-Length", response)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), PAYLOAD)
+        self.assertTrue(ZoomMeeting.objects.filter(meeting_id=PAYLOAD["id"]).exists())
+
+
+@override_settings(
+    HEADER_AUTH=None,
+    ZAPIP_RESPONSE_CACHE_TTLS={"get_meeting": 60},
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "zapip-compression-tests",
+        }
+    },
+)
+class CompressedHitTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+
+    def get(self, **extra: Any):
+        return self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            HTTP_ACCEPT_ENCODING="gzip",
+            **self.gateway_headers(),
+            **extra
+        )
+
+    def assertCompressed(self, response: Any):
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Content-Length"], str(len(response.content)))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), PAYLOAD)
+
+    @requests_mock.Mocker()
+    def test_cache_hit_is_compressed(self, mock: Any):
+        self._create_meeting(mock)
+        mock.get(self.zoom_url("/v2/meetings/{}".format(self.meeting_id)), json=PAYLOAD)
+        self.get()
+        response = self.get()
+        self.assertEqual(response["X-Zapip-Cache"], "HIT")
+        self.assertCompressed(response)
+        self.assertTrue(response["ETag"].startswith("W/"))
+        response = self.get(HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(ZAPIP_RESPONSE_CACHE_TTLS={}, ZAPIP_MEETING_MIRROR=True)
+    @requests_mock.Mocker()
+    def test_mirror_hit_is_compressed(self, mock: Any):
+        self._create_meeting(mock)
+        mock.get(self.zoom_url("/v2/meetings/{}".format(self.meeting_id)), json=PAYLOAD)
+        self.get()
+        response = self.get(HTTP_X_ZAPIP_ACCEPT_STALE="60")
+        self.assertEqual(response["X-Zapip-Mirror"], "HIT")
+        self.assertCompressed(response)
+
+
+@override_settings(HEADER_AUTH=None, ROOT_URLCONF=__name__, ZAPIP_STREAM_RESPONSES=True)
+class AsyncCompressedResponseTestCase(TestCase):
+    def setUp(self):
+        body = gzip.compress(json.dumps(PAYLOAD).encode())
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(
+                201, content=body, headers={"Content-Encoding": "gzip"}
+            )
+
+        zoom = AsyncZoomClient(
+            url="https://zoom.example.com/",
+            headers={},
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        )
+        patcher = mock.patch(
+            "zapip.views.get_async_zoom_client", side_effect=lambda: zoom
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_compressed_create_response_is_relayed(self):
+        response = await AsyncClient().post(
+            "/zoom/v2/users/foo@example.com/meetings",
+            data=json.dumps({"topic": "Test"}),
+            content_type="application/json",
+            ACCEPT_ENCODING="gzip",
+            X_API=str(uuid.uuid4()),
+            X_API_APPLICATION=str(uuid.uuid4()),
+            X_API_SUBSCRIPTION=str(uuid.uuid4()),
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn("Content-Encoding", response)
+        body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(json.loads(body), PAYLOAD)
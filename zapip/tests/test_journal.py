@@ -0,0 +1,177 @@
+import asyncio
+import os
+import tempfile
+import threading
+from io import StringIO
+from typing import Any
+from unittest import mock
+
+import requests_mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from zapip.cache import reset_caches
+from zapip.journal import (
+    MeetingJournal,
+    ajournalled_owners,
+    arecord_meetings,
+    get_journal,
+)
+from zapip.models import Application, ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_WRITE_BEHIND=True)
+class WriteBehindTestCase(ZapipTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "journal.sqlite3")
+        settings = self.settings(
+            ZAPIP_WRITE_BEHIND_JOURNAL=self.path, ZAPIP_WRITE_BEHIND_INTERVAL=0
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+    @requests_mock.Mocker()
+    def test_create_journals_meeting_instead_of_inserting(self, mock: Any):
+        response = self._create_meeting(mock)
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(ZoomMeeting.objects.exists())
+        self.assertEqual(get_journal().pending(), 1)
+
+    @requests_mock.Mocker()
+    def test_journalled_meeting_is_authorized_after_cache_reset(self, mock: Any):
+        self._create_meeting(mock)
+        reset_caches()
+        url = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(url, json={"id": self.meeting_id})
+        response = self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @requests_mock.Mocker()
+    def test_journalled_meeting_of_other_application_is_denied(self, mock: Any):
+        self._create_meeting(mock)
+        reset_caches()
+        self.application_id = "00000000-0000-0000-0000-000000000000"
+        response = self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @requests_mock.Mocker()
+    def test_deleted_journalled_meeting_is_discarded(self, mock: Any):
+        self._create_meeting(mock)
+        path = "/zoom/v2/meetings/{}".format(self.meeting_id)
+        mock.delete(self.zoom_url(path[5:]), status_code=204)
+        response = self.client.delete(path, **self.gateway_headers())
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(get_journal().pending(), 0)
+        response = self.client.get(path, **self.gateway_headers())
+        self.assertEqual(response.status_code, 403)
+
+    @requests_mock.Mocker()
+    def test_flush_command_inserts_meetings(self, mock: Any):
+        self._create_meeting(mock)
+        stdout = StringIO()
+        call_command("flush_meeting_journal", stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), "Flushed 1 meetings")
+        meeting = ZoomMeeting.objects.get()
+        self.assertEqual(meeting.meeting_id, self.meeting_id)
+        self.assertEqual(meeting.user_id, self.user_id)
+        self.assertEqual(get_journal().pending(), 0)
+
+    def test_async_accessors_keep_journal_off_the_event_loop(self):
+        application = Application.objects.create(external_id=self.application_id)
+        meeting = ZoomMeeting(
+            user_id=self.user_id, meeting_id=self.meeting_id, application=application
+        )
+        threads = []
+
+        def record(method: Any) -> Any:
+            def wrapper(*args: Any) -> Any:
+                threads.append(threading.get_ident())
+                return method(*args)
+
+            return wrapper
+
+        async def main():
+            loop_thread = threading.get_ident()
+            await arecord_meetings([meeting])
+            owners = await ajournalled_owners([self.meeting_id])
+            return loop_thread, owners
+
+        journal = get_journal()
+        with mock.patch.object(
+            journal, "append", record(journal.append)
+        ), mock.patch.object(journal, "owners", record(journal.owners)):
+            loop_thread, owners = asyncio.run(main())
+        self.assertEqual(owners, {self.meeting_id: application.pk})
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+
+
+class MeetingJournalTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = MeetingJournal(os.path.join(directory.name, "j.sqlite3"))
+        self.application = Application.objects.create(external_id="app")
+
+    def meetings(self, *meeting_ids: int):
+        return [
+            ZoomMeeting(user_id="u", meeting_id=m, application=self.application)
+            for m in meeting_ids
+        ]
+
+    def test_flushes_in_batches(self):
+        self.journal.append(self.meetings(1, 2, 3))
+        self.journal.append(self.meetings(4, 5))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.journal.flush(batch_size=2), 5)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(ZoomMeeting.objects.count(), 5)
+        self.assertEqual(self.journal.pending(), 0)
+
+    def test_flushing_twice_is_harmless(self):
+        self.journal.append(self.meetings(1))
+        ZoomMeeting.objects.bulk_create(self.meetings(1))
+        self.assertEqual(self.journal.flush(batch_size=10), 1)
+        self.assertEqual(ZoomMeeting.objects.count(), 1)
+
+    def test_owners(self):
+        self.journal.append(self.meetings(1, 2))
+        self.assertEqual(self.journal.owners([1, 3]), {1: self.application.pk})
+        self.assertEqual(self.journal.owners([]), {})
+
+
+class MeetingJournalFlushFailureTestCase(TransactionTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.journal = MeetingJournal(os.path.join(directory.name, "j.sqlite3"))
+
+    def test_drops_meetings_of_deleted_application(self):
+        kept = Application.objects.create(external_id="kept")
+        deleted = Application.objects.create(external_id="deleted")
+        self.journal.append(
+            [
+                ZoomMeeting(user_id="u", meeting_id=1, application=kept),
+                ZoomMeeting(user_id="u", meeting_id=2, application=deleted),
+                ZoomMeeting(user_id="u", meeting_id=3, application=kept),
+            ]
+        )
+        deleted.delete()
+        with self.assertLogs("zapip.journal", "WARNING") as logs:
+            self.assertEqual(self.journal.flush(batch_size=10), 3)
+        self.assertIn("meeting_id=2", logs.output[0])
+        self.assertEqual(
+            sorted(ZoomMeeting.objects.values_list("meeting_id", flat=True)), [1, 3]
+        )
+        self.assertEqual(self.journal.pending(), 0)
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from zapip.limits import ApplicationSlots, reset_limiter
+from zapip.models import Application
+from zapip.tests.test_views import ZapipTestCase
+
+
+class ApplicationSlotsTestCase(SimpleTestCase):
+    def test_admits_up_to_max_concurrency(self):
+        slots = ApplicationSlots(max_concurrency=2, queue_size=0)
+        self.assertTrue(slots.acquire(0))
+        self.assertTrue(slots.acquire(0))
+        self.assertFalse(slots.acquire(0))
+        slots.release()
+        self.assertTrue(slots.acquire(0))
+
+    def test_queued_request_times_out(self):
+        slots = ApplicationSlots(max_concurrency=1, queue_size=1)
+        slots.acquire(0)
+        started = time.monotonic()
+        self.assertFalse(slots.acquire(0.05))
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        slots.release()
+        self.assertEqual(slots.in_flight, 0)
+
+    def test_released_slot_goes_to_waiters_in_order(self):
+        slots = ApplicationSlots(max_concurrency=1, queue_size=2)
+        slots.acquire(0)
+        admitted = []
+
+        def wait(name):
+            slots.acquire(5)
+            admitted.append(name)
+
+        threads = []
+        for name in ("first", "second"):
+            thread = threading.Thread(target=wait, args=(name,))
+            thread.start()
+            threads.append(thread)
+            while len(slots._waiters) < len(threads):
+                time.sleep(0.001)
+        # a newcomer may not overtake the queue
+        self.assertFalse(slots.acquire(0))
+        slots.release()
+        threads[0].join()
+        slots.release()
+        threads[1].join()
+        self.assertEqual(admitted, ["first", "second"])
+        self.assertEqual(slots.in_flight, 1)
+
+    def test_async_waiter_is_woken_on_release(self):
+        slots = ApplicationSlots(max_concurrency=1, queue_size=1)
+
+        async def run():
+            slots.acquire(0)
+            waiter = asyncio.ensure_future(slots.aacquire(5))
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+            slots.release()
+            return await waiter
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(slots.in_flight, 1)
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_APPLICATION_QUEUE_TIMEOUT=0.01)
+class ApplicationLimitsTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        reset_limiter()
+        self.application = Application.objects.create(external_id=self.application_id)
+
+    def get(self):
+        return self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+
+    def test_rate_limit_from_application(self):
+        self.application.rate_limit = 0.1
+        self.application.rate_burst = 1
+        self.application.save()
+        self.assertEqual(self.get().status_code, 403)
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()["error"], "application-throttled")
+        self.assertEqual(response["X-Zapip-Response-From"], "zapip")
+        self.assertGreaterEqual(int(response["Retry-After"]), 9)
+
+    @override_settings(ZAPIP_APPLICATION_RATE_LIMIT=0.1)
+    def test_rate_limit_is_per_application(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get().status_code, 429)
+        self.application_id = "00000000-0000-0000-0000-000000000000"
+        self.assertEqual(self.get().status_code, 403)
+
+    def test_concurrency_limit_from_application(self):
+        self.application.max_concurrency = 0
+        self.application.save()
+        response = self.get()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+    def test_listing_is_not_limited(self):
+        self.application.max_concurrency = 0
+        self.application.save()
+        response = self.client.get("/zoom/v2/meetings", **self.gateway_headers())
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,119 @@
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.utils import timezone
+from zapip import listing, urls
+from zapip.models import Application, ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+
+urlpatterns = urls.async_urlpatterns
+
+
+@override_settings(HEADER_AUTH=None)
+class ListMeetingsTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.application = Application.objects.create(external_id=self.application_id)
+        for meeting_id in range(1, 6):
+            ZoomMeeting.objects.create(
+                application=self.application,
+                user_id=self.user_id if meeting_id % 2 else "bar@example.com",
+                meeting_id=meeting_id,
+            )
+        other = Application.objects.create(external_id="other")
+        ZoomMeeting.objects.create(
+            application=other, user_id=self.user_id, meeting_id=9
+        )
+
+    def list(self, path="/zoom/v2/meetings", **params):
+        return self.client.get(path, params, **self.gateway_headers())
+
+    def list_all(self, path="/zoom/v2/meetings", **params):
+        meeting_ids = []
+        while True:
+            data = self.list(path, **params).json()
+            meeting_ids += [meeting["id"] for meeting in data["meetings"]]
+            if not data["next_page_token"]:
+                return meeting_ids
+            params["next_page_token"] = data["next_page_token"]
+
+    def test_lists_meetings_of_application_in_pages(self):
+        response = self.list(page_size=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Zapip-Response-From"], "zapip")
+        data = response.json()
+        self.assertEqual(data["page_size"], 2)
+        self.assertEqual([m["id"] for m in data["meetings"]], [1, 2])
+        self.assertTrue(data["next_page_token"])
+        self.assertEqual(self.list_all(page_size=2), [1, 2, 3, 4, 5])
+
+    def test_lists_meetings_of_user(self):
+        path = "/zoom/v2/users/{}/meetings".format(self.user_id)
+        self.assertEqual(self.list_all(path, page_size=1), [1, 3, 5])
+
+    def test_pages_through_meetings_created_at_the_same_time(self):
+        ZoomMeeting.objects.update(created=timezone.now())
+        self.assertEqual(self.list_all(page_size=2), [1, 2, 3, 4, 5])
+
+    def test_includes_mirrored_details(self):
+        ZoomMeeting.objects.filter(meeting_id=1).update(mirror={"topic": "Mirrored"})
+        meeting = self.list(page_size=1).json()["meetings"][0]
+        self.assertEqual(meeting["topic"], "Mirrored")
+        self.assertEqual(meeting["user_id"], self.user_id)
+
+    def test_invalid_query_parameters(self):
+        for params in (
+            {"page_size": "x"},
+            {"page_size": "0"},
+            {"next_page_token": "x"},
+        ):
+            response = self.list(**params)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json()["error"], "invalid-query-parameter")
+
+    def test_user_id_me_is_forbidden(self):
+        response = self.list("/zoom/v2/users/me/meetings")
+        self.assertEqual(response.status_code, 403)
+
+    def test_each_page_is_one_query(self):
+        page = listing.parse_page({"page_size": "2"})
+        with self.assertNumQueries(1):
+            data = listing.list_meetings(self.application, None, page)
+        page = listing.parse_page({"next_page_token": data["next_page_token"]})
+        with self.assertNumQueries(1):
+            listing.list_meetings(self.application, None, page)
+
+
+@override_settings(HEADER_AUTH=None, ROOT_URLCONF=__name__)
+class AsyncListMeetingsTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = AsyncClient()
+        application = Application.objects.create(external_id=self.application_id)
+        for meeting_id in range(1, 4):
+            ZoomMeeting.objects.create(
+                application=application, user_id=self.user_id, meeting_id=meeting_id
+            )
+
+    def gateway_headers(self):
+        return {
+            "X_API": self.api_id,
+            "X_API_APPLICATION": self.application_id,
+            "X_API_SUBSCRIPTION": self.subscription_id,
+        }
+
+    async def test_lists_meetings_of_user(self):
+        response = await self.client.get(
+            "/zoom/v2/users/{}/meetings".format(self.user_id),
+            {"page_size": 2},
+            **self.gateway_headers()
+        )
+        data = response.json()
+        self.assertEqual([m["id"] for m in data["meetings"]], [1, 2])
+        response = await self.client.get(
+            "/zoom/v2/meetings",
+            {"next_page_token": data["next_page_token"]},
+            **self.gateway_headers()
+        )
+        data = response.json()
+        self.assertEqual([m["id"] for m in data["meetings"]], [3])
+        self.assertEqual(data["next_page_token"], "")
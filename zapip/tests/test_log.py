@@ -0,0 +1,105 @@
+import json
+import logging
+from io import StringIO
+from typing import Any
+
+import requests_mock
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from pythonjsonlogger.jsonlogger import JsonFormatter
+from zapip import metrics
+from zapip.log import QueueStreamHandler, SampleSuccessFilter
+from zapip.tests.test_views import ZapipTestCase
+
+
+class QueueStreamHandlerTestCase(SimpleTestCase):
+    def setUp(self):
+        self.stream = StringIO()
+        self.handler = QueueStreamHandler(self.stream)
+        self.handler.setFormatter(JsonFormatter("%(levelname)s %(message)s"))
+        self.addCleanup(self.handler.close)
+        self.logger = logging.getLogger("zapip.tests.queue")
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def records(self):
+        self.handler.flush()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_writes_json_in_background(self):
+        self.logger.warning("hello %s", "world", extra={"status": 200})
+        [record] = self.records()
+        self.assertEqual(record["message"], "hello world")
+        self.assertEqual(record["levelname"], "WARNING")
+        self.assertEqual(record["status"], 200)
+
+    def test_counts_dropped_records(self):
+        handler = QueueStreamHandler(StringIO(), maxsize=1)
+        handler.listener.stop()
+        self.addCleanup(handler.close)
+        dropped = metrics.log_records_dropped_total.get()
+        record = logging.makeLogRecord({"msg": "hello"})
+        for _ in range(3):
+            handler.handle(record)
+        self.assertEqual(handler.dropped, 2)
+        self.assertEqual(metrics.log_records_dropped_total.get(), dropped + 2)
+        self.assertIn("zapip_log_records_dropped_total", metrics.registry.render())
+
+    def test_renders_exceptions_before_enqueueing(self):
+        try:
+            raise RuntimeError("boom")
+        except RuntimeError:
+            self.logger.exception("failed")
+        [record] = self.records()
+        self.assertIn("RuntimeError: boom", record["exc_info"])
+
+
+class SampleSuccessFilterTestCase(SimpleTestCase):
+    def record(self, status: int) -> logging.LogRecord:
+        record = logging.LogRecord("zapip.access", logging.INFO, "", 0, "", (), None)
+        record.status = status
+        return record
+
+    @override_settings(ZAPIP_ACCESS_LOG_SAMPLE_RATE=0.0)
+    def test_drops_successes_and_keeps_failures(self):
+        sample = SampleSuccessFilter()
+        self.assertFalse(sample.filter(self.record(200)))
+        self.assertTrue(sample.filter(self.record(403)))
+        self.assertTrue(sample.filter(self.record(503)))
+
+    def test_keeps_everything_by_default(self):
+        self.assertTrue(SampleSuccessFilter().filter(self.record(200)))
+
+
+@override_settings(HEADER_AUTH=None)
+class AccessLogTestCase(ZapipTestCase):
+    @requests_mock.Mocker()
+    def test_one_record_per_request_with_upstream_timings(self, mock: Any):
+        self._create_meeting(mock)
+        mock.get(
+            self.zoom_url("/v2/meetings/{}".format(self.meeting_id)),
+            json={"id": self.meeting_id},
+        )
+        with self.assertLogs("zapip.access") as logs:
+            self.client.get(
+                "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+            )
+        [record] = logs.records
+        self.assertEqual(record.method, "GET")
+        self.assertEqual(record.route, "zoom/v2/meetings/<int:meeting_id>")
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.source, "zoom")
+        self.assertEqual(record.application, self.application_id)
+        self.assertEqual(record.upstream_calls, 1)
+        self.assertGreaterEqual(record.duration_ms, record.upstream_ms)
+
+    def test_rejected_request_has_no_upstream_calls(self):
+        with self.assertLogs("zapip.access") as logs:
+            self.client.get(
+                "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+            )
+        [record] = logs.records
+        self.assertEqual(record.status, 403)
+        self.assertEqual(record.source, "zapip")
+        self.assertEqual(record.upstream_calls, 0)
@@ -0,0 +1,94 @@
+from typing import Any
+
+import requests_mock
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from zapip import metrics
+from zapip.tests.test_views import ZapipTestCase
+
+ROUTE = "zoom/v2/users/<str:user_id>/meetings"
+
+
+class RegistryTestCase(SimpleTestCase):
+    def test_renders_counters_and_histograms(self):
+        registry = metrics.Registry()
+        counter = registry.counter("c_total", "A counter.", ["a"])
+        histogram = registry.histogram("h_seconds", "A histogram.", ["a"], [0.1, 1])
+        counter.inc('x"y')
+        counter.inc('x"y', amount=2)
+        histogram.observe(0.05, "x")
+        histogram.observe(0.5, "x")
+        histogram.observe(5, "x")
+        text = registry.render()
+        self.assertIn("# TYPE c_total counter\n", text)
+        self.assertIn('c_total{a="x\\"y"} 3\n', text)
+        self.assertIn('h_seconds_bucket{a="x",le="0.1"} 1\n', text)
+        self.assertIn('h_seconds_bucket{a="x",le="1"} 2\n', text)
+        self.assertIn('h_seconds_bucket{a="x",le="+Inf"} 3\n', text)
+        self.assertIn('h_seconds_sum{a="x"} 5.55\n', text)
+        self.assertIn('h_seconds_count{a="x"} 3\n', text)
+
+    def test_clear(self):
+        registry = metrics.Registry()
+        counter = registry.counter("c_total", "A counter.")
+        counter.inc()
+        registry.clear()
+        self.assertEqual(counter.get(), 0)
+
+
+@override_settings(HEADER_AUTH=None)
+class MetricsTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.registry.clear()
+
+    @requests_mock.Mocker()
+    def test_records_requests_by_route(self, mock: Any):
+        self._create_meeting(mock)
+        self.assertEqual(metrics.requests_total.get(ROUTE, "POST", "201"), 1)
+        self.assertEqual(metrics.request_duration.count(ROUTE, "POST"), 1)
+        self.assertEqual(metrics.request_db_queries.count(ROUTE, "POST"), 1)
+        self.assertEqual(
+            metrics.upstream_requests_total.get("create", "POST", "201"), 1
+        )
+        self.assertEqual(metrics.upstream_duration.count("create", "POST"), 1)
+
+    def test_unmatched_route(self):
+        self.client.get("/nothing/here")
+        self.assertEqual(metrics.requests_total.get("unmatched", "GET", "404"), 1)
+
+    @requests_mock.Mocker()
+    def test_metrics_endpoint(self, mock: Any):
+        self._create_meeting(mock)
+        response = self.client.get("/internal/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["content-type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'zapip_requests_total{{route="{}",method="POST",status="201"}} 1'.format(
+                ROUTE
+            ),
+            text,
+        )
+        self.assertIn('zapip_cache_misses_total{cache="application"}', text)
+        self.assertIn("# TYPE zapip_upstream_pool_idle_connections gauge", text)
+
+    @override_settings(ZAPIP_METRICS_ALLOWED_IPS=["192.0.2.1"])
+    def test_metrics_endpoint_is_restricted(self):
+        response = self.client.get("/internal/metrics")
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get("/internal/metrics", REMOTE_ADDR="192.0.2.1")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(ZAPIP_METRICS_CLIENT_IP_HEADER="HTTP_X_FORWARDED_FOR")
+    def test_metrics_endpoint_checks_forwarded_client(self):
+        response = self.client.get(
+            "/internal/metrics", HTTP_X_FORWARDED_FOR="127.0.0.1, 203.0.113.7"
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            "/internal/metrics", HTTP_X_FORWARDED_FOR="203.0.113.7, 127.0.0.1"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get("/internal/metrics")
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,59 @@
+from unittest import mock
+
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import AsyncClient, Client, TestCase
+from django.test.utils import override_settings
+from zapip import urls
+
+urlpatterns = urls.async_urlpatterns
+
+
+@override_settings(HEADER_AUTH=None)
+class LeanRouteMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.process_request = mock.patch.object(
+            SessionMiddleware,
+            "process_request",
+            autospec=True,
+            side_effect=SessionMiddleware.process_request,
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_api_routes_skip_session_middleware(self):
+        response = self.client.get("/zoom/v2/meetings/1234")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.get("x-zapip-response-from"), "zapip")
+        self.process_request.assert_not_called()
+
+    @override_settings(ALLOWED_HOSTS=["zapip.example.com"])
+    def test_api_routes_check_allowed_hosts(self):
+        response = self.client.get(
+            "/zoom/v2/meetings/1234", HTTP_HOST="evil.example.com"
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            "/zoom/v2/meetings/1234", HTTP_HOST="zapip.example.com"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(SECURE_SSL_REDIRECT=True)
+    def test_api_routes_keep_ssl_redirect(self):
+        response = self.client.get("/zoom/v2/meetings/1234")
+        self.assertEqual(response.status_code, 301)
+
+    def test_admin_uses_session_middleware(self):
+        self.client.get("/admin/")
+        self.process_request.assert_called_once()
+
+    def test_unresolved_api_path_uses_full_stack(self):
+        response = self.client.get("/zoom/v2/unknown")
+        self.assertEqual(response.status_code, 404)
+        self.process_request.assert_called_once()
+
+    @override_settings(ROOT_URLCONF=__name__)
+    async def test_async_api_routes_skip_session_middleware(self):
+        response = await AsyncClient().get("/zoom/v2/meetings/1234")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.get("x-zapip-response-from"), "zapip")
+        self.process_request.assert_not_called()
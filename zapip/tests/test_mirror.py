@@ -0,0 +1,183 @@
+import datetime
+import json
+import re
+from io import StringIO
+from typing import Any
+from unittest import mock
+
+import requests_mock
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.utils import timezone
+from zapip import mirror, urls
+from zapip.models import Application, ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+from zapip.tests.test_views_async import FakeZoom
+from zapip.zoom import get_zoom_client
+
+urlpatterns = urls.async_urlpatterns
+
+MEETING = {"id": 12340001234, "topic": "Interesting stuff", "duration": 60}
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_MEETING_MIRROR=True)
+class MeetingMirrorTestCase(ZapipTestCase):
+    def get(self, accept_stale=None, path=""):
+        headers = self.gateway_headers()
+        if accept_stale is not None:
+            headers["HTTP_X_ZAPIP_ACCEPT_STALE"] = accept_stale
+        return self.client.get(
+            "/zoom/v2/meetings/{}{}".format(self.meeting_id, path), **headers
+        )
+
+    def mock_meeting(self, mock: Any, **kwargs: Any):
+        url = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(url, json=MEETING, **kwargs)
+        mock.patch(url, status_code=204)
+        return url
+
+    @requests_mock.Mocker()
+    def test_get_refreshes_mirror(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        self.get()
+        meeting = ZoomMeeting.objects.get()
+        self.assertEqual(meeting.mirror, MEETING)
+        self.assertIsNotNone(meeting.mirrored_at)
+
+    @requests_mock.Mocker()
+    def test_serves_mirror_when_stale_reads_are_accepted(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        self.get()
+        calls = mock.call_count
+        response = self.get(accept_stale="60")
+        self.assertEqual(mock.call_count, calls)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), MEETING)
+        self.assertEqual(response["X-Zapip-Mirror"], "HIT")
+        self.assertEqual(response["X-Zapip-Response-From"], "zoom")
+
+    @requests_mock.Mocker()
+    def test_goes_to_zoom_when_mirror_is_too_old(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        self.get()
+        ZoomMeeting.objects.update(
+            mirrored_at=timezone.now() - datetime.timedelta(minutes=5)
+        )
+        calls = mock.call_count
+        response = self.get(accept_stale="60")
+        self.assertEqual(mock.call_count, calls + 1)
+        self.assertNotIn("X-Zapip-Mirror", response)
+
+    @requests_mock.Mocker()
+    def test_goes_to_zoom_without_header_or_with_query(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        self.get()
+        calls = mock.call_count
+        self.get()
+        self.get(accept_stale="60", path="?occurrence_id=1")
+        self.assertEqual(mock.call_count, calls + 2)
+
+    @requests_mock.Mocker()
+    def test_update_clears_mirror(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        self.get()
+        self.client.patch(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            data="{}",
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        meeting = ZoomMeeting.objects.get()
+        self.assertIsNone(meeting.mirror)
+        self.assertIsNone(meeting.mirrored_at)
+
+    @requests_mock.Mocker()
+    def test_batch_update_clears_mirror(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        self.get()
+        self.client.post(
+            "/zoom/v2/batch",
+            data=json.dumps(
+                {"operations": [{"method": "update", "meeting_id": self.meeting_id}]}
+            ),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        self.assertIsNone(ZoomMeeting.objects.get().mirror)
+
+    @requests_mock.Mocker()
+    def test_sync_skips_deleted_meetings_and_applies_limit(self, mock: Any):
+        application = Application.objects.create(external_id=self.application_id)
+        for meeting_id in (1, 2, 3):
+            ZoomMeeting.objects.create(
+                application=application, user_id=self.user_id, meeting_id=meeting_id
+            )
+        ZoomMeeting.objects.create(
+            application=Application.objects.create(external_id="other"),
+            user_id=self.user_id,
+            meeting_id=1,
+        )
+        ZoomMeeting.objects.filter(meeting_id=2).update(deleted_at=timezone.now())
+        mock.get(re.compile(r"/v2/meetings/\d+$"), json=MEETING)
+        synced, failed = mirror.sync_meetings(get_zoom_client(), limit=2)
+        self.assertEqual((synced, failed), (2, 0))
+        self.assertEqual(
+            [r.path for r in mock.request_history],
+            ["/v2/meetings/1", "/v2/meetings/3"],
+        )
+
+    @requests_mock.Mocker()
+    def test_sync_command(self, mock: Any):
+        self._create_meeting(mock)
+        self.mock_meeting(mock)
+        stdout = StringIO()
+        call_command("sync_meeting_mirror", stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), "Synced 1 meetings, 0 failed")
+        self.assertEqual(ZoomMeeting.objects.get().mirror, MEETING)
+        stdout = StringIO()
+        call_command("sync_meeting_mirror", "--older-than", "60", stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), "Synced 0 meetings, 0 failed")
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_MEETING_MIRROR=True, ROOT_URLCONF=__name__)
+class AsyncMeetingMirrorTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = AsyncClient()
+        self.zoom = FakeZoom(self.meeting_id)
+        patcher = mock.patch(
+            "zapip.views.get_async_zoom_client", side_effect=self.zoom.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def gateway_headers(self):
+        return {
+            "X_API": self.api_id,
+            "X_API_APPLICATION": self.application_id,
+            "X_API_SUBSCRIPTION": self.subscription_id,
+        }
+
+    async def test_serves_mirror_when_stale_reads_are_accepted(self):
+        await self.client.post(
+            "/zoom/v2/users/{}/meetings".format(self.user_id),
+            data="{}",
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        path = "/zoom/v2/meetings/{}".format(self.meeting_id)
+        await self.client.get(path, **self.gateway_headers())
+        calls = len(self.zoom.requests)
+        response = await self.client.get(
+            path, X_ZAPIP_ACCEPT_STALE="60", **self.gateway_headers()
+        )
+        self.assertEqual(len(self.zoom.requests), calls)
+        self.assertEqual(response["X-Zapip-Mirror"], "HIT")
+        self.assertEqual(response.json()["topic"], "Interesting stuff")
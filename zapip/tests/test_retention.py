@@ -0,0 +1,146 @@
+import datetime
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from typing import Any
+
+import requests_mock
+from django.core.management import call_command
+from django.test.utils import override_settings
+from django.utils import timezone
+from zapip import retention
+from zapip.cache import reset_caches
+from zapip.models import Application, ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+
+
+@override_settings(HEADER_AUTH=None)
+class DeletedMeetingTestCase(ZapipTestCase):
+    @requests_mock.Mocker()
+    def test_delete_marks_meeting_as_deleted(self, mock: Any):
+        self._create_meeting(mock)
+        mock.delete(
+            self.zoom_url("/v2/meetings/{}".format(self.meeting_id)), status_code=204
+        )
+        self.client.delete(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertIsNotNone(ZoomMeeting.objects.get().deleted_at)
+        response = self.client.get(
+            "/zoom/v2/users/{}/meetings".format(self.user_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.json()["meetings"], [])
+
+    @requests_mock.Mocker()
+    def test_deleted_meeting_is_not_authorized(self, mock: Any):
+        self._create_meeting(mock)
+        url = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(url, json={"id": self.meeting_id})
+        path = "/zoom/v2/meetings/{}".format(self.meeting_id)
+        self.assertEqual(
+            self.client.get(path, **self.gateway_headers()).status_code, 200
+        )
+        # as reported by a webhook, with the owner cached
+        retention.mark_deleted([self.meeting_id])
+        calls = mock.call_count
+        response = self.client.get(path, **self.gateway_headers())
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "unknown-meeting-id")
+        reset_caches()
+        response = self.client.post(
+            "/zoom/v2/batch",
+            data=json.dumps(
+                {"operations": [{"method": "get", "meeting_id": self.meeting_id}]}
+            ),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        self.assertEqual(response.json()["results"][0]["status"], 403)
+        self.assertEqual(mock.call_count, calls)
+
+    @requests_mock.Mocker()
+    def test_failed_delete_leaves_meeting(self, mock: Any):
+        self._create_meeting(mock)
+        mock.delete(
+            self.zoom_url("/v2/meetings/{}".format(self.meeting_id)), status_code=404
+        )
+        self.client.delete(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertIsNone(ZoomMeeting.objects.get().deleted_at)
+
+
+@override_settings(
+    ZAPIP_MEETING_RETENTION_DAYS=None, ZAPIP_DELETED_MEETING_RETENTION_DAYS=30
+)
+class PurgeTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.application = Application.objects.create(external_id=self.application_id)
+        self.now = timezone.now()
+
+    def meeting(self, meeting_id: int, age: int = 0, **kwargs: Any) -> ZoomMeeting:
+        meeting = ZoomMeeting.objects.create(
+            application=self.application,
+            user_id=self.user_id,
+            meeting_id=meeting_id,
+            **kwargs
+        )
+        ZoomMeeting.objects.filter(pk=meeting.pk).update(
+            created=self.now - datetime.timedelta(days=age)
+        )
+        return meeting
+
+    def remaining(self):
+        return sorted(ZoomMeeting.objects.values_list("meeting_id", flat=True))
+
+    def test_purges_meetings_deleted_long_ago(self):
+        self.meeting(1, deleted_at=self.now - datetime.timedelta(days=31))
+        self.meeting(2, deleted_at=self.now - datetime.timedelta(days=1))
+        self.meeting(3)
+        self.assertEqual(retention.purge_meetings(10), 1)
+        self.assertEqual(self.remaining(), [2, 3])
+
+    def test_applies_retention_of_application_or_default(self):
+        other = Application.objects.create(external_id="other", retention_days=10)
+        self.meeting(1, age=20)
+        ZoomMeeting.objects.create(application=other, user_id="u", meeting_id=2)
+        ZoomMeeting.objects.filter(meeting_id=2).update(
+            created=self.now - datetime.timedelta(days=20)
+        )
+        retention.purge_meetings(10)
+        self.assertEqual(self.remaining(), [1])
+        with self.settings(ZAPIP_MEETING_RETENTION_DAYS=15):
+            retention.purge_meetings(10)
+        self.assertEqual(self.remaining(), [])
+
+    def test_purges_in_bounded_batches(self):
+        self.application.retention_days = 5
+        self.application.save()
+        for meeting_id in range(1, 8):
+            self.meeting(meeting_id, age=6)
+        self.assertEqual(retention.purge_meetings(3, max_batches=2), 6)
+        self.assertEqual(self.remaining(), [7])
+        self.assertEqual(retention.purge_meetings(3), 1)
+
+    def test_command_archives_purged_meetings(self):
+        self.meeting(
+            1,
+            deleted_at=self.now - datetime.timedelta(days=40),
+            mirror={"topic": "Old"},
+        )
+        stdout = StringIO()
+        call_command("purge_meetings", "--dry-run", stdout=stdout)
+        self.assertIn("Would purge 1 meetings", stdout.getvalue())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "meetings.jsonl.gz")
+            call_command("purge_meetings", "--archive", path, stdout=stdout)
+            with gzip.open(path, "rt") as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertIn("Purged 1 meetings", stdout.getvalue())
+        self.assertEqual(rows[0]["meeting_id"], 1)
+        self.assertEqual(rows[0]["application__external_id"], self.application_id)
+        self.assertEqual(rows[0]["mirror"], {"topic": "Old"})
+        self.assertFalse(ZoomMeeting.objects.exists())
@@ -0,0 +1,38 @@
+import importlib
+import os
+from unittest import mock
+
+from django.test import SimpleTestCase
+from zapipsite.settings import base
+
+POSTGRES_ENV = {
+    "POSTGRES_DB": "zapip",
+    "POSTGRES_USER": "zapip",
+    "POSTGRES_HOST": "db.example.com",
+    "POSTGRES_STATEMENT_TIMEOUT": "2000",
+}
+
+
+class DatabaseSettingsTestCase(SimpleTestCase):
+    def load(self, environ):
+        with mock.patch.dict(os.environ, environ, clear=True):
+            self.addCleanup(importlib.reload, base)
+            return importlib.reload(base).DATABASES["default"]
+
+    def test_sqlite_by_default(self):
+        database = self.load({})
+        self.assertEqual(database["ENGINE"], "django.db.backends.sqlite3")
+
+    def test_postgresql_with_persistent_connections(self):
+        database = self.load(POSTGRES_ENV)
+        self.assertEqual(database["ENGINE"], "django.db.backends.postgresql")
+        self.assertEqual(database["HOST"], "db.example.com")
+        self.assertEqual(database["CONN_MAX_AGE"], 600)
+        self.assertTrue(database["CONN_HEALTH_CHECKS"])
+        self.assertIn("-c statement_timeout=2000", database["OPTIONS"]["options"])
+        self.assertNotIn("pool", database["OPTIONS"])
+
+    def test_postgresql_with_pool(self):
+        database = self.load(dict(POSTGRES_ENV, POSTGRES_POOL_MAX_SIZE="20"))
+        self.assertEqual(database["CONN_MAX_AGE"], 0)
+        self.assertEqual(database["OPTIONS"]["pool"]["max_size"], 20)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+from typing import Any
+
+import requests_mock
+from django.core.cache import caches
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+from zapip import singleflight
+from zapip.singleflight import AsyncSingleFlight, SingleFlight, UpstreamResult
+from zapip.tests.test_views import ZapipTestCase
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def call():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return "result"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", call)))
+        leader.start()
+        started.wait()
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("k", call)))
+            for _ in range(3)
+        ]
+        for thread in followers:
+            thread.start()
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 4)
+
+    def test_exception_is_raised_and_key_released(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            flight.do("k", fail)
+        self.assertEqual(flight.do("k", lambda: "again"), "again")
+
+    def test_async_callers_share_one_call(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(*(flight.do("k", call) for _ in range(5)))
+
+        self.assertEqual(asyncio.run(run()), ["result"] * 5)
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(CACHES=LOCMEM_CACHES, ZAPIP_COALESCE_TIMEOUT=1.0)
+    def test_shared_waits_for_other_worker(self):
+        cache = caches["default"]
+        key = singleflight._key(1234, {})
+        cache.set("zapip:coalesce:{}:lock".format(key), "other")
+        stored = UpstreamResult(200, b"{}", {}, "OK")
+        cache.set("zapip:coalesce:{}:other".format(key), stored)
+        result = singleflight._shared(key, lambda: self.fail("called zoom"))
+        self.assertEqual(result.content, b"{}")
+
+    @override_settings(CACHES=LOCMEM_CACHES, ZAPIP_COALESCE_TIMEOUT=1.0)
+    def test_shared_calls_zoom_when_lock_holder_fails(self):
+        cache = caches["default"]
+        key = singleflight._key(1234, {})
+        cache.set("zapip:coalesce:{}:lock".format(key), "other")
+        timer = threading.Timer(
+            0.05, lambda: cache.delete("zapip:coalesce:{}:lock".format(key))
+        )
+        timer.start()
+        result = singleflight._shared(key, lambda: UpstreamResult(200, b"", {}, "OK"))
+        timer.join()
+        self.assertEqual(result.status_code, 200)
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_COALESCE_READS="process")
+class CoalescedViewTestCase(ZapipTestCase):
+    @requests_mock.Mocker()
+    def test_get_is_proxied(self, mock: Any):
+        self._create_meeting(mock)
+        mock.get(
+            self.zoom_url("/v2/meetings/{}".format(self.meeting_id)),
+            json={"id": self.meeting_id},
+            headers={"x-zoom-something": "something"},
+        )
+        response = self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), {"id": self.meeting_id})
+        self.assertEqual(response["x-zoom-something"], "something")
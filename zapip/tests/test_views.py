@@ -1,19 +1,26 @@
+import json
 import uuid
 from typing import Any
 from urllib.parse import urljoin
 
+import requests
 import requests_mock
 from django.conf import settings
+from django.core.cache import caches
 from django.http import HttpResponse
 from django.http.request import HttpRequest
 from django.test import Client, TestCase
 from django.test.utils import override_settings
+from zapip.cache import get_cache, reset_caches
 from zapip.models import ZoomMeeting
+from zapip.zoom import reset_shared_zoom_client
 
 
 @override_settings(ZOOM_API_BASE_URL="https://zoom.example.com/")
 class ZapipTestCase(TestCase):
     def setUp(self):
+        reset_caches()
+        reset_shared_zoom_client()
         self.client = Client()
         self.user_id = "foo@example.com"
         self.meeting_id = 12340001234
@@ -145,3 +152,220 @@ class ReadUpdateDeleteMeetingTestCase(ZapipTestCase):
         self.assertEqual(
             mock.last_request.qs, {"schedule_for_reminder": ["false"], "boo": ["true"]}
         )
+
+    @requests_mock.Mocker()
+    def test_ownership_check_is_cached_after_create(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(endpoint, json={"id": self.meeting_id})
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+            )
+        self.assertEqual(response.status_code, 200)
+
+    @requests_mock.Mocker()
+    def test_successful_delete_forgets_owner(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.delete(endpoint, status_code=204)
+        response = self.client.delete(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(get_cache("meeting_owner").get(self.meeting_id))
+
+    @requests_mock.Mocker()
+    def test_sheds_load_after_upstream_429(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(endpoint, status_code=429, headers={"Retry-After": "10"})
+        first = self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        second = self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(first["x-zapip-response-from"], "zoom")
+        self.assertEqual(second.status_code, 429)
+        self.assertEqual(second["x-zapip-response-from"], "zapip")
+        self.assertEqual(second["retry-after"], "10")
+        self.assertEqual(second.json()["error"], "rate-limited")
+        self.assertEqual(mock.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_zoom_unavailable_gives_503(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(endpoint, exc=requests.ConnectTimeout)
+        with self.settings(ZOOM_API_RETRY_BACKOFF=0):
+            response = self.client.get(
+                "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["x-zapip-response-from"], "zapip")
+        self.assertEqual(response.json()["error"], "zoom-unavailable")
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_STREAM_RESPONSES=True)
+class StreamingResponseTestCase(ZapipTestCase):
+    @requests_mock.Mocker()
+    def test_create_streams_response_and_saves_meeting(self, mock: Any):
+        response = self._create_meeting(mock)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["x-zapip-response-from"], "zoom")
+        self.assertEqual(response["x-zoom-something"], "something")
+        body = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(body["id"], self.meeting_id)
+        self.assertTrue(ZoomMeeting.objects.filter(meeting_id=self.meeting_id).exists())
+
+    @requests_mock.Mocker()
+    def test_get_streams_response(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        payload = {"id": self.meeting_id, "agenda": "x" * 200000}
+        mock.get(endpoint, json=payload)
+        response = self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(b"".join(response.streaming_content)), payload)
+
+
+@override_settings(HEADER_AUTH=None, ZAPIP_STREAM_REQUESTS=True)
+class StreamingRequestTestCase(ZapipTestCase):
+    @requests_mock.Mocker()
+    def test_patch_streams_request_body(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.patch(endpoint, status_code=204)
+        payload = json.dumps({"agenda": "x" * 200000}).encode()
+        with self.settings(ZAPIP_STREAM_CHUNK_SIZE=65536):
+            response = self.client.patch(
+                "/zoom/v2/meetings/{}".format(self.meeting_id),
+                data=payload,
+                content_type="application/json",
+                **self.gateway_headers()
+            )
+        self.assertEqual(response.status_code, 204)
+        request = mock.last_request
+        self.assertEqual(request.headers["Content-Length"], str(len(payload)))
+        chunks = list(request.body)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(b"".join(chunks), payload)
+
+    @override_settings(ZAPIP_MAX_REQUEST_BODY_SIZE=100)
+    @requests_mock.Mocker()
+    def test_refuses_body_above_max_size(self, mock: Any):
+        response = self.client.post(
+            "/zoom/v2/users/{}/meetings".format(self.user_id),
+            data=json.dumps({"agenda": "x" * 100}),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()["error"], "request-too-large")
+        self.assertEqual(mock.call_count, 0)
+
+    @requests_mock.Mocker()
+    def test_create_still_saves_meeting(self, mock: Any):
+        self._create_meeting(mock)
+        request = mock.last_request
+        body = b"".join(request.body)
+        self.assertIn(b"Test", body)
+        self.assertEqual(request.headers["Content-Length"], str(len(body)))
+        self.assertTrue(ZoomMeeting.objects.filter(meeting_id=self.meeting_id).exists())
+
+
+@override_settings(
+    HEADER_AUTH=None,
+    ZAPIP_RESPONSE_CACHE_TTLS={"get_meeting": 60},
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "zapip-response-cache-tests",
+        }
+    },
+)
+class ResponseCacheTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        caches["default"].clear()
+
+    def _get_meeting(self, **extra: Any) -> HttpResponse:
+        return self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            **self.gateway_headers(),
+            **extra
+        )
+
+    def _mock_get_meeting(self, mock: Any, topic: str = "Cached") -> None:
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(
+            endpoint,
+            json={"id": self.meeting_id, "topic": topic},
+            headers={"content-type": "application/json"},
+        )
+
+    @requests_mock.Mocker()
+    def test_second_get_is_served_from_cache(self, mock: Any):
+        self._create_meeting(mock)
+        self._mock_get_meeting(mock)
+        first = self._get_meeting()
+        second = self._get_meeting()
+        self.assertEqual(mock.call_count, 2)
+        self.assertEqual(first["x-zapip-cache"], "MISS")
+        self.assertEqual(second["x-zapip-cache"], "HIT")
+        self.assertEqual(second["x-zapip-response-from"], "zoom")
+        self.assertEqual(second.json()["topic"], "Cached")
+        self.assertEqual(first["etag"], second["etag"])
+
+    @requests_mock.Mocker()
+    def test_query_params_are_part_of_key(self, mock: Any):
+        self._create_meeting(mock)
+        self._mock_get_meeting(mock)
+        self._get_meeting()
+        self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            {"occurrence_id": "1"},
+            **self.gateway_headers()
+        )
+        self.assertEqual(mock.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_matching_if_none_match_returns_304(self, mock: Any):
+        self._create_meeting(mock)
+        self._mock_get_meeting(mock)
+        etag = self._get_meeting()["etag"]
+        response = self._get_meeting(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(mock.call_count, 2)
+
+    @requests_mock.Mocker()
+    def test_patch_invalidates(self, mock: Any):
+        self._create_meeting(mock)
+        self._mock_get_meeting(mock)
+        self._get_meeting()
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.patch(endpoint, status_code=204)
+        self.client.patch(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            data=json.dumps({"topic": "Updated"}),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+        self._mock_get_meeting(mock, topic="Updated")
+        response = self._get_meeting()
+        self.assertEqual(response["x-zapip-cache"], "MISS")
+        self.assertEqual(response.json()["topic"], "Updated")
+
+    @requests_mock.Mocker()
+    def test_errors_are_not_cached(self, mock: Any):
+        self._create_meeting(mock)
+        endpoint = self.zoom_url("/v2/meetings/{}".format(self.meeting_id))
+        mock.get(endpoint, status_code=404, json={"code": 3001})
+        self._get_meeting()
+        response = self._get_meeting()
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(mock.call_count, 3)
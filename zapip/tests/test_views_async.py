@@ -0,0 +1,203 @@
+import io
+import json
+import threading
+import uuid
+from typing import List
+from unittest import mock
+
+import httpx
+from django.core.handlers.asgi import ASGIRequest
+from django.http.request import HttpRequest
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from zapip import urls, views
+from zapip.cache import reset_caches
+from zapip.middleware import LeanRouteMiddleware
+from zapip.models import ZoomMeeting
+from zapip.zoom import AsyncZoomClient
+
+urlpatterns = urls.async_urlpatterns
+
+
+class FakeZoom:
+    """
+    Records requests and answers like Zoom would, for use with httpx.MockTransport.
+    """
+
+    def __init__(self, meeting_id: int):
+        self.meeting_id = meeting_id
+        self.requests: List[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.method == "POST":
+            return httpx.Response(
+                201,
+                json={"id": self.meeting_id, "topic": "Test"},
+                headers={"x-zoom-something": "something"},
+            )
+        if request.method == "GET":
+            return httpx.Response(
+                200, json={"id": self.meeting_id, "topic": "Interesting stuff"}
+            )
+        return httpx.Response(204)
+
+    def client(self) -> AsyncZoomClient:
+        return AsyncZoomClient(
+            url="https://zoom.example.com/",
+            headers={},
+            client=httpx.AsyncClient(transport=httpx.MockTransport(self)),
+        )
+
+
+@override_settings(HEADER_AUTH=None, ROOT_URLCONF=__name__)
+class AsyncViewsTestCase(TestCase):
+    def setUp(self):
+        reset_caches()
+        self.client = AsyncClient()
+        self.user_id = "foo@example.com"
+        self.meeting_id = 12340001234
+        self.application_id = str(uuid.uuid4())
+        self.zoom = FakeZoom(self.meeting_id)
+        patcher = mock.patch(
+            "zapip.views.get_async_zoom_client", side_effect=self.zoom.client
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def gateway_headers(self):
+        return {
+            "X_API": str(uuid.uuid4()),
+            "X_API_APPLICATION": self.application_id,
+            "X_API_SUBSCRIPTION": str(uuid.uuid4()),
+        }
+
+    async def _create_meeting(self):
+        return await self.client.post(
+            "/zoom/v2/users/{}/meetings".format(self.user_id),
+            data=json.dumps({"topic": "Test"}),
+            content_type="application/json",
+            **self.gateway_headers()
+        )
+
+    async def test_middleware_and_view_run_on_the_event_loop(self):
+        threads = []
+        resolve = LeanRouteMiddleware.resolve
+
+        def record_resolve(middleware: LeanRouteMiddleware, request: HttpRequest):
+            threads.append(threading.get_ident())
+            return resolve(middleware, request)
+
+        def client() -> AsyncZoomClient:
+            threads.append(threading.get_ident())
+            return self.zoom.client()
+
+        with mock.patch.object(
+            LeanRouteMiddleware, "resolve", record_resolve
+        ), mock.patch("zapip.views.get_async_zoom_client", side_effect=client):
+            response = await self._create_meeting()
+        self.assertEqual(response.status_code, 201)
+        self.assertIn("X-Zapip-Response-For", response)
+        self.assertEqual(threads, [threading.get_ident()] * 2)
+
+    async def test_requires_gateway_headers(self):
+        response = await self.client.post("/zoom/v2/users/foo@example.com/meetings")
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "missing-headers")
+
+    async def test_requires_header_auth_if_enabled(self):
+        with self.settings(HEADER_AUTH={"Authorization": "correct"}):
+            response = await self._create_meeting()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "unauthenticated-proxy")
+
+    async def test_user_id_me_is_forbidden(self):
+        response = await self.client.post(
+            "/zoom/v2/users/me/meetings", **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "forbidden-user-id")
+
+    async def test_create_proxies_request_and_saves_meeting(self):
+        response = await self._create_meeting()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response["x-zapip-response-from"], "zoom")
+        self.assertEqual(response["x-zoom-something"], "something")
+        self.assertEqual(response.json()["id"], self.meeting_id)
+        self.assertEqual(json.loads(self.zoom.requests[0].content), {"topic": "Test"})
+        self.assertTrue(
+            await ZoomMeeting.objects.filter(
+                application__external_id=self.application_id,
+                meeting_id=self.meeting_id,
+                user_id=self.user_id,
+            ).aexists()
+        )
+
+    async def test_get_denies_unknown_meeting(self):
+        response = await self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()["error"], "unknown-meeting-id")
+        self.assertEqual(self.zoom.requests, [])
+
+    async def test_get_proxies_query_params_for_known_meeting(self):
+        await self._create_meeting()
+        response = await self.client.get(
+            "/zoom/v2/meetings/{}".format(self.meeting_id),
+            {"schedule_for_reminder": "false"},
+            **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["topic"], "Interesting stuff")
+        self.assertEqual(
+            self.zoom.requests[-1].url.params["schedule_for_reminder"], "false"
+        )
+
+    async def test_delete_proxies_for_known_meeting(self):
+        await self._create_meeting()
+        response = await self.client.delete(
+            "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.zoom.requests[-1].method, "DELETE")
+
+    async def test_streams_response_when_enabled(self):
+        await self._create_meeting()
+        with self.settings(ZAPIP_STREAM_RESPONSES=True):
+            response = await self.client.get(
+                "/zoom/v2/meetings/{}".format(self.meeting_id), **self.gateway_headers()
+            )
+            body = b"".join([chunk async for chunk in response.streaming_content])
+        self.assertTrue(response.streaming)
+        self.assertEqual(json.loads(body)["topic"], "Interesting stuff")
+
+    async def test_streams_request_body_when_enabled(self):
+        with self.settings(ZAPIP_STREAM_REQUESTS=True):
+            response = await self._create_meeting()
+        self.assertEqual(response.status_code, 201)
+        request = self.zoom.requests[-1]
+        self.assertEqual(json.loads(request.content), {"topic": "Test"})
+        self.assertEqual(request.headers["content-length"], str(len(request.content)))
+        self.assertNotIn("transfer-encoding", request.headers)
+
+
+@override_settings(ZAPIP_STREAM_REQUESTS=True, ZAPIP_MAX_REQUEST_BODY_SIZE=100)
+class UnsizedRequestBodyTestCase(SimpleTestCase):
+    def request(self, body: bytes) -> ASGIRequest:
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/zoom/v2/users/foo/meetings",
+            "headers": [(b"content-type", b"application/json")],
+        }
+        return ASGIRequest(scope, io.BytesIO(body))
+
+    def test_body_without_content_length_is_buffered(self):
+        proxy_request = views.make_proxy_request(self.request(b'{"topic": "Test"}'))
+        self.assertEqual(proxy_request["data"], b'{"topic": "Test"}')
+        self.assertEqual(proxy_request["headers"]["content-length"], "17")
+
+    def test_limit_applies_to_body_without_content_length(self):
+        with self.assertRaises(views.RequestBodyTooLarge):
+            views.make_proxy_request(self.request(b"x" * 101), is_async=True)
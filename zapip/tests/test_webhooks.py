@@ -0,0 +1,130 @@
+import json
+import time
+from typing import Any, Dict, Optional
+
+import requests_mock
+from django.test.utils import override_settings
+from zapip import webhooks
+from zapip.models import Application, ZoomMeeting
+from zapip.tests.test_views import ZapipTestCase
+
+SECRET = "zoom-secret"
+
+
+@override_settings(ZOOM_WEBHOOK_SECRET_TOKEN=SECRET, ZAPIP_WEBHOOK_INTERVAL=0)
+class WebhookTestCase(ZapipTestCase):
+    def setUp(self):
+        super().setUp()
+        self.application = Application.objects.create(
+            external_id=self.application_id,
+            webhook_url="https://app.example.com/events",
+            webhook_secret="app-secret",
+        )
+        self.meeting = ZoomMeeting.objects.create(
+            application=self.application,
+            user_id=self.user_id,
+            meeting_id=self.meeting_id,
+            mirror={"id": self.meeting_id, "topic": "Old", "duration": 60},
+        )
+
+    def post(self, data: Dict[str, Any], timestamp: Optional[str] = None):
+        body = json.dumps(data).encode()
+        timestamp = timestamp or str(int(time.time()))
+        return self.client.post(
+            "/zoom/webhooks",
+            data=body,
+            content_type="application/json",
+            HTTP_X_ZM_REQUEST_TIMESTAMP=timestamp,
+            HTTP_X_ZM_SIGNATURE=webhooks.signature(SECRET, timestamp, body),
+        )
+
+    def event(self, event: str, **fields: Any) -> Dict[str, Any]:
+        return {
+            "event": event,
+            "event_ts": 1,
+            "payload": {"object": dict(id=self.meeting_id, **fields)},
+        }
+
+    def test_answers_url_validation(self):
+        response = self.post(
+            {"event": "endpoint.url_validation", "payload": {"plainToken": "abc"}}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["plainToken"], "abc")
+        self.assertEqual(len(response.json()["encryptedToken"]), 64)
+
+    def test_denies_invalid_or_old_signatures(self):
+        response = self.client.post(
+            "/zoom/webhooks",
+            data="{}",
+            content_type="application/json",
+            HTTP_X_ZM_REQUEST_TIMESTAMP=str(int(time.time())),
+            HTTP_X_ZM_SIGNATURE="v0=wrong",
+        )
+        self.assertEqual(response.status_code, 403)
+        response = self.post({}, timestamp=str(int(time.time()) - 3600))
+        self.assertEqual(response.status_code, 403)
+
+    def test_denies_non_ascii_signatures(self):
+        for value in ("v0=\u00e9", "v0=\udce9"):
+            with self.subTest(value=value):
+                response = self.client.post(
+                    "/zoom/webhooks",
+                    data="{}",
+                    content_type="application/json",
+                    HTTP_X_ZM_REQUEST_TIMESTAMP=str(int(time.time())),
+                    HTTP_X_ZM_SIGNATURE=value,
+                )
+                self.assertEqual(response.status_code, 403)
+
+    @override_settings(ZOOM_WEBHOOK_SECRET_TOKEN=None)
+    def test_disabled_without_secret(self):
+        self.assertEqual(self.post({}).status_code, 404)
+
+    @requests_mock.Mocker()
+    def test_deleted_meeting_is_marked_and_forwarded(self, mock: Any):
+        mock.post("https://app.example.com/events")
+        response = self.post(self.event("meeting.deleted"))
+        self.assertEqual(response.status_code, 204)
+        self.meeting.refresh_from_db()
+        self.assertIsNotNone(self.meeting.deleted_at)
+        request = mock.last_request
+        self.assertEqual(request.json()["events"][0]["event"], "meeting.deleted")
+        timestamp = request.headers["X-Zapip-Request-Timestamp"]
+        self.assertEqual(
+            request.headers["X-Zapip-Signature"],
+            webhooks.signature("app-secret", timestamp, request.body),
+        )
+
+    @requests_mock.Mocker()
+    def test_updated_meeting_is_merged_into_mirror(self, mock: Any):
+        mock.post("https://app.example.com/events")
+        self.post(self.event("meeting.updated", topic="New"))
+        self.meeting.refresh_from_db()
+        self.assertEqual(
+            self.meeting.mirror, {"id": self.meeting_id, "topic": "New", "duration": 60}
+        )
+
+    def test_events_of_unknown_meetings_are_dropped(self):
+        self.application.webhook_url = ""
+        self.application.save()
+        response = self.post(
+            {"event": "meeting.deleted", "payload": {"object": {"id": 1}}}
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue(ZoomMeeting.objects.exists())
+
+    @override_settings(ZAPIP_WEBHOOK_INTERVAL=60)
+    @requests_mock.Mocker()
+    def test_events_are_queued_and_applied_in_batches(self, mock: Any):
+        mock.post("https://app.example.com/events")
+        self.post(self.event("meeting.updated", topic="New"))
+        self.post(self.event("meeting.ended"))
+        self.assertEqual(mock.call_count, 0)
+        webhooks.get_applier().drain()
+        self.assertEqual(mock.call_count, 1)
+        events = mock.last_request.json()["events"]
+        self.assertEqual(
+            [e["event"] for e in events], ["meeting.updated", "meeting.ended"]
+        )
+        webhooks.reset_applier()
@@ -1,5 +1,17 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from unittest import mock
+
+import httpx
+import requests
+import requests_mock
+from django.core.cache import caches
 from django.test import TestCase
 from django.test.utils import override_settings
+from zapip import zoom
+from zapip.benchmark import FakeZoomServer
 from zapip.zoom import get_zoom_client
 
 
@@ -11,3 +23,372 @@ class ZoomClientTestCase(TestCase):
             client = get_zoom_client()
         self.assertEqual(client.url, base_url)
         self.assertEqual(client.headers, headers)
+
+
+class SharedZoomClientTestCase(TestCase):
+    def setUp(self):
+        zoom.reset_shared_zoom_client()
+
+    def test_returns_same_client(self):
+        self.assertIs(get_zoom_client(), get_zoom_client())
+
+    def test_arguments_give_dedicated_client(self):
+        shared = get_zoom_client()
+        client = get_zoom_client(url="https://other.example.com/")
+        self.assertIsNot(client, shared)
+        self.assertEqual(client.url, "https://other.example.com/")
+
+    def test_recreated_after_fork(self):
+        client = get_zoom_client()
+        with mock.patch("zapip.zoom.os.getpid", return_value=-1):
+            forked_client = get_zoom_client()
+        self.assertIsNot(client, forked_client)
+
+    def test_recreated_when_settings_change(self):
+        client = get_zoom_client()
+        with override_settings(ZOOM_API_POOL_MAXSIZE=3):
+            overridden_client = get_zoom_client()
+        self.assertIsNot(client, overridden_client)
+
+    @override_settings(ZOOM_API_POOL_MAXSIZE=3, ZOOM_API_POOL_BLOCK=True)
+    def test_pool_configured_from_settings(self):
+        adapter = get_zoom_client().session.get_adapter("https://zoom.example.com/")
+        self.assertIsInstance(adapter, zoom.ZoomHTTPAdapter)
+        self.assertEqual(adapter._pool_maxsize, 3)
+        self.assertTrue(adapter._pool_block)
+
+    async def test_async_client_shared_per_event_loop(self):
+        client = zoom.get_async_zoom_client()
+        self.assertIs(client, zoom.get_async_zoom_client())
+        self.assertIsInstance(client, zoom.AsyncZoomClient)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TokenBucketTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = zoom.TokenBucket(rate=2, capacity=2, clock=self.clock)
+
+    def test_burst_then_queue(self):
+        self.assertEqual(self.bucket.reserve(max_wait=1), 0)
+        self.assertEqual(self.bucket.reserve(max_wait=1), 0)
+        self.assertEqual(self.bucket.reserve(max_wait=1), 0.5)
+        self.assertEqual(self.bucket.reserve(max_wait=1), 1.0)
+
+    def test_refuses_beyond_max_wait(self):
+        self.bucket.reserve(max_wait=1)
+        self.bucket.reserve(max_wait=1)
+        self.assertIsNone(self.bucket.reserve(max_wait=0.1))
+        self.assertEqual(self.bucket.wait_time(), 0.5)
+
+    def test_refills_over_time(self):
+        self.bucket.reserve(max_wait=1)
+        self.bucket.reserve(max_wait=1)
+        self.clock.now += 1
+        self.assertEqual(self.bucket.reserve(max_wait=0), 0)
+
+    def test_pause(self):
+        self.bucket.pause(5)
+        self.assertIsNone(self.bucket.reserve(max_wait=1))
+        self.clock.now += 5
+        self.assertEqual(self.bucket.reserve(max_wait=1), 0.5)
+
+
+class RateLimiterTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = zoom.RateLimiter(
+            limits={"get": (10, 10)}, max_wait=1, clock=self.clock
+        )
+
+    def test_unlimited_endpoint(self):
+        self.assertEqual(self.limiter.reserve("create"), 0)
+        self.assertEqual(self.limiter.reserve(None), 0)
+
+    def test_429_with_retry_after_sheds_load(self):
+        self.limiter.update("get", 429, {"Retry-After": "30"})
+        with self.assertRaises(zoom.ZoomRateLimited) as cm:
+            self.limiter.reserve("get")
+        self.assertEqual(cm.exception.retry_after, 30)
+
+    def test_qps_limit_header_adjusts_rate(self):
+        self.limiter.update(
+            "get", 200, {"X-RateLimit-Type": "QPS", "X-RateLimit-Limit": "4"}
+        )
+        self.assertEqual(self.limiter.buckets["get"].rate, 4)
+
+    def test_no_remaining_drains_bucket(self):
+        self.limiter.update("get", 200, {"X-RateLimit-Remaining": "0"})
+        self.assertEqual(self.limiter.reserve("get"), 0.1)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(zoom.parse_retry_after("12"), 12)
+        self.assertEqual(zoom.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(zoom.parse_retry_after("soon"))
+        self.assertIsNone(zoom.parse_retry_after(None))
+
+
+class CircuitBreakerTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = zoom.CircuitBreaker(
+            threshold=2, reset_timeout=10, clock=self.clock
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 10)
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    def test_single_trial_after_reset_timeout(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 10)
+
+    def test_zero_threshold_disables(self):
+        breaker = zoom.CircuitBreaker(threshold=0, reset_timeout=10)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+
+    def open_client(self, **kwargs: Any) -> zoom.ZoomClient:
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        return zoom.ZoomClient(
+            "https://zoom.example.com/", {}, circuit_breaker=self.breaker, **kwargs
+        )
+
+    @requests_mock.Mocker()
+    def test_trial_ended_by_unexpected_error_is_released(self, mock: Any):
+        url = "https://zoom.example.com/v2/meetings/1"
+        mock.get(url, [{"exc": requests.exceptions.ContentDecodingError}, {}])
+        client = self.open_client()
+        with self.assertRaises(requests.exceptions.ContentDecodingError):
+            client.get_meeting(1, data=b"")
+        self.clock.now += 10
+        self.assertEqual(client.get_meeting(1, data=b"").status_code, 200)
+        self.assertFalse(self.breaker.is_open)
+
+    @requests_mock.Mocker()
+    def test_rate_limited_call_does_not_take_trial(self, mock: Any):
+        mock.get("https://zoom.example.com/v2/meetings/1")
+        limiter = zoom.RateLimiter(limits={"get": (1, 1)}, max_wait=0)
+        client = self.open_client(rate_limiter=limiter)
+        limiter.reserve("get")
+        with self.assertRaises(zoom.ZoomRateLimited):
+            client.get_meeting(1, data=b"")
+        self.assertTrue(self.breaker.allow())
+
+    async def test_cancelled_async_trial_is_released(self):
+        async def handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(10)
+            return httpx.Response(200)
+
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        client = zoom.AsyncZoomClient(
+            "https://zoom.example.com/",
+            {},
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            circuit_breaker=self.breaker,
+        )
+        task = asyncio.ensure_future(client.get_meeting(1, data=b""))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.clock.now += 10
+        self.assertTrue(self.breaker.allow())
+
+
+@override_settings(
+    ZOOM_API_BASE_URL="https://zoom.example.com/",
+    ZOOM_API_RETRIES=2,
+    ZOOM_API_RETRY_BACKOFF=0,
+    ZOOM_API_CIRCUIT_BREAKER_THRESHOLD=10,
+)
+class RetryTestCase(TestCase):
+    def setUp(self):
+        zoom.reset_shared_zoom_client()
+        self.client = get_zoom_client()
+
+    @requests_mock.Mocker()
+    def test_retries_idempotent_calls(self, mock: Any):
+        mock.get(
+            "https://zoom.example.com/v2/meetings/1",
+            [{"status_code": 503}, {"status_code": 502}, {"status_code": 200}],
+        )
+        response = self.client.get_meeting(meeting_id=1, data=b"")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_returns_last_failure(self, mock: Any):
+        mock.delete("https://zoom.example.com/v2/meetings/1", status_code=503)
+        response = self.client.delete_meeting(meeting_id=1, data=b"")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(mock.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_does_not_retry_post(self, mock: Any):
+        mock.post("https://zoom.example.com/v2/users/foo/meetings", status_code=503)
+        response = self.client.create_meeting(user_id="foo", data=b"{}")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(mock.call_count, 1)
+
+    @requests_mock.Mocker()
+    def test_connection_error_raises_unavailable(self, mock: Any):
+        mock.get("https://zoom.example.com/v2/meetings/1", exc=requests.ConnectionError)
+        with self.assertRaises(zoom.ZoomUnavailable):
+            self.client.get_meeting(meeting_id=1, data=b"")
+        self.assertEqual(mock.call_count, 3)
+
+    @requests_mock.Mocker()
+    def test_open_circuit_fails_fast(self, mock: Any):
+        mock.get("https://zoom.example.com/v2/meetings/1", status_code=504)
+        with self.settings(ZOOM_API_CIRCUIT_BREAKER_THRESHOLD=3):
+            client = get_zoom_client()
+            client.get_meeting(meeting_id=1, data=b"")
+            with self.assertRaises(zoom.ZoomUnavailable) as cm:
+                client.get_meeting(meeting_id=1, data=b"")
+        self.assertEqual(mock.call_count, 3)
+        self.assertGreater(cm.exception.retry_after, 0)
+
+
+class TokenManagerTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeZoomServer().__enter__()
+        cls.addClassCleanup(cls.server.__exit__, None, None, None)
+
+    def setUp(self):
+        self.server.tokens_issued = 0
+        self.cache = caches["default"]
+        self.cache.clear()
+        self.clock = FakeClock()
+
+    def manager(self, token_url=None) -> zoom.TokenManager:
+        return zoom.TokenManager(
+            token_url=token_url or self.server.token_url,
+            account_id="account",
+            client_id="client",
+            client_secret="secret",
+            refresh_margin=300,
+            cache=self.cache,
+            clock=self.clock,
+        )
+
+    def wait_for_refresh(self, manager: zoom.TokenManager):
+        deadline = time.monotonic() + 5
+        while manager.refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_fetches_token_once(self):
+        manager = self.manager()
+        self.assertEqual(manager.get_token(), "fake-token-1")
+        self.assertEqual(manager.get_token(), "fake-token-1")
+        self.assertEqual(self.server.tokens_issued, 1)
+
+    def test_concurrent_callers_share_one_fetch(self):
+        manager = self.manager()
+        with ThreadPoolExecutor(8) as executor:
+            tokens = set(executor.map(lambda _: manager.get_token(), range(8)))
+        self.assertEqual(tokens, {"fake-token-1"})
+        self.assertEqual(self.server.tokens_issued, 1)
+
+    def test_token_is_shared_through_cache(self):
+        self.manager().get_token()
+        self.assertEqual(self.manager().get_token(), "fake-token-1")
+        self.assertEqual(self.server.tokens_issued, 1)
+
+    def test_refreshes_in_background_before_expiry(self):
+        manager = self.manager()
+        manager.get_token()
+        self.clock.now += 3400
+        self.assertEqual(manager.get_token(), "fake-token-1")
+        self.wait_for_refresh(manager)
+        self.assertEqual(manager.get_token(), "fake-token-2")
+        self.assertEqual(self.server.tokens_issued, 2)
+
+    def test_fetches_expired_token_inline(self):
+        manager = self.manager()
+        manager.get_token()
+        self.clock.now += 3600
+        self.assertEqual(manager.get_token(), "fake-token-2")
+
+    def test_failed_fetch_raises_unavailable(self):
+        manager = self.manager(token_url=self.server.url + "missing")
+        with self.assertRaises(zoom.ZoomUnavailable):
+            manager.get_token()
+
+    @requests_mock.Mocker(real_http=True)
+    def test_client_sends_token_and_drops_refused_one(self, mock: Any):
+        mock.get(
+            "https://zoom.example.com/v2/meetings/1",
+            [{"status_code": 401}, {"status_code": 200}],
+        )
+        client = zoom.ZoomClient(
+            "https://zoom.example.com/", {}, token_manager=self.manager()
+        )
+        self.assertEqual(client.get_meeting(1, data=b"").status_code, 401)
+        self.assertEqual(
+            mock.last_request.headers["Authorization"], "Bearer fake-token-1"
+        )
+        client.get_meeting(1, data=b"")
+        self.assertEqual(
+            mock.last_request.headers["Authorization"], "Bearer fake-token-2"
+        )
+
+    async def test_async_client_sends_token(self):
+        requests = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return httpx.Response(204)
+
+        client = zoom.AsyncZoomClient(
+            "https://zoom.example.com/",
+            {},
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            token_manager=self.manager(),
+        )
+        await client.delete_meeting(1, data=b"")
+        self.assertEqual(requests[0].headers["Authorization"], "Bearer fake-token-1")
+
+    def test_configured_from_settings(self):
+        zoom.reset_shared_zoom_client()
+        self.assertIsNone(get_zoom_client().token_manager)
+        with self.settings(ZOOM_API_OAUTH_CLIENT_ID="client"):
+            manager = get_zoom_client().token_manager
+            self.assertIsInstance(manager, zoom.TokenManager)
+            self.assertIs(zoom.get_token_manager(), manager)
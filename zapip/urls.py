@@ -4,14 +4,42 @@ Zapip URL Configuration
 The `urlpatterns` list routes URLs to views. For more information please see:
     https://docs.djangoproject.com/en/3.1/topics/http/urls/
 """
+
 from typing import List
 
+from django.conf import settings
 from django.urls import path
 from django.urls.resolvers import URLPattern
 
 from zapip import views
 
-urlpatterns: List[URLPattern] = [
+sync_urlpatterns: List[URLPattern] = [
     path("zoom/v2/users/<str:user_id>/meetings", views.CreateMeeting.as_view()),
+    path("zoom/v2/meetings", views.ListMeetings.as_view()),
     path("zoom/v2/meetings/<int:meeting_id>", views.ReadUpdateDeleteMeeting.as_view()),
+    path("zoom/v2/batch", views.BatchMeetings.as_view()),
+]
+
+async_urlpatterns: List[URLPattern] = [
+    path("zoom/v2/users/<str:user_id>/meetings", views.AsyncCreateMeeting.as_view()),
+    path("zoom/v2/meetings", views.AsyncListMeetings.as_view()),
+    path(
+        "zoom/v2/meetings/<int:meeting_id>",
+        views.AsyncReadUpdateDeleteMeeting.as_view(),
+    ),
+    path("zoom/v2/batch", views.AsyncBatchMeetings.as_view()),
+]
+
+webhook_urlpatterns: List[URLPattern] = [
+    path("zoom/webhooks", views.zoom_webhook),
+]
+
+internal_urlpatterns: List[URLPattern] = [
+    path("internal/metrics", views.metrics_view),
 ]
+
+urlpatterns: List[URLPattern] = (
+    (async_urlpatterns if settings.ZAPIP_ASYNC_VIEWS else sync_urlpatterns)
+    + webhook_urlpatterns
+    + internal_urlpatterns
+)
@@ -1,21 +1,22 @@
 import logging
-import uuid
+import re
 from typing import Any
 
-from django.http.response import HttpResponse, JsonResponse
+from django.http.response import HttpResponse, JsonResponse, StreamingHttpResponse
 
 logger = logging.getLogger(__name__)
 
 
+UUID_PATTERN = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+
 def valid_uuid(uuid_string: str) -> bool:
     """
     Verify that a string a valid UUID of any version, in standard form.
     """
-    try:
-        val = uuid.UUID(uuid_string)
-    except ValueError:
-        return False
-    return uuid_string == str(val)
+    return UUID_PATTERN.fullmatch(uuid_string) is not None
 
 
 class ZapipResponse(JsonResponse):
@@ -23,10 +24,31 @@ class ZapipResponse(JsonResponse):
         super().__init__(headers={"X-Zapip-Response-From": "zapip"}, **kwargs)
 
 
+class ZapipResponseBadRequest(ZapipResponse):
+    status_code = 400
+
+
 class ZapipResponseForbidden(ZapipResponse):
     status_code = 403
 
 
+class ZapipResponseRequestEntityTooLarge(ZapipResponse):
+    status_code = 413
+
+
+class ZapipResponseTooManyRequests(ZapipResponse):
+    status_code = 429
+
+
+class ZapipResponseServiceUnavailable(ZapipResponse):
+    status_code = 503
+
+
 class ZoomResponse(HttpResponse):
     def __init__(self, **kwargs: Any):
         super().__init__(headers={"X-Zapip-Response-From": "zoom"}, **kwargs)
+
+
+class ZoomStreamingResponse(StreamingHttpResponse):
+    def __init__(self, **kwargs: Any):
+        super().__init__(headers={"X-Zapip-Response-From": "zoom"}, **kwargs)
@@ -1,20 +1,70 @@
+import json
 import logging
-from typing import Any, Dict, Tuple
+import math
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple, Union
 
+import httpx
+from django.conf import settings
+from django.http import (
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotFound,
+    JsonResponse,
+)
+from django.http.response import HttpResponseBase
 from django.http.request import HttpRequest
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from requests.models import Response
 
+from zapip import (
+    batch,
+    compression,
+    listing,
+    metrics,
+    mirror,
+    response_cache,
+    retention,
+    singleflight,
+    webhooks,
+)
 from zapip.auth import gateway_headers_required, header_auth_required
+from zapip.cache import (
+    aget_application,
+    ais_meeting_owner,
+    forget_meeting_owner,
+    get_application,
+    is_meeting_owner,
+    remember_meeting_owner,
+)
+from zapip.journal import arecord_meetings, record_meetings
+from zapip.limits import application_limits
 from zapip.models import Application, ZoomMeeting
-from zapip.utils import ZapipResponseForbidden, ZoomResponse
-from zapip.zoom import get_zoom_client
+from zapip.utils import (
+    ZapipResponse,
+    ZapipResponseBadRequest,
+    ZapipResponseForbidden,
+    ZapipResponseRequestEntityTooLarge,
+    ZapipResponseServiceUnavailable,
+    ZapipResponseTooManyRequests,
+    ZoomResponse,
+    ZoomStreamingResponse,
+)
+from zapip.zoom import (
+    ZoomRateLimited,
+    ZoomUnavailable,
+    get_async_zoom_client,
+    get_zoom_client,
+)
 
 logger = logging.getLogger(__name__)
 
 auth_decorators = [header_auth_required, gateway_headers_required]
+# views calling Zoom are also subject to the limits of the application
+proxy_decorators = auth_decorators + [application_limits]
 
 EXCLUDED_RESPONSE_HEADERS = {
     "connection",
@@ -30,82 +80,363 @@ EXCLUDED_RESPONSE_HEADERS = {
 }
 
 
-def make_proxy_request(request: HttpRequest) -> Dict[str, Any]:
+# Methods whose request bodies may be streamed to Zoom. Only calls which are
+# never retried qualify, as a streamed body cannot be sent twice.
+STREAMED_BODY_METHODS = {"POST", "PATCH"}
+
+
+class RequestBodyTooLarge(Exception):
+    """
+    Raised when a streamed request body exceeds ZAPIP_MAX_REQUEST_BODY_SIZE.
+    """
+
+    def __init__(self, max_size: int):
+        super().__init__("Request body exceeds {} bytes".format(max_size))
+        self.max_size = max_size
+
+
+def make_proxy_request(request: HttpRequest, is_async: bool = False) -> Dict[str, Any]:
     """
     Fetch some data from a HttpRequest and return a dictionary suitable to be
     passed as keyword arguments to the requests library.
+
+    With ZAPIP_STREAM_REQUESTS, POST and PATCH bodies are passed on as they
+    are read from the client, as an async iterator if is_async is set. Views
+    that need to inspect the body can still read request.body first, and the
+    buffered copy is then streamed instead. Bodies without a Content-Length
+    are buffered. Raises RequestBodyTooLarge if the body exceeds
+    ZAPIP_MAX_REQUEST_BODY_SIZE.
     """
     headers = {"content-type": request.content_type}
-    data = request.body
+    accept_encoding = compression.upstream_accept_encoding(
+        request.headers.get("Accept-Encoding")
+    )
+    if accept_encoding is not None:
+        headers["accept-encoding"] = accept_encoding
+    data: Any
+    if settings.ZAPIP_STREAM_REQUESTS and request.method in STREAMED_BODY_METHODS:
+        max_size = settings.ZAPIP_MAX_REQUEST_BODY_SIZE
+        length = content_length(request)
+        if length is None:
+            # without a declared size, e.g. chunked uploads under ASGI, the body
+            # is buffered up to the limit, so Zoom still gets a Content-Length
+            data = request.read(max_size + 1)
+            if len(data) > max_size:
+                raise RequestBodyTooLarge(max_size)
+            headers["content-length"] = str(len(data))
+        elif length > max_size:
+            raise RequestBodyTooLarge(max_size)
+        else:
+            chunk_size = settings.ZAPIP_STREAM_CHUNK_SIZE
+            headers["content-length"] = str(length)
+            if is_async:
+                data = aiter_client_body(request, length, chunk_size)
+            else:
+                data = ClientBody(request, length, chunk_size)
+    else:
+        data = request.body
     params = dict(request.GET)
     return {"headers": headers, "data": data, "params": params}
 
 
-def proxy_zoom_response(zoom_response: Response) -> ZoomResponse:
-    # pass content and status codes as-is
-    response = ZoomResponse(
-        content=zoom_response.content,
-        status=zoom_response.status_code,
+def content_length(request: HttpRequest) -> Optional[int]:
+    """
+    Returns the declared size of the request body, or None if not given.
+    """
+    try:
+        length = int(request.META["CONTENT_LENGTH"])
+    except (KeyError, ValueError):
+        return None
+    return length if length >= 0 else None
+
+
+class ClientBody:
+    """
+    Iterates over the body of a client request in chunks, reading no more
+    than length bytes. Has a length, so requests sends it with a
+    Content-Length instead of chunked.
+    """
+
+    def __init__(self, request: HttpRequest, length: int, chunk_size: int):
+        self.request = request
+        self.length = length
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __iter__(self) -> Iterator[bytes]:
+        remaining = self.length
+        while remaining > 0:
+            chunk = self.request.read(min(self.chunk_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def aiter_client_body(
+    request: HttpRequest, length: int, chunk_size: int
+) -> AsyncIterator[bytes]:
+    """
+    Async version of ClientBody, for the httpx client.
+
+    ASGI servers have spooled the body to memory or disk by the time the view
+    runs, so the reads do not block on the network.
+    """
+    for chunk in ClientBody(request, length, chunk_size):
+        yield chunk
+
+
+class UpstreamBody:
+    """
+    Iterates over the body of a streamed requests Response, and releases the
+    upstream connection back to the pool when closed.
+
+    With raw=True, the body is passed on as sent, without decoding it.
+    """
+
+    def __init__(self, zoom_response: Response, chunk_size: int, raw: bool = False):
+        self.zoom_response = zoom_response
+        self.chunk_size = chunk_size
+        self.raw = raw
+
+    def __iter__(self) -> Iterator[bytes]:
+        if self.raw:
+            return self.zoom_response.raw.stream(self.chunk_size, decode_content=False)
+        return self.zoom_response.iter_content(chunk_size=self.chunk_size)
+
+    def close(self) -> None:
+        self.zoom_response.close()
+
+
+async def aiter_upstream_body(
+    zoom_response: httpx.Response, chunk_size: int, raw: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Iterates over the body of a streamed httpx Response, and releases the
+    upstream connection back to the pool when done.
+
+    With raw=True, the body is passed on as sent, without decoding it.
+    """
+    try:
+        if raw:
+            async for chunk in zoom_response.aiter_raw(chunk_size=chunk_size):
+                yield chunk
+        else:
+            async for chunk in zoom_response.aiter_bytes(chunk_size=chunk_size):
+                yield chunk
+    finally:
+        await zoom_response.aclose()
+
+
+def body_consumed(zoom_response: Union[Response, httpx.Response]) -> bool:
+    """
+    Whether the body of a streamed upstream response has already been read.
+    """
+    if isinstance(zoom_response, httpx.Response):
+        return zoom_response.is_stream_consumed
+    return bool(zoom_response._content_consumed)
+
+
+def proxy_zoom_response(
+    zoom_response: Union[Response, httpx.Response],
+    stream: bool = False,
+    accept_encoding: Optional[str] = None,
+) -> HttpResponseBase:
+    """
+    Turns a response from Zoom into a response to our client.
+
+    With stream=True, the upstream body is passed on chunk by chunk as it
+    arrives, rather than read into memory first. accept_encoding is the
+    Accept-Encoding header of the client, see zapip.compression.
+    """
+    upstream_encoding = zoom_response.headers.get("content-encoding")
+    # a body read by the view, e.g. for the id of a new meeting, is only
+    # available decoded
+    passthrough = bool(
+        stream
+        and not body_consumed(zoom_response)
+        and upstream_encoding
+        and compression.accepts(accept_encoding, upstream_encoding)
     )
+    encoding = None
+    if stream:
+        chunk_size = settings.ZAPIP_STREAM_CHUNK_SIZE
+        streaming_content: Any
+        if isinstance(zoom_response, httpx.Response):
+            streaming_content = aiter_upstream_body(
+                zoom_response, chunk_size, raw=passthrough
+            )
+        else:
+            streaming_content = UpstreamBody(zoom_response, chunk_size, raw=passthrough)
+        response: HttpResponseBase = ZoomStreamingResponse(
+            streaming_content=streaming_content,
+            status=zoom_response.status_code,
+        )
+    else:
+        # pass status codes as-is, compressing the content for the client
+        content, encoding = compression.encode(zoom_response.content, accept_encoding)
+        response = ZoomResponse(content=content, status=zoom_response.status_code)
     # exclude certain headers
     for header, value in zoom_response.headers.items():
         if header.lower() in EXCLUDED_RESPONSE_HEADERS:
             continue
         response[header] = value
+    if passthrough:
+        response["Content-Encoding"] = upstream_encoding
+        if "content-length" in zoom_response.headers:
+            response["Content-Length"] = zoom_response.headers["content-length"]
+    elif encoding is not None:
+        response["Content-Encoding"] = encoding
+        response["Content-Length"] = str(len(content))
+    if accept_encoding is not None and (
+        passthrough or settings.ZAPIP_COMPRESS_RESPONSES
+    ):
+        patch_vary_headers(response, ["Accept-Encoding"])
     return response
 
 
+def forbidden_user_id_response() -> ZapipResponseForbidden:
+    return ZapipResponseForbidden(
+        data={
+            "error": "forbidden-user-id",
+            "detail": "user_id path argument cannot be 'me'",
+        }
+    )
+
+
+def rate_limited_response(exc: ZoomRateLimited) -> ZapipResponseTooManyRequests:
+    logger.info("Shedding request: %s", exc)
+    response = ZapipResponseTooManyRequests(
+        data={
+            "error": "rate-limited",
+            "detail": "too many requests to zoom, try again later",
+        }
+    )
+    response["Retry-After"] = str(math.ceil(exc.retry_after))
+    return response
+
+
+def zoom_unavailable_response(
+    exc: ZoomUnavailable,
+) -> ZapipResponseServiceUnavailable:
+    logger.warning("Zoom unavailable: %s", exc)
+    response = ZapipResponseServiceUnavailable(
+        data={
+            "error": "zoom-unavailable",
+            "detail": "zoom could not be reached, try again later",
+        }
+    )
+    if exc.retry_after is not None:
+        response["Retry-After"] = str(math.ceil(exc.retry_after))
+    return response
+
+
+def request_too_large_response(
+    exc: RequestBodyTooLarge,
+) -> ZapipResponseRequestEntityTooLarge:
+    return ZapipResponseRequestEntityTooLarge(
+        data={"error": "request-too-large", "detail": str(exc).lower()}
+    )
+
+
+def unknown_meeting_id_response() -> ZapipResponseForbidden:
+    return ZapipResponseForbidden(
+        data={
+            "error": "unknown-meeting-id",
+            "detail": "meeting id is not known to the proxy or not associated with your application",
+        }
+    )
+
+
+def listing_error_response(exc: listing.ListingError) -> ZapipResponseBadRequest:
+    return ZapipResponseBadRequest(
+        data={"error": "invalid-query-parameter", "detail": str(exc)}
+    )
+
+
 @method_decorator(csrf_exempt, name="dispatch")
-@method_decorator(auth_decorators, name="dispatch")
+@method_decorator(proxy_decorators, name="dispatch")
 class CreateMeeting(View):
     """
-    Create a meeting for a user.
+    Create a meeting for a user, or list the user's meetings.
 
     Proxies the request and saves the user_id, meeting_id and application.
+    Listings are answered from the saved meetings, see zapip.listing.
     """
 
+    def get(self, request: HttpRequest, user_id: str):
+        """
+        GET /users/{userId}/meetings
+        """
+        if user_id == "me":
+            return forbidden_user_id_response()
+        try:
+            page = listing.parse_page(request.GET)
+        except listing.ListingError as exc:
+            return listing_error_response(exc)
+        application = get_application(request.gateway_identity.application)
+        return ZapipResponse(data=listing.list_meetings(application, user_id, page))
+
     def post(self, request: HttpRequest, user_id: str):
         """
         POST /users/{userId}/meetings
         https://marketplace.zoom.us/docs/api-reference/zoom-api/meetings/meetingcreate
         """
         if user_id == "me":
-            return ZapipResponseForbidden(
-                data={
-                    "error": "forbidden-user-id",
-                    "detail": "user_id path argument cannot be 'me'",
-                }
-            )
-        application, _ = Application.objects.get_or_create(
-            external_id=request.gateway_headers["application"]
-        )
-        logger.info(
+            return forbidden_user_id_response()
+        application = get_application(request.gateway_identity.application)
+        logger.debug(
             "Forwarding POST to /users/%s/meetings for application=%r",
             user_id,
             application,
         )
         zoom = get_zoom_client()
-        proxy_request = make_proxy_request(request)
-        zoom_response = zoom.create_meeting(user_id=user_id, **proxy_request)
-        logger.info(
+        stream = settings.ZAPIP_STREAM_RESPONSES
+        try:
+            proxy_request = make_proxy_request(request)
+            zoom_response = zoom.create_meeting(
+                user_id=user_id, stream=stream, **proxy_request
+            )
+        except RequestBodyTooLarge as exc:
+            return request_too_large_response(exc)
+        except ZoomRateLimited as exc:
+            return rate_limited_response(exc)
+        except ZoomUnavailable as exc:
+            return zoom_unavailable_response(exc)
+        logger.debug(
             "Zoom responded with %s %s", zoom_response.status_code, zoom_response.reason
         )
         if zoom_response.status_code == 201:
             zoom_data = zoom_response.json()
             meeting_id = zoom_data.get("id")
-            logger.info("Saving meeting_id=%r", meeting_id)
-            meeting = ZoomMeeting.objects.create(
-                user_id=user_id,
-                meeting_id=meeting_id,
-                application=application,
-            )
-            logger.info("Saved %r", meeting)
-        response = proxy_zoom_response(zoom_response)
+            logger.debug("Saving meeting_id=%r", meeting_id)
+            if settings.ZAPIP_WRITE_BEHIND:
+                meeting = ZoomMeeting(
+                    user_id=user_id,
+                    meeting_id=meeting_id,
+                    application=application,
+                )
+                record_meetings([meeting])
+            else:
+                meeting = ZoomMeeting.objects.create(
+                    user_id=user_id,
+                    meeting_id=meeting_id,
+                    application=application,
+                )
+            remember_meeting_owner(meeting)
+            logger.debug("Saved %s", meeting)
+        response = proxy_zoom_response(
+            zoom_response,
+            stream=stream,
+            accept_encoding=request.headers.get("Accept-Encoding"),
+        )
         return response
 
 
 @method_decorator(csrf_exempt, name="dispatch")
-@method_decorator(auth_decorators, name="dispatch")
+@method_decorator(proxy_decorators, name="dispatch")
 class ReadUpdateDeleteMeeting(View):
     """
     Read, update and delete meetings.
@@ -132,20 +463,34 @@ class ReadUpdateDeleteMeeting(View):
         DELETE /meetings/{meetingId}
         https://marketplace.zoom.us/docs/api-reference/zoom-api/meetings/meetingdelete
         """
-        application, _ = Application.objects.get_or_create(
-            external_id=request.gateway_headers["application"]
-        )
-        meeting = ZoomMeeting.objects.filter(
-            application=application, meeting_id=meeting_id
-        ).first()
-        if not meeting:
-            return ZapipResponseForbidden(
-                data={
-                    "error": "unknown-meeting-id",
-                    "detail": "meeting id is not known to the proxy or not associated with your application",
-                }
+        application = get_application(request.gateway_identity.application)
+        if not is_meeting_owner(application, meeting_id):
+            return unknown_meeting_id_response()
+        cache_version = None
+        if request.method == "GET" and response_cache.get_ttl(
+            response_cache.GET_MEETING
+        ):
+            cache_version = response_cache.get_version(meeting_id)
+            cached = response_cache.get_meeting(
+                cache_version, application, meeting_id, request.GET
+            )
+            if cached is not None:
+                logger.debug("Serving cached response for /meetings/%s", meeting_id)
+                return response_cache.build_response(request, cached, "HIT")
+        mirror_response = request.method == "GET" and mirror.enabled_for(request)
+        if mirror_response:
+            max_stale = mirror.accepted_staleness(request)
+            mirrored = (
+                None
+                if max_stale is None
+                else mirror.get_meeting(application, meeting_id, max_stale)
             )
-        logger.info(
+            if mirrored is not None:
+                logger.debug("Serving mirrored /meetings/%s", meeting_id)
+                return mirror.build_response(
+                    mirrored, request.headers.get("Accept-Encoding")
+                )
+        logger.debug(
             "Forwarding %s to /meetings/%s for application=%r",
             request.method,
             meeting_id,
@@ -158,10 +503,432 @@ class ReadUpdateDeleteMeeting(View):
             "DELETE": zoom.delete_meeting,
         }
         handler = method_handlers[request.method]
-        proxy_request = make_proxy_request(request)
-        zoom_response = handler(meeting_id=meeting_id, **proxy_request)
-        logger.info(
+        coalesce = request.method == "GET" and bool(settings.ZAPIP_COALESCE_READS)
+        stream = (
+            settings.ZAPIP_STREAM_RESPONSES
+            and cache_version is None
+            and not mirror_response
+            and not coalesce
+        )
+        try:
+            proxy_request = make_proxy_request(request)
+            if coalesce:
+                zoom_response = singleflight.get_meeting(
+                    zoom, meeting_id=meeting_id, **proxy_request
+                )
+            else:
+                zoom_response = handler(
+                    meeting_id=meeting_id, stream=stream, **proxy_request
+                )
+        except RequestBodyTooLarge as exc:
+            return request_too_large_response(exc)
+        except ZoomRateLimited as exc:
+            return rate_limited_response(exc)
+        except ZoomUnavailable as exc:
+            return zoom_unavailable_response(exc)
+        logger.debug(
             "Zoom responded with %s %s", zoom_response.status_code, zoom_response.reason
         )
-        response = proxy_zoom_response(zoom_response)
+        if mirror_response and zoom_response.status_code == 200:
+            mirror.update_meeting(meeting_id, zoom_response)
+        elif (
+            settings.ZAPIP_MEETING_MIRROR
+            and request.method != "GET"
+            and 200 <= zoom_response.status_code < 300
+        ):
+            mirror.clear_meeting(meeting_id)
+        if cache_version is not None and zoom_response.status_code == 200:
+            cached = response_cache.set_meeting(
+                cache_version,
+                application,
+                meeting_id,
+                request.GET,
+                zoom_response,
+                EXCLUDED_RESPONSE_HEADERS,
+            )
+            return response_cache.build_response(request, cached, "MISS")
+        if request.method != "GET" and 200 <= zoom_response.status_code < 300:
+            response_cache.invalidate_meeting(meeting_id)
+        if request.method == "DELETE" and zoom_response.status_code == 204:
+            forget_meeting_owner(meeting_id)
+            retention.mark_deleted([meeting_id])
+        response = proxy_zoom_response(
+            zoom_response,
+            stream=stream,
+            accept_encoding=request.headers.get("Accept-Encoding"),
+        )
+        return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(proxy_decorators, name="dispatch")
+class AsyncCreateMeeting(View):
+    """
+    Async version of CreateMeeting, for use under ASGI.
+    """
+
+    async def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        # Overridden so the auth decorators see a coroutine function
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request: HttpRequest, user_id: str):
+        """
+        GET /users/{userId}/meetings
+        """
+        if user_id == "me":
+            return forbidden_user_id_response()
+        try:
+            page = listing.parse_page(request.GET)
+        except listing.ListingError as exc:
+            return listing_error_response(exc)
+        application = await aget_application(request.gateway_identity.application)
+        return ZapipResponse(
+            data=await listing.alist_meetings(application, user_id, page)
+        )
+
+    async def post(self, request: HttpRequest, user_id: str):
+        """
+        POST /users/{userId}/meetings
+        https://marketplace.zoom.us/docs/api-reference/zoom-api/meetings/meetingcreate
+        """
+        if user_id == "me":
+            return forbidden_user_id_response()
+        application = await aget_application(request.gateway_identity.application)
+        logger.debug(
+            "Forwarding POST to /users/%s/meetings for application=%r",
+            user_id,
+            application,
+        )
+        zoom = get_async_zoom_client()
+        stream = settings.ZAPIP_STREAM_RESPONSES
+        try:
+            proxy_request = make_proxy_request(request, is_async=True)
+            zoom_response = await zoom.create_meeting(
+                user_id=user_id, stream=stream, **proxy_request
+            )
+        except RequestBodyTooLarge as exc:
+            return request_too_large_response(exc)
+        except ZoomRateLimited as exc:
+            return rate_limited_response(exc)
+        except ZoomUnavailable as exc:
+            return zoom_unavailable_response(exc)
+        logger.debug(
+            "Zoom responded with %s %s",
+            zoom_response.status_code,
+            zoom_response.reason_phrase,
+        )
+        if zoom_response.status_code == 201:
+            # The meeting id is needed before passing the response on
+            await zoom_response.aread()
+            zoom_data = zoom_response.json()
+            meeting_id = zoom_data.get("id")
+            logger.debug("Saving meeting_id=%r", meeting_id)
+            if settings.ZAPIP_WRITE_BEHIND:
+                meeting = ZoomMeeting(
+                    user_id=user_id,
+                    meeting_id=meeting_id,
+                    application=application,
+                )
+                await arecord_meetings([meeting])
+            else:
+                meeting = await ZoomMeeting.objects.acreate(
+                    user_id=user_id,
+                    meeting_id=meeting_id,
+                    application=application,
+                )
+            remember_meeting_owner(meeting)
+            logger.debug("Saved %s", meeting)
+        response = proxy_zoom_response(
+            zoom_response,
+            stream=stream,
+            accept_encoding=request.headers.get("Accept-Encoding"),
+        )
+        return response
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(proxy_decorators, name="dispatch")
+class AsyncReadUpdateDeleteMeeting(View):
+    """
+    Async version of ReadUpdateDeleteMeeting, for use under ASGI.
+    """
+
+    http_method_names = ["get", "patch", "delete"]
+
+    async def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        # Overridden so the auth decorators see a coroutine function
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request: HttpRequest, meeting_id: int) -> HttpResponse:
+        """
+        GET /meetings/{meetingId}
+        https://marketplace.zoom.us/docs/api-reference/zoom-api/meetings/meeting
+        """
+        return await self._proxy(request, meeting_id)
+
+    async def patch(self, request: HttpRequest, meeting_id: int) -> HttpResponse:
+        """
+        PATCH /meetings/{meetingId}
+        https://marketplace.zoom.us/docs/api-reference/zoom-api/meetings/meetingupdate
+        """
+        return await self._proxy(request, meeting_id)
+
+    async def delete(self, request: HttpRequest, meeting_id: int) -> HttpResponse:
+        """
+        DELETE /meetings/{meetingId}
+        https://marketplace.zoom.us/docs/api-reference/zoom-api/meetings/meetingdelete
+        """
+        return await self._proxy(request, meeting_id)
+
+    async def _proxy(self, request: HttpRequest, meeting_id: int) -> HttpResponse:
+        application = await aget_application(request.gateway_identity.application)
+        if not await ais_meeting_owner(application, meeting_id):
+            return unknown_meeting_id_response()
+        cache_version = None
+        if request.method == "GET" and response_cache.get_ttl(
+            response_cache.GET_MEETING
+        ):
+            cache_version = await response_cache.aget_version(meeting_id)
+            cached = await response_cache.aget_meeting(
+                cache_version, application, meeting_id, request.GET
+            )
+            if cached is not None:
+                logger.debug("Serving cached response for /meetings/%s", meeting_id)
+                return response_cache.build_response(request, cached, "HIT")
+        mirror_response = request.method == "GET" and mirror.enabled_for(request)
+        if mirror_response:
+            max_stale = mirror.accepted_staleness(request)
+            mirrored = (
+                None
+                if max_stale is None
+                else await mirror.aget_meeting(application, meeting_id, max_stale)
+            )
+            if mirrored is not None:
+                logger.debug("Serving mirrored /meetings/%s", meeting_id)
+                return mirror.build_response(
+                    mirrored, request.headers.get("Accept-Encoding")
+                )
+        logger.debug(
+            "Forwarding %s to /meetings/%s for application=%r",
+            request.method,
+            meeting_id,
+            application,
+        )
+        zoom = get_async_zoom_client()
+        method_handlers = {
+            "GET": zoom.get_meeting,
+            "PATCH": zoom.update_meeting,
+            "DELETE": zoom.delete_meeting,
+        }
+        handler = method_handlers[request.method]
+        coalesce = request.method == "GET" and bool(settings.ZAPIP_COALESCE_READS)
+        stream = (
+            settings.ZAPIP_STREAM_RESPONSES
+            and cache_version is None
+            and not mirror_response
+            and not coalesce
+        )
+        try:
+            proxy_request = make_proxy_request(request, is_async=True)
+            if coalesce:
+                zoom_response = await singleflight.aget_meeting(
+                    zoom, meeting_id=meeting_id, **proxy_request
+                )
+            else:
+                zoom_response = await handler(
+                    meeting_id=meeting_id, stream=stream, **proxy_request
+                )
+        except RequestBodyTooLarge as exc:
+            return request_too_large_response(exc)
+        except ZoomRateLimited as exc:
+            return rate_limited_response(exc)
+        except ZoomUnavailable as exc:
+            return zoom_unavailable_response(exc)
+        logger.debug(
+            "Zoom responded with %s %s",
+            zoom_response.status_code,
+            zoom_response.reason_phrase,
+        )
+        if mirror_response and zoom_response.status_code == 200:
+            await mirror.aupdate_meeting(meeting_id, zoom_response)
+        elif (
+            settings.ZAPIP_MEETING_MIRROR
+            and request.method != "GET"
+            and 200 <= zoom_response.status_code < 300
+        ):
+            await mirror.aclear_meeting(meeting_id)
+        if cache_version is not None and zoom_response.status_code == 200:
+            cached = await response_cache.aset_meeting(
+                cache_version,
+                application,
+                meeting_id,
+                request.GET,
+                zoom_response,
+                EXCLUDED_RESPONSE_HEADERS,
+            )
+            return response_cache.build_response(request, cached, "MISS")
+        if request.method != "GET" and 200 <= zoom_response.status_code < 300:
+            await response_cache.ainvalidate_meeting(meeting_id)
+        if request.method == "DELETE" and zoom_response.status_code == 204:
+            forget_meeting_owner(meeting_id)
+            await retention.amark_deleted([meeting_id])
+        response = proxy_zoom_response(
+            zoom_response,
+            stream=stream,
+            accept_encoding=request.headers.get("Accept-Encoding"),
+        )
         return response
+
+
+def batch_error_response(exc: batch.BatchError) -> ZapipResponseBadRequest:
+    return ZapipResponseBadRequest(data={"error": "invalid-batch", "detail": str(exc)})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(proxy_decorators, name="dispatch")
+class BatchMeetings(View):
+    """
+    Run many meeting operations in one request, see zapip.batch.
+    """
+
+    def post(self, request: HttpRequest):
+        """
+        POST /batch
+        """
+        try:
+            operations = batch.parse_operations(request.body)
+        except batch.BatchError as exc:
+            return batch_error_response(exc)
+        application = get_application(request.gateway_identity.application)
+        logger.debug(
+            "Running batch of %d operations for application=%r",
+            len(operations),
+            application,
+        )
+        results = batch.run_batch(application, operations)
+        return ZapipResponse(data={"results": results})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(proxy_decorators, name="dispatch")
+class AsyncBatchMeetings(View):
+    """
+    Async version of BatchMeetings, for use under ASGI.
+    """
+
+    async def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        # Overridden so the auth decorators see a coroutine function
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def post(self, request: HttpRequest):
+        """
+        POST /batch
+        """
+        try:
+            operations = batch.parse_operations(request.body)
+        except batch.BatchError as exc:
+            return batch_error_response(exc)
+        application = await aget_application(request.gateway_identity.application)
+        logger.debug(
+            "Running batch of %d operations for application=%r",
+            len(operations),
+            application,
+        )
+        results = await batch.arun_batch(application, operations)
+        return ZapipResponse(data={"results": results})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(auth_decorators, name="dispatch")
+class ListMeetings(View):
+    """
+    List all meetings of the requesting application, see zapip.listing.
+    """
+
+    def get(self, request: HttpRequest):
+        """
+        GET /meetings
+        """
+        try:
+            page = listing.parse_page(request.GET)
+        except listing.ListingError as exc:
+            return listing_error_response(exc)
+        application = get_application(request.gateway_identity.application)
+        return ZapipResponse(data=listing.list_meetings(application, None, page))
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+@method_decorator(auth_decorators, name="dispatch")
+class AsyncListMeetings(View):
+    """
+    Async version of ListMeetings, for use under ASGI.
+    """
+
+    async def dispatch(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        # Overridden so the auth decorators see a coroutine function
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request: HttpRequest):
+        """
+        GET /meetings
+        """
+        try:
+            page = listing.parse_page(request.GET)
+        except listing.ListingError as exc:
+            return listing_error_response(exc)
+        application = await aget_application(request.gateway_identity.application)
+        return ZapipResponse(data=await listing.alist_meetings(application, None, page))
+
+
+@csrf_exempt
+@require_POST
+def zoom_webhook(request: HttpRequest) -> HttpResponse:
+    """
+    POST /webhooks
+
+    Receives meeting events from Zoom, see zapip.webhooks.
+    """
+    if not settings.ZOOM_WEBHOOK_SECRET_TOKEN:
+        return HttpResponseNotFound()
+    if not webhooks.verify(request):
+        logger.info("Webhook denied with invalid signature")
+        return ZapipResponseForbidden(data={"error": "invalid-signature"})
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return ZapipResponseBadRequest(
+            data={"error": "invalid-event", "detail": "request body is not valid JSON"}
+        )
+    if isinstance(data, dict) and data.get("event") == "endpoint.url_validation":
+        return JsonResponse(webhooks.validation_response(data))
+    event = webhooks.parse_event(data)
+    if event is not None:
+        webhooks.receive(event)
+    return HttpResponse(status=204)
+
+
+def client_ip(request: HttpRequest) -> Optional[str]:
+    """
+    The address of the client, as reported by ZAPIP_METRICS_CLIENT_IP_HEADER
+    if the request carries it, or else REMOTE_ADDR.
+    """
+    header = settings.ZAPIP_METRICS_CLIENT_IP_HEADER
+    value = request.META.get(header) if header is not None else None
+    if not value:
+        return request.META.get("REMOTE_ADDR")
+    return value.rsplit(",", 1)[-1].strip()
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Metrics of this process in the Prometheus text format.
+
+    Only clients in ZAPIP_METRICS_ALLOWED_IPS may read them, None allows all.
+    """
+    allowed_ips = settings.ZAPIP_METRICS_ALLOWED_IPS
+    if allowed_ips is not None and client_ip(request) not in allowed_ips:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
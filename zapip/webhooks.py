@@ -0,0 +1,261 @@
+"""
+Receiver of Zoom webhook events about meetings.
+
+Zoom posts events to /zoom/webhooks, signed with the secret token of the app
+in ZOOM_WEBHOOK_SECRET_TOKEN. The receiver checks the signature, answers
+Zoom's URL validation challenge, and acknowledges meeting events right away,
+queueing them for a background thread which applies them in batches every
+ZAPIP_WEBHOOK_INTERVAL seconds:
+
+- meeting.deleted marks the ZoomMeeting rows of the meeting as deleted
+- meeting.updated merges the changed fields into the mirrored details
+- every event invalidates the cached responses for the meeting, and is
+  forwarded to the webhook_url of the applications owning the meeting, in
+  one request per application and batch, signed with their webhook_secret
+
+Events of meetings created outside the proxy have no owner and are dropped.
+The queue is in memory, so events not applied when a process stops are lost;
+sync_meeting_mirror catches up with such changes.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+from django.http.request import HttpRequest
+
+from zapip import metrics, response_cache, retention
+from zapip.models import Application, ZoomMeeting
+
+logger = logging.getLogger(__name__)
+
+MEETING_EVENTS = {
+    "meeting.created",
+    "meeting.updated",
+    "meeting.deleted",
+    "meeting.ended",
+}
+
+SIGNATURE_HEADER = "x-zm-signature"
+TIMESTAMP_HEADER = "x-zm-request-timestamp"
+
+
+class MeetingEvent(NamedTuple):
+    event: str
+    meeting_id: int
+    data: Dict[str, Any]
+
+    @property
+    def object(self) -> Dict[str, Any]:
+        return self.data["payload"]["object"]
+
+
+def signature(secret: str, timestamp: str, body: bytes) -> str:
+    """
+    Signs a request body the way Zoom does.
+    """
+    message = b"v0:" + timestamp.encode() + b":" + body
+    return "v0=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify(request: HttpRequest) -> bool:
+    """
+    Whether a request is signed with ZOOM_WEBHOOK_SECRET_TOKEN and recent.
+    """
+    timestamp = request.headers.get(TIMESTAMP_HEADER, "")
+    if not timestamp.isdigit():
+        return False
+    if abs(time.time() - int(timestamp)) > settings.ZAPIP_WEBHOOK_MAX_AGE:
+        return False
+    expected = signature(settings.ZOOM_WEBHOOK_SECRET_TOKEN, timestamp, request.body)
+    provided = request.headers.get(SIGNATURE_HEADER, "")
+    return hmac.compare_digest(
+        expected.encode(), provided.encode(errors="surrogateescape")
+    )
+
+
+def validation_response(data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Answers the challenge of an endpoint.url_validation event.
+    """
+    plain_token = str(data["payload"]["plainToken"])
+    encrypted_token = hmac.new(
+        settings.ZOOM_WEBHOOK_SECRET_TOKEN.encode(),
+        plain_token.encode(),
+        hashlib.sha256,
+    ).hexdigest()
+    return {"plainToken": plain_token, "encryptedToken": encrypted_token}
+
+
+def parse_event(data: Any) -> Optional[MeetingEvent]:
+    """
+    Returns the meeting event in a webhook body, or None for other events.
+    """
+    if not isinstance(data, dict) or data.get("event") not in MEETING_EVENTS:
+        return None
+    try:
+        meeting_id = int(data["payload"]["object"]["id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return MeetingEvent(data["event"], meeting_id, data)
+
+
+def _merge_updates(events: List[MeetingEvent]) -> None:
+    changes: Dict[int, Dict[str, Any]] = defaultdict(dict)
+    for event in events:
+        if event.event == "meeting.updated":
+            changes[event.meeting_id].update(event.object)
+    if not changes:
+        return
+    meetings = list(
+        ZoomMeeting.objects.filter(meeting_id__in=changes, mirror__isnull=False)
+    )
+    for meeting in meetings:
+        meeting.mirror.update(changes[meeting.meeting_id])
+    ZoomMeeting.objects.bulk_update(meetings, ["mirror"])
+
+
+def _forward(application: Application, events: List[MeetingEvent]) -> None:
+    body = json.dumps({"events": [event.data for event in events]}).encode()
+    headers = {"content-type": "application/json"}
+    if application.webhook_secret:
+        timestamp = str(int(time.time()))
+        headers["X-Zapip-Request-Timestamp"] = timestamp
+        headers["X-Zapip-Signature"] = signature(
+            application.webhook_secret, timestamp, body
+        )
+    try:
+        response = requests.post(
+            application.webhook_url,
+            data=body,
+            headers=headers,
+            timeout=settings.ZAPIP_WEBHOOK_FORWARD_TIMEOUT,
+        )
+        response.raise_for_status()
+    except requests.RequestException as exc:
+        logger.warning("Forwarding events to %r failed: %s", application, exc)
+
+
+def apply_events(events: List[MeetingEvent]) -> None:
+    """
+    Applies a batch of meeting events to the database and caches, and
+    forwards them to the applications owning the meetings.
+    """
+    meeting_ids = {event.meeting_id for event in events}
+    owners: Dict[int, Set[int]] = defaultdict(set)
+    for meeting_id, application_id in ZoomMeeting.objects.filter(
+        meeting_id__in=meeting_ids
+    ).values_list("meeting_id", "application_id"):
+        owners[meeting_id].add(application_id)
+    _merge_updates(events)
+    deleted = {e.meeting_id for e in events if e.event == "meeting.deleted"}
+    if deleted:
+        retention.mark_deleted(deleted)
+    for meeting_id in meeting_ids:
+        response_cache.invalidate_meeting(meeting_id)
+    by_application: Dict[int, List[MeetingEvent]] = defaultdict(list)
+    for event in events:
+        for application_id in owners[event.meeting_id]:
+            by_application[application_id].append(event)
+    if by_application:
+        for application in Application.objects.filter(pk__in=by_application).exclude(
+            webhook_url=""
+        ):
+            _forward(application, by_application[application.pk])
+    logger.info(
+        "Applied %d meeting events, %d of owned meetings",
+        len(events),
+        sum(len(e) for e in by_application.values()),
+    )
+
+
+class EventApplier(threading.Thread):
+    """
+    Applies queued events in batches every interval seconds until stopped.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        super().__init__(name="zapip-webhook-applier", daemon=True)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.queue: "queue.SimpleQueue[MeetingEvent]" = queue.SimpleQueue()
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            try:
+                self.drain()
+            except Exception:
+                logger.exception("Applying meeting events failed")
+            finally:
+                close_old_connections()
+
+    def drain(self) -> None:
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                apply_events(batch)
+            if len(batch) < self.batch_size:
+                return
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+_applier: Optional[EventApplier] = None
+_applier_lock = threading.Lock()
+
+
+def get_applier() -> EventApplier:
+    """
+    Returns the event applier of this process, starting it if needed.
+    """
+    global _applier
+    with _applier_lock:
+        if _applier is None or not _applier.is_alive():
+            _applier = EventApplier(
+                settings.ZAPIP_WEBHOOK_INTERVAL, settings.ZAPIP_WEBHOOK_BATCH_SIZE
+            )
+            _applier.start()
+        return _applier
+
+
+def reset_applier() -> None:
+    global _applier
+    with _applier_lock:
+        if _applier is not None:
+            _applier.stop()
+        _applier = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs: Any) -> None:
+    if setting.startswith("ZAPIP_WEBHOOK_"):
+        reset_applier()
+
+
+def receive(event: MeetingEvent) -> None:
+    """
+    Queues an event, or applies it right away if ZAPIP_WEBHOOK_INTERVAL is 0.
+    """
+    metrics.webhook_events_total.inc(event.event)
+    if settings.ZAPIP_WEBHOOK_INTERVAL <= 0:
+        apply_events([event])
+    else:
+        get_applier().queue.put(event)
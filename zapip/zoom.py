@@ -1,37 +1,890 @@
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+import weakref
+from asyncio import AbstractEventLoop, get_running_loop
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 from urllib.parse import urljoin, urlparse
 
+import httpx
 import requests
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+from zapip import log, metrics
 
 logger = logging.getLogger(__name__)
 
+_shared_client: Optional["ZoomClient"] = None
+_shared_client_pid: Optional[int] = None
+_shared_client_lock = threading.RLock()
+_shared_rate_limiter: Optional["RateLimiter"] = None
+_shared_circuit_breaker: Optional["CircuitBreaker"] = None
+_shared_token_manager: Optional["TokenManager"] = None
+
+# Methods which are safe to retry
+IDEMPOTENT_METHODS = {"GET", "DELETE"}
+
+# Upstream statuses which count as failures, and are retried for idempotent calls
+FAILURE_STATUSES = {500, 502, 503, 504}
+
 
 def get_zoom_client(
     url: Optional[str] = None, headers: Optional[Dict[str, str]] = None
 ) -> "ZoomClient":
     """
-    Initializes a ZoomClient according to app settings.
+    Returns a ZoomClient according to app settings.
+
+    Without arguments, the process-wide pooled client is returned. Passing a
+    url or extra headers builds a dedicated client instead.
+    """
+    if url is None and headers is None:
+        return get_shared_zoom_client()
+    return build_zoom_client(url=url, headers=headers)
+
+
+def build_zoom_client(
+    url: Optional[str] = None, headers: Optional[Dict[str, str]] = None
+) -> "ZoomClient":
+    """
+    Initializes a new ZoomClient with a pooled session according to app settings.
     """
     default_headers = settings.ZOOM_API_HEADERS
-    headers = headers or {}
+    headers = dict(headers or {})
     headers.update(default_headers)
     return ZoomClient(
         url=url or settings.ZOOM_API_BASE_URL,
         headers=headers,
+        session=build_session(),
+        rate_limiter=get_rate_limiter(),
+        retry_policy=get_retry_policy(),
+        circuit_breaker=get_circuit_breaker(),
+        timeout=(settings.ZOOM_API_CONNECT_TIMEOUT, settings.ZOOM_API_READ_TIMEOUT),
+        token_manager=get_token_manager(),
     )
 
 
-class ZoomClient:
+def build_session() -> requests.Session:
     """
-    A very simple Zoom client, mostly a wrapper around requests.
+    Creates a requests.Session with a connection pool sized by app settings.
+    """
+    session = requests.Session()
+    adapter = ZoomHTTPAdapter(
+        pool_connections=settings.ZOOM_API_POOL_CONNECTIONS,
+        pool_maxsize=settings.ZOOM_API_POOL_MAXSIZE,
+        pool_block=settings.ZOOM_API_POOL_BLOCK,
+        keepalive=settings.ZOOM_API_POOL_KEEPALIVE,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_shared_zoom_client() -> "ZoomClient":
+    """
+    Returns the ZoomClient shared by all threads in this process.
+
+    The client is created on first use, and recreated if the process has been
+    forked since it was created, so that workers never share sockets.
+    """
+    global _shared_client, _shared_client_pid
+    pid = os.getpid()
+    client = _shared_client
+    if client is not None and _shared_client_pid == pid:
+        return client
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client_pid != pid:
+            logger.debug("Creating shared Zoom client for pid=%s", pid)
+            _shared_client = build_zoom_client()
+            _shared_client_pid = pid
+        return _shared_client
+
+
+# One client per event loop, dropped along with its loop. The clients are not
+# closed: under an ASGI server a worker runs one loop until the process exits,
+# and a loop which has been collected can no longer run aclose(), so its
+# connections are left to be closed as their sockets are collected.
+_shared_async_clients: MutableMapping[AbstractEventLoop, "AsyncZoomClient"] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_zoom_client() -> "AsyncZoomClient":
+    """
+    Returns the AsyncZoomClient shared by all tasks on the running event loop.
+
+    httpx connection pools are bound to the event loop they were created on,
+    so there is one client per loop (in practice, one per worker process).
+    """
+    loop = get_running_loop()
+    client = _shared_async_clients.get(loop)
+    if client is None:
+        logger.debug("Creating shared async Zoom client for pid=%s", os.getpid())
+        client = build_async_zoom_client()
+        _shared_async_clients[loop] = client
+    return client
+
+
+def build_async_zoom_client(
+    url: Optional[str] = None, headers: Optional[Dict[str, str]] = None
+) -> "AsyncZoomClient":
+    """
+    Initializes a new AsyncZoomClient with a pooled httpx client according to
+    app settings.
+    """
+    default_headers = settings.ZOOM_API_HEADERS
+    headers = dict(headers or {})
+    headers.update(default_headers)
+    limits = httpx.Limits(
+        max_connections=settings.ZOOM_API_ASYNC_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.ZOOM_API_ASYNC_MAX_KEEPALIVE_CONNECTIONS,
+    )
+    timeout = httpx.Timeout(
+        settings.ZOOM_API_READ_TIMEOUT, connect=settings.ZOOM_API_CONNECT_TIMEOUT
+    )
+    return AsyncZoomClient(
+        url=url or settings.ZOOM_API_BASE_URL,
+        headers=headers,
+        client=httpx.AsyncClient(limits=limits, timeout=timeout),
+        rate_limiter=get_rate_limiter(),
+        retry_policy=get_retry_policy(),
+        circuit_breaker=get_circuit_breaker(),
+        token_manager=get_token_manager(),
+    )
+
+
+def get_rate_limiter() -> "RateLimiter":
+    """
+    Returns the RateLimiter shared by all Zoom clients in this process.
     """
+    global _shared_rate_limiter
+    with _shared_client_lock:
+        if _shared_rate_limiter is None:
+            _shared_rate_limiter = RateLimiter(
+                limits=settings.ZOOM_API_RATE_LIMITS,
+                max_wait=settings.ZOOM_API_RATE_LIMIT_MAX_WAIT,
+            )
+        return _shared_rate_limiter
 
-    def __init__(self, url: str, headers: Optional[Dict[str, str]]):
+
+def get_retry_policy() -> "RetryPolicy":
+    return RetryPolicy(
+        retries=settings.ZOOM_API_RETRIES,
+        backoff=settings.ZOOM_API_RETRY_BACKOFF,
+        backoff_max=settings.ZOOM_API_RETRY_BACKOFF_MAX,
+    )
+
+
+def get_circuit_breaker() -> "CircuitBreaker":
+    """
+    Returns the CircuitBreaker shared by all Zoom clients in this process.
+    """
+    global _shared_circuit_breaker
+    with _shared_client_lock:
+        if _shared_circuit_breaker is None:
+            _shared_circuit_breaker = CircuitBreaker(
+                threshold=settings.ZOOM_API_CIRCUIT_BREAKER_THRESHOLD,
+                reset_timeout=settings.ZOOM_API_CIRCUIT_BREAKER_RESET_TIMEOUT,
+            )
+        return _shared_circuit_breaker
+
+
+def get_token_manager() -> Optional["TokenManager"]:
+    """
+    Returns the TokenManager shared by all Zoom clients in this process, or
+    None if Server-to-Server OAuth is not configured.
+    """
+    global _shared_token_manager
+    if not settings.ZOOM_API_OAUTH_CLIENT_ID:
+        return None
+    with _shared_client_lock:
+        if _shared_token_manager is None:
+            _shared_token_manager = TokenManager(
+                token_url=settings.ZOOM_API_OAUTH_TOKEN_URL,
+                account_id=settings.ZOOM_API_OAUTH_ACCOUNT_ID,
+                client_id=settings.ZOOM_API_OAUTH_CLIENT_ID,
+                client_secret=settings.ZOOM_API_OAUTH_CLIENT_SECRET,
+                refresh_margin=settings.ZOOM_API_OAUTH_REFRESH_MARGIN,
+                cache=caches[settings.ZOOM_API_OAUTH_CACHE_ALIAS],
+                timeout=(
+                    settings.ZOOM_API_CONNECT_TIMEOUT,
+                    settings.ZOOM_API_READ_TIMEOUT,
+                ),
+            )
+        return _shared_token_manager
+
+
+def reset_shared_zoom_client() -> None:
+    """
+    Drops the shared Zoom clients, so that the next call creates new ones.
+    """
+    global _shared_client, _shared_client_pid
+    global _shared_rate_limiter, _shared_circuit_breaker, _shared_token_manager
+    _shared_client = None
+    _shared_client_pid = None
+    _shared_rate_limiter = None
+    _shared_circuit_breaker = None
+    _shared_token_manager = None
+    _shared_async_clients.clear()
+
+
+def pool_stats() -> List[Tuple[str, Dict[str, int]]]:
+    """
+    Returns connection pool usage of the shared ZoomClient, per upstream host.
+    """
+    client = _shared_client
+    if client is None or _shared_client_pid != os.getpid():
+        return []
+    stats = []
+    for adapter in set(client.session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats.append(
+                (
+                    pool.host,
+                    {
+                        "connections": pool.num_connections,
+                        "requests": pool.num_requests,
+                        "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                    },
+                )
+            )
+    return stats
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_shared_zoom_client)
+
+
+@receiver(setting_changed)
+def _reset_on_setting_changed(setting: str, **kwargs: Any) -> None:
+    if setting.startswith("ZOOM_API_"):
+        reset_shared_zoom_client()
+
+
+class ZoomHTTPAdapter(HTTPAdapter):
+    """
+    A HTTPAdapter which optionally enables TCP keep-alive on pooled connections,
+    so idle connections to the upstream are not silently dropped by middleboxes.
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ["keepalive"]
+
+    def __init__(self, keepalive: bool = True, **kwargs: Any):
+        self.keepalive = keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        if self.keepalive:
+            kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class ZoomRateLimited(Exception):
+    """
+    Raised instead of calling Zoom when a call would have to wait too long
+    for the rate limit.
+    """
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(
+            "Rate limit for {} exceeded, retry after {:.1f}s".format(
+                endpoint, retry_after
+            )
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parses a Retry-After header, given as seconds or as a date, into seconds.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            when = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled at rate tokens per second, holding at
+    most capacity tokens.
+
+    Tokens are reserved up front, so the token count goes negative while
+    callers are queued, and each queued caller waits for its own token.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # No tokens accumulate while paused, so traffic restarts gently
+        elapsed = now - max(self.updated, self.paused_until)
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """
+        Reserves a token and returns the seconds to wait before using it, or
+        returns None without reserving if that would take longer than max_wait.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            wait = max(
+                self.paused_until - now,
+                (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0,
+            )
+            if wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def wait_time(self) -> float:
+        """
+        Returns the seconds until a token would be available.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            return max(
+                self.paused_until - now,
+                (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0,
+            )
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hands out no tokens for the given number of seconds.
+        """
+        with self._lock:
+            now = self.clock()
+            self._refill(now)
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+    def drain(self) -> None:
+        """
+        Empties the bucket, so the next caller waits for a refill.
+        """
+        with self._lock:
+            self._refill(self.clock())
+            self.tokens = min(self.tokens, 0.0)
+
+    def set_rate(self, rate: float) -> None:
+        with self._lock:
+            self._refill(self.clock())
+            self.rate = rate
+            self.capacity = max(1.0, rate)
+            self.tokens = min(self.tokens, self.capacity)
+
+
+class RateLimiter:
+    """
+    Schedules calls to Zoom with a token bucket per endpoint class.
+
+    Callers are queued for up to max_wait seconds, beyond that ZoomRateLimited
+    is raised. Buckets follow the rate limit headers Zoom sends back.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, Tuple[float, float]],
+        max_wait: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_wait = max_wait
+        self.clock = clock
+        self.buckets = {
+            endpoint: TokenBucket(rate=rate, capacity=burst, clock=clock)
+            for endpoint, (rate, burst) in limits.items()
+        }
+
+    def reserve(self, endpoint: Optional[str]) -> float:
+        """
+        Returns the seconds to wait before calling the endpoint.
+
+        Raises ZoomRateLimited if the wait would exceed max_wait.
+        """
+        bucket = self.buckets.get(endpoint) if endpoint else None
+        if bucket is None:
+            return 0.0
+        wait = bucket.reserve(self.max_wait)
+        if wait is None:
+            raise ZoomRateLimited(endpoint, bucket.wait_time())
+        return wait
+
+    def update(
+        self, endpoint: Optional[str], status_code: int, headers: Mapping[str, str]
+    ) -> None:
+        """
+        Adjusts the bucket for an endpoint to a response from Zoom.
+        """
+        bucket = self.buckets.get(endpoint) if endpoint else None
+        if bucket is None:
+            return
+        limit_type = (headers.get("X-RateLimit-Type") or "").lower()
+        remaining = headers.get("X-RateLimit-Remaining")
+        if status_code == 429:
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            if retry_after is None and "daily" in limit_type:
+                retry_after = seconds_until_utc_midnight()
+            logger.warning(
+                "Zoom rate limit hit for %s, pausing for %ss", endpoint, retry_after
+            )
+            bucket.pause(1.0 if retry_after is None else retry_after)
+            return
+        if limit_type == "qps":
+            try:
+                limit = float(headers.get("X-RateLimit-Limit") or "")
+            except ValueError:
+                limit = 0.0
+            if limit > 0 and limit != bucket.rate:
+                bucket.set_rate(limit)
+        if remaining == "0":
+            if "daily" in limit_type:
+                bucket.pause(seconds_until_utc_midnight())
+            else:
+                bucket.drain()
+
+
+def seconds_until_utc_midnight() -> float:
+    """
+    Zoom resets daily rate limits at midnight UTC.
+    """
+    now = datetime.now(timezone.utc)
+    midnight = (now + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return (midnight - now).total_seconds()
+
+
+class ZoomUnavailable(Exception):
+    """
+    Raised when Zoom could not be reached, or is considered unhealthy.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """
+    Retries with exponential backoff and full jitter.
+    """
+
+    def __init__(self, retries: int, backoff: float, backoff_max: float):
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+
+    def attempts(self, method_name: str) -> int:
+        if method_name.upper() in IDEMPOTENT_METHODS:
+            return 1 + self.retries
+        return 1
+
+    def delay(self, attempt: int) -> float:
+        """
+        Returns the seconds to wait after the given (zero-based) attempt failed.
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+
+
+class CircuitBreaker:
+    """
+    Stops calls to Zoom after threshold consecutive failures.
+
+    After reset_timeout seconds, a single trial call is let through. If it
+    succeeds the circuit closes again, otherwise it stays open for another
+    reset_timeout. A threshold of 0 disables the breaker.
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self.threshold > 0 and self.failures >= self.threshold
+
+    def allow(self) -> bool:
+        with self._lock:
+            if not self.is_open:
+                return True
+            if self.trial_started:
+                return False
+            if self.clock() - self.opened_at >= self.reset_timeout:
+                self.trial_started = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def release(self) -> None:
+        """
+        Gives up a trial call which never reached Zoom, so another can be made.
+        """
+        with self._lock:
+            self.trial_started = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.is_open:
+                logger.info("Zoom circuit breaker closed")
+            self.failures = 0
+            self.trial_started = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.is_open and (self.trial_started or self.failures == self.threshold):
+                logger.warning("Zoom circuit breaker opened")
+                self.opened_at = self.clock()
+            self.trial_started = False
+
+
+class AccessToken(NamedTuple):
+    value: str
+    # wall clock time, as tokens are shared between processes
+    expires_at: float
+
+
+class TokenManager:
+    """
+    Keeps a Server-to-Server OAuth access token for calling Zoom.
+
+    The token is held in memory, so calls normally get it without any I/O.
+    Within refresh_margin seconds of its expiry, calls keep getting the
+    current token while a background thread fetches the next one. Tokens are
+    shared with other processes through a Django cache, and refreshes are
+    single-flight: one thread in a process refreshes at a time, and one
+    process at a time fetches from Zoom, holding a lock in the cache.
+    """
+
+    def __init__(
+        self,
+        token_url: str,
+        account_id: Optional[str],
+        client_id: str,
+        client_secret: Optional[str],
+        refresh_margin: float,
+        cache: BaseCache,
+        session: Optional[requests.Session] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+        lock_timeout: float = 10.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.token_url = token_url
+        self.account_id = account_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.cache = cache
+        self.cache_key = "zapip:zoom-token:{}:{}".format(account_id, client_id)
+        self.session = requests.Session() if session is None else session
+        self.timeout = timeout
+        self.lock_timeout = lock_timeout
+        self.clock = clock
+        self.token: Optional[AccessToken] = None
+        self.refreshing = False
+        # held while refreshing; the state lock guards token and refreshing
+        self._refresh_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+
+    def _expires_in(self, token: AccessToken) -> float:
+        return token.expires_at - self.clock()
+
+    def get_token(self) -> str:
+        """
+        Returns a valid access token, blocking only if there is none yet or
+        the current one has expired.
+        """
+        token = self.token
+        if token is not None:
+            expires_in = self._expires_in(token)
+            if expires_in > self.refresh_margin:
+                return token.value
+            if expires_in > 0:
+                self._refresh_in_background()
+                return token.value
+        with self._refresh_lock:
+            token = self.token
+            if token is None or self._expires_in(token) <= 0:
+                token = self._refresh()
+            return token.value
+
+    async def aget_token(self) -> str:
+        """
+        Async version of get_token, which fetches in a thread if it must.
+        """
+        token = self.token
+        if token is not None and self._expires_in(token) > 0:
+            return self.get_token()
+        return await sync_to_async(self.get_token, thread_sensitive=False)()
+
+    def invalidate(self, value: str) -> None:
+        """
+        Drops a token Zoom has refused, so the next call gets a new one.
+        """
+        with self._state_lock:
+            if self.token is not None and self.token.value == value:
+                self.token = None
+        shared = self.cache.get(self.cache_key)
+        if shared is not None and shared[0] == value:
+            self.cache.delete(self.cache_key)
+
+    def _refresh_in_background(self) -> None:
+        with self._state_lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(
+            target=self._background_refresh, name="zapip-zoom-token", daemon=True
+        ).start()
+
+    def _background_refresh(self) -> None:
+        try:
+            with self._refresh_lock:
+                token = self.token
+                if token is None or self._expires_in(token) <= self.refresh_margin:
+                    self._refresh()
+        except Exception:
+            logger.exception("Refreshing the Zoom access token failed")
+        finally:
+            with self._state_lock:
+                self.refreshing = False
+
+    def _shared_token(self) -> Optional[AccessToken]:
+        """
+        Returns the token in the cache if it is newer than ours.
+        """
+        shared = self.cache.get(self.cache_key)
+        if shared is None:
+            return None
+        token = AccessToken(*shared)
+        current = self.token
+        if self._expires_in(token) <= 0 or (
+            current is not None and token.expires_at <= current.expires_at
+        ):
+            return None
+        return token
+
+    def _refresh(self) -> AccessToken:
+        """
+        Replaces the token with a newer one from the cache, or from Zoom if no
+        other process has fetched one. Called holding the refresh lock.
+        """
+        token = self._shared_token()
+        if token is None:
+            lock_key = self.cache_key + ":lock"
+            if self.cache.add(lock_key, uuid.uuid4().hex, self.lock_timeout):
+                try:
+                    token = self._shared_token() or self._fetch()
+                finally:
+                    self.cache.delete(lock_key)
+            else:
+                token = self._wait_for_shared_token(lock_key)
+        with self._state_lock:
+            self.token = token
+        return token
+
+    def _wait_for_shared_token(self, lock_key: str) -> AccessToken:
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            token = self._shared_token()
+            if token is not None:
+                return token
+            if self.cache.get(lock_key) is None:
+                break
+        # the other process failed or is too slow; use ours while it lasts
+        current = self.token
+        if current is not None and self._expires_in(current) > 0:
+            return current
+        return self._fetch()
+
+    def _fetch(self) -> AccessToken:
+        logger.info("Fetching Zoom access token for client_id=%s", self.client_id)
+        try:
+            response = self.session.post(
+                self.token_url,
+                params={
+                    "grant_type": "account_credentials",
+                    "account_id": self.account_id,
+                },
+                auth=(self.client_id, self.client_secret or ""),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            data = response.json()
+            token = AccessToken(
+                str(data["access_token"]), self.clock() + float(data["expires_in"])
+            )
+        except (requests.RequestException, ValueError, KeyError, TypeError) as exc:
+            metrics.token_fetches_total.inc("error")
+            logger.warning("Fetching Zoom access token failed: %s", exc)
+            raise ZoomUnavailable("Zoom access token could not be fetched") from exc
+        metrics.token_fetches_total.inc("success")
+        self.cache.set(
+            self.cache_key, tuple(token), max(1, int(self._expires_in(token)))
+        )
+        return token
+
+
+class BaseZoomClient:
+    """
+    Common parts of the sync and async Zoom clients.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        token_manager: Optional[TokenManager] = None,
+    ):
         self.url = url
         self.headers = {} if headers is None else headers
-        self.session = requests.Session()
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.token_manager = token_manager
+
+    def _attempts(self, method_name: str) -> int:
+        if self.retry_policy is None:
+            return 1
+        return self.retry_policy.attempts(method_name)
+
+    def _before_attempt(self, endpoint: Optional[str]) -> float:
+        """
+        Checks the circuit breaker and the rate limit, and returns the seconds
+        to wait before calling Zoom.
+        """
+        # reserved first, so being rate limited never takes the trial call
+        wait = 0.0 if self.rate_limiter is None else self.rate_limiter.reserve(endpoint)
+        if self.circuit_breaker is not None and not self.circuit_breaker.allow():
+            raise ZoomUnavailable(
+                "Zoom is unavailable", retry_after=self.circuit_breaker.retry_after()
+            )
+        return wait
+
+    def _abandon_attempt(
+        self, endpoint: Optional[str], method_name: str, started: Optional[float]
+    ) -> None:
+        """
+        Records an attempt ended by an unexpected exception or cancellation,
+        so a half-open circuit breaker does not wait for it forever.
+        """
+        if started is not None:
+            self._after_attempt(endpoint, method_name, started, None)
+        elif self.circuit_breaker is not None:
+            self.circuit_breaker.release()
+
+    def _after_attempt(
+        self,
+        endpoint: Optional[str],
+        method_name: str,
+        started: float,
+        status_code: Optional[int],
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> bool:
+        """
+        Records the outcome of a call, and returns whether it failed.
+
+        A status_code of None means no response was received.
+        """
+        endpoint_label = endpoint or "other"
+        elapsed = time.perf_counter() - started
+        metrics.upstream_duration.observe(elapsed, endpoint_label, method_name)
+        log.record_upstream(elapsed)
+        metrics.upstream_requests_total.inc(
+            endpoint_label,
+            method_name,
+            "error" if status_code is None else str(status_code),
+        )
+        failed = status_code is None or status_code in FAILURE_STATUSES
+        if self.circuit_breaker is not None:
+            if failed:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+        if self.rate_limiter is not None and status_code is not None:
+            self.rate_limiter.update(endpoint, status_code, headers or {})
+        return failed
+
+    def _check_token(self, token: Optional[str], status_code: int) -> None:
+        if self.token_manager is not None and token is not None and status_code == 401:
+            logger.warning("Zoom refused the access token, dropping it")
+            self.token_manager.invalidate(token)
+
+    def _retry_delay(self, attempt: int) -> float:
+        assert self.retry_policy is not None
+        return self.retry_policy.delay(attempt)
 
     def _build_request_headers(
         self, headers: Optional[Dict[str, str]]
@@ -43,21 +896,93 @@ class ZoomClient:
             request_headers[h] = headers[h]
         return request_headers
 
+
+class ZoomClient(BaseZoomClient):
+    """
+    A very simple Zoom client, mostly a wrapper around requests.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        timeout: Optional[Tuple[float, float]] = None,
+        token_manager: Optional[TokenManager] = None,
+    ):
+        super().__init__(
+            url, headers, rate_limiter, retry_policy, circuit_breaker, token_manager
+        )
+        self.session = requests.Session() if session is None else session
+        self.timeout = timeout
+
     def call(
         self,
         method_name: str,
         url: str,
         headers: Optional[Dict[str, str]] = None,
         params: Optional[Dict[str, Any]] = None,
+        endpoint: Optional[str] = None,
         **kwargs,
     ) -> requests.models.Response:
+        """
+        Calls Zoom, subject to the rate limit for the endpoint class if given.
+
+        Idempotent calls are retried on connection errors and 5xx responses.
+        Raises ZoomUnavailable if Zoom could not be reached, or if the circuit
+        breaker is open.
+        """
         headers = self._build_request_headers(headers)
-        logger.debug(
-            "Calling %s %s with params=%r", method_name, urlparse(url).path, params
-        )
-        return self.session.request(
-            method_name, url, headers=headers, params=params, **kwargs
-        )
+        token = None
+        if self.token_manager is not None:
+            token = self.token_manager.get_token()
+            headers["Authorization"] = "Bearer " + token
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = self._attempts(method_name)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            wait = self._before_attempt(endpoint)
+            started: Optional[float] = None
+            try:
+                if wait > 0:
+                    logger.debug("Waiting %.3fs for the %s rate limit", wait, endpoint)
+                    time.sleep(wait)
+                logger.debug(
+                    "Calling %s %s with params=%r",
+                    method_name,
+                    urlparse(url).path,
+                    params,
+                )
+                started = time.perf_counter()
+                response = self.session.request(
+                    method_name, url, headers=headers, params=params, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                assert started is not None
+                self._after_attempt(endpoint, method_name, started, None)
+                logger.warning("Calling %s %s failed: %s", method_name, url, exc)
+                if last_attempt:
+                    raise ZoomUnavailable(str(exc)) from exc
+            except BaseException:
+                self._abandon_attempt(endpoint, method_name, started)
+                raise
+            else:
+                failed = self._after_attempt(
+                    endpoint,
+                    method_name,
+                    started,
+                    response.status_code,
+                    response.headers,
+                )
+                self._check_token(token, response.status_code)
+                if not failed or last_attempt:
+                    return response
+                response.close()
+            time.sleep(self._retry_delay(attempt))
+        raise AssertionError("unreachable")
 
     def get(self, url: str, **kwargs):
         return self.call("GET", url, **kwargs)
@@ -73,20 +998,175 @@ class ZoomClient:
 
     def create_meeting(self, user_id: str, data: Any, **kwargs: Any):
         return self.post(
-            urljoin(self.url, f"v2/users/{user_id}/meetings"), data=data, **kwargs
+            urljoin(self.url, f"v2/users/{user_id}/meetings"),
+            data=data,
+            endpoint="create",
+            **kwargs,
         )
 
     def get_meeting(self, meeting_id: int, data: Any, **kwargs: Any):
         return self.get(
-            urljoin(self.url, f"v2/meetings/{meeting_id}"), data=data, **kwargs
+            urljoin(self.url, f"v2/meetings/{meeting_id}"),
+            data=data,
+            endpoint="get",
+            **kwargs,
         )
 
     def update_meeting(self, meeting_id: int, data: Any, **kwargs: Any):
         return self.patch(
-            urljoin(self.url, f"v2/meetings/{meeting_id}"), data=data, **kwargs
+            urljoin(self.url, f"v2/meetings/{meeting_id}"),
+            data=data,
+            endpoint="update",
+            **kwargs,
         )
 
     def delete_meeting(self, meeting_id: int, data: Any, **kwargs: Any):
         return self.delete(
-            urljoin(self.url, f"v2/meetings/{meeting_id}"), data=data, **kwargs
+            urljoin(self.url, f"v2/meetings/{meeting_id}"),
+            data=data,
+            endpoint="delete",
+            **kwargs,
+        )
+
+
+class AsyncZoomClient(BaseZoomClient):
+    """
+    An asyncio Zoom client, mostly a wrapper around httpx.
+
+    Takes the same arguments as ZoomClient, so the output of
+    make_proxy_request can be passed to either.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        headers: Optional[Dict[str, str]],
+        client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        token_manager: Optional[TokenManager] = None,
+    ):
+        super().__init__(
+            url, headers, rate_limiter, retry_policy, circuit_breaker, token_manager
+        )
+        self.client = httpx.AsyncClient() if client is None else client
+
+    async def call(
+        self,
+        method_name: str,
+        url: str,
+        headers: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        data: Any = None,
+        stream: bool = False,
+        endpoint: Optional[str] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        """
+        Calls Zoom, subject to the rate limit for the endpoint class if given.
+
+        Idempotent calls are retried on connection errors and 5xx responses.
+        Raises ZoomUnavailable if Zoom could not be reached, or if the circuit
+        breaker is open.
+
+        With stream=True, the body is not read; the caller must consume or
+        close the response to release the connection.
+        """
+        headers = self._build_request_headers(headers)
+        token = None
+        if self.token_manager is not None:
+            token = await self.token_manager.aget_token()
+            headers["Authorization"] = "Bearer " + token
+        attempts = self._attempts(method_name)
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            wait = self._before_attempt(endpoint)
+            started: Optional[float] = None
+            try:
+                if wait > 0:
+                    logger.debug("Waiting %.3fs for the %s rate limit", wait, endpoint)
+                    await asyncio.sleep(wait)
+                logger.debug(
+                    "Calling %s %s with params=%r",
+                    method_name,
+                    urlparse(url).path,
+                    params,
+                )
+                request = self.client.build_request(
+                    method_name,
+                    url,
+                    headers=headers,
+                    params=params,
+                    content=data,
+                    **kwargs,
+                )
+                started = time.perf_counter()
+                response = await self.client.send(request, stream=stream)
+            except httpx.TransportError as exc:
+                assert started is not None
+                self._after_attempt(endpoint, method_name, started, None)
+                logger.warning("Calling %s %s failed: %r", method_name, url, exc)
+                if last_attempt:
+                    raise ZoomUnavailable(str(exc)) from exc
+            except BaseException:
+                self._abandon_attempt(endpoint, method_name, started)
+                raise
+            else:
+                failed = self._after_attempt(
+                    endpoint,
+                    method_name,
+                    started,
+                    response.status_code,
+                    response.headers,
+                )
+                self._check_token(token, response.status_code)
+                if not failed or last_attempt:
+                    return response
+                await response.aclose()
+            await asyncio.sleep(self._retry_delay(attempt))
+        raise AssertionError("unreachable")
+
+    async def get(self, url: str, **kwargs):
+        return await self.call("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.call("POST", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs):
+        return await self.call("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs):
+        return await self.call("DELETE", url, **kwargs)
+
+    async def create_meeting(self, user_id: str, data: Any, **kwargs: Any):
+        return await self.post(
+            urljoin(self.url, f"v2/users/{user_id}/meetings"),
+            data=data,
+            endpoint="create",
+            **kwargs,
+        )
+
+    async def get_meeting(self, meeting_id: int, data: Any, **kwargs: Any):
+        return await self.get(
+            urljoin(self.url, f"v2/meetings/{meeting_id}"),
+            data=data,
+            endpoint="get",
+            **kwargs,
+        )
+
+    async def update_meeting(self, meeting_id: int, data: Any, **kwargs: Any):
+        return await self.patch(
+            urljoin(self.url, f"v2/meetings/{meeting_id}"),
+            data=data,
+            endpoint="update",
+            **kwargs,
+        )
+
+    async def delete_meeting(self, meeting_id: int, data: Any, **kwargs: Any):
+        return await self.delete(
+            urljoin(self.url, f"v2/meetings/{meeting_id}"),
+            data=data,
+            endpoint="delete",
+            **kwargs,
         )
@@ -40,10 +40,16 @@ INSTALLED_APPS += [
     "zapip",
 ]
 
+# Keep every middleware async-capable, or Django runs the chain above a
+# sync-only one in a worker thread under ASGI.
 MIDDLEWARE = [
-    "log_request_id.middleware.RequestIDMiddleware",
+    "zapip.middleware.RequestIDMiddleware",
+    "zapip.middleware.AccessLogMiddleware",
+    "zapip.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Everything below is skipped for ZAPIP_LEAN_PATH_PREFIXES
+    "zapip.middleware.LeanRouteMiddleware",
+    "zapip.middleware.StaticFilesMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -79,6 +85,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "zapipsite.wsgi.application"
+ASGI_APPLICATION = "zapipsite.asgi.application"
 
 
 # Database
@@ -91,6 +98,51 @@ DATABASES = {
     }
 }
 
+# PostgreSQL is used when POSTGRES_DB is set, otherwise SQLite (e.g. for tests
+# and local development).
+#
+# Connections are kept open for POSTGRES_CONN_MAX_AGE seconds and checked
+# before being reused, so connecting is not part of request latency.
+# Statements running longer than POSTGRES_STATEMENT_TIMEOUT milliseconds are
+# cancelled, so a slow query cannot stall the proxy. Set the timeouts on the
+# database role instead when connecting through a pooler in transaction mode,
+# which does not accept startup options.
+#
+# POSTGRES_POOL_MAX_SIZE > 0 enables Django's in-process connection pool
+# instead of persistent connections. This needs Django 5.1+ with psycopg 3
+# (`pip install "psycopg[binary,pool]"`); the pool is shared by the threads of
+# a process, which suits ASGI deployments where requests hop threads.
+if os.getenv("POSTGRES_DB"):
+    POSTGRES_POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX_SIZE", default="0"))
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_DB"),
+        "USER": os.getenv("POSTGRES_USER", default=""),
+        "PASSWORD": os.getenv("POSTGRES_PASSWORD", default=""),
+        "HOST": os.getenv("POSTGRES_HOST", default=""),
+        "PORT": os.getenv("POSTGRES_PORT", default=""),
+        "CONN_MAX_AGE": (
+            0
+            if POSTGRES_POOL_MAX_SIZE
+            else int(os.getenv("POSTGRES_CONN_MAX_AGE", default="600"))
+        ),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "connect_timeout": int(os.getenv("POSTGRES_CONNECT_TIMEOUT", default="5")),
+            "options": "-c statement_timeout={} -c idle_in_transaction_session_timeout={}".format(
+                int(os.getenv("POSTGRES_STATEMENT_TIMEOUT", default="5000")),
+                int(os.getenv("POSTGRES_IDLE_IN_TRANSACTION_TIMEOUT", default="30000")),
+            ),
+        },
+    }
+    if POSTGRES_POOL_MAX_SIZE:
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("POSTGRES_POOL_MIN_SIZE", default="1")),
+            "max_size": POSTGRES_POOL_MAX_SIZE,
+            # seconds to wait for a free connection
+            "timeout": float(os.getenv("POSTGRES_POOL_TIMEOUT", default="5")),
+        }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -143,22 +195,34 @@ if DEBUG:
 # Override this to DEBUG locally for super verbose logging
 DJANGO_LOG_LEVEL = "INFO"
 
+# Formatter of log records: "json" for one JSON object per line, with extra
+# fields like those of access records as keys, or "verbose" for plain text.
+LOG_FORMATTER = "json"
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
-    "filters": {"request_id": {"()": "log_request_id.filters.RequestIDFilter"}},
+    "filters": {
+        "request_id": {"()": "log_request_id.filters.RequestIDFilter"},
+        "sample_success": {"()": "zapip.log.SampleSuccessFilter"},
+    },
     "formatters": {
         # see full list of attributes here:
         # https://docs.python.org/3/library/logging.html#logrecord-attributes
         "verbose": {
             "format": "%(asctime)s [%(threadName)s] [%(levelname)s] [%(name)s] [%(request_id)s] %(message)s"
         },
+        "json": {
+            "()": "pythonjsonlogger.jsonlogger.JsonFormatter",
+            "format": "%(asctime)s %(threadName)s %(levelname)s %(name)s %(request_id)s %(message)s",
+        },
     },
     "handlers": {
+        # formats and writes records in a background thread
         "console": {
-            "formatter": "verbose",
+            "formatter": LOG_FORMATTER,
             "filters": ["request_id"],
-            "class": "logging.StreamHandler",
+            "class": "zapip.log.QueueStreamHandler",
         },
     },
     "loggers": {
@@ -167,6 +231,12 @@ LOGGING = {
             "level": DJANGO_LOG_LEVEL,
             "propagate": False,
         },
+        "zapip.access": {
+            "handlers": ["console"],
+            "filters": ["sample_success"],
+            "level": "INFO",
+            "propagate": False,
+        },
         "": {
             "handlers": ["console"],
             "level": LOG_LEVEL,
@@ -203,6 +273,202 @@ GATEWAY_SUBSCRIPTION_ID_HEADER = "X-Api-Subscription"
 ZOOM_API_BASE_URL = "https://zoom.example.com/"
 ZOOM_API_HEADERS = {"X-Gravitee-Api-Key": "foo"}
 
+# Server-to-Server OAuth, for calling Zoom directly. With OAUTH_CLIENT_ID set,
+# an access token for OAUTH_ACCOUNT_ID is fetched from OAUTH_TOKEN_URL and sent
+# as a Bearer token on every call, along with ZOOM_API_HEADERS. It is renewed in
+# the background OAUTH_REFRESH_MARGIN seconds before it expires. Workers share
+# tokens, and fetch one at a time, through the Django cache named
+# OAUTH_CACHE_ALIAS, which must then be shared by them (e.g. a FileBasedCache,
+# DatabaseCache or Redis).
+ZOOM_API_OAUTH_ACCOUNT_ID: Optional[str] = None
+ZOOM_API_OAUTH_CLIENT_ID: Optional[str] = None
+ZOOM_API_OAUTH_CLIENT_SECRET: Optional[str] = None
+ZOOM_API_OAUTH_TOKEN_URL = "https://zoom.us/oauth/token"
+ZOOM_API_OAUTH_REFRESH_MARGIN = 300
+ZOOM_API_OAUTH_CACHE_ALIAS = "default"
+
+# Connection pool for the Zoom client, shared by all threads in a process.
+# POOL_CONNECTIONS is the number of hosts to keep pools for, POOL_MAXSIZE the
+# number of connections kept open per host. With POOL_BLOCK, threads wait for a
+# free connection instead of opening extra, non-pooled ones. POOL_KEEPALIVE
+# enables TCP keep-alive on pooled connections.
+ZOOM_API_POOL_CONNECTIONS = 4
+ZOOM_API_POOL_MAXSIZE = 10
+ZOOM_API_POOL_BLOCK = False
+ZOOM_API_POOL_KEEPALIVE = True
+
+# Connection pool for the async Zoom client, shared by all tasks in a process.
+ZOOM_API_ASYNC_MAX_CONNECTIONS = 1000
+ZOOM_API_ASYNC_MAX_KEEPALIVE_CONNECTIONS = 100
+
+# Client-side rate limiting of calls to Zoom, as (requests per second, burst)
+# per endpoint class. Defaults follow Zoom's rate limit categories: creating a
+# meeting is "Medium", the other meeting calls are "Light". Rates are adjusted
+# to the X-RateLimit-* headers Zoom returns, and a 429 pauses the endpoint for
+# its Retry-After. Calls are queued for up to RATE_LIMIT_MAX_WAIT seconds;
+# beyond that Zapip responds with 429 itself.
+ZOOM_API_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "create": (20, 20),
+    "get": (30, 30),
+    "update": (30, 30),
+    "delete": (30, 30),
+}
+ZOOM_API_RATE_LIMIT_MAX_WAIT = 1.0
+
+# Timeouts in seconds for connecting to Zoom and for each read from it.
+ZOOM_API_CONNECT_TIMEOUT = 3.05
+ZOOM_API_READ_TIMEOUT = 20
+
+# Idempotent calls (GET, DELETE) are retried this many times on connection
+# errors and 5xx responses, waiting a random time of up to
+# RETRY_BACKOFF * 2^attempt seconds, capped at RETRY_BACKOFF_MAX.
+ZOOM_API_RETRIES = 2
+ZOOM_API_RETRY_BACKOFF = 0.2
+ZOOM_API_RETRY_BACKOFF_MAX = 2.0
+
+# After CIRCUIT_BREAKER_THRESHOLD consecutive failed calls, Zapip stops calling
+# Zoom and responds with 503, until a trial call after
+# CIRCUIT_BREAKER_RESET_TIMEOUT seconds succeeds. 0 disables the breaker.
+ZOOM_API_CIRCUIT_BREAKER_THRESHOLD = 5
+ZOOM_API_CIRCUIT_BREAKER_RESET_TIMEOUT = 30
+
+# In-process cache of Application rows, keyed by gateway application id.
+# Entries are invalidated in the process that saves or deletes an
+# Application; other processes see the change after at most TTL seconds.
+ZAPIP_APPLICATION_CACHE_SIZE = 1024
+ZAPIP_APPLICATION_CACHE_TTL = 300
+
+# In-process cache of meeting ownership (meeting_id -> application id), used
+# to authorize GET/PATCH/DELETE without a database query.
+ZAPIP_MEETING_OWNER_CACHE_SIZE = 100000
+ZAPIP_MEETING_OWNER_CACHE_TTL = 3600
+
+# Pass Zoom response bodies on to clients as they arrive, instead of reading
+# them into memory first. Streaming from the async views needs Django 4.2+.
+ZAPIP_STREAM_RESPONSES = False
+ZAPIP_STREAM_CHUNK_SIZE = 64 * 1024
+
+# Pass POST and PATCH bodies on to Zoom as they are read from the client,
+# instead of reading them into memory first. Bodies of more than
+# MAX_REQUEST_BODY_SIZE bytes are refused with 413 before calling Zoom; those
+# without a Content-Length are read into memory up to that size. When not
+# streaming, bodies are limited by Django's DATA_UPLOAD_MAX_MEMORY_SIZE.
+ZAPIP_STREAM_REQUESTS = False
+ZAPIP_MAX_REQUEST_BODY_SIZE = 2621440
+
+# Opt-in caching of Zoom responses, in the Django cache named by
+# ZAPIP_RESPONSE_CACHE_ALIAS. ZAPIP_RESPONSE_CACHE_TTLS maps endpoints to the
+# number of seconds a successful response is kept; only "get_meeting"
+# (GET /meetings/{meetingId}) is supported. A successful PATCH or DELETE of
+# the meeting invalidates its entries.
+ZAPIP_RESPONSE_CACHE_ALIAS = "default"
+ZAPIP_RESPONSE_CACHE_TTLS: Dict[str, int] = {}
+
+# Fraction of access records of successful requests which are logged, to
+# bound logging overhead at high volume. Failed requests are always logged.
+ZAPIP_ACCESS_LOG_SAMPLE_RATE = 1.0
+
+# Default limits per application on the views calling Zoom, per process, see
+# zapip.limits. Fields on the Application override them, None is unlimited.
+# MAX_CONCURRENCY is the number of requests handled at the same time, beyond
+# which up to QUEUE_SIZE requests wait for at most QUEUE_TIMEOUT seconds
+# before 429 is returned. RATE_LIMIT is in requests per second, with bursts
+# of RATE_BURST requests, by default one second's worth.
+ZAPIP_APPLICATION_MAX_CONCURRENCY: Optional[int] = None
+ZAPIP_APPLICATION_QUEUE_SIZE = 10
+ZAPIP_APPLICATION_QUEUE_TIMEOUT = 1.0
+ZAPIP_APPLICATION_RATE_LIMIT: Optional[float] = None
+ZAPIP_APPLICATION_RATE_BURST: Optional[int] = None
+
+# Compress responses read into memory for clients accepting brotli or gzip,
+# if at least COMPRESS_MIN_SIZE bytes, see zapip.compression. Streamed
+# responses are relayed compressed as Zoom sent them if the client accepts it.
+ZAPIP_COMPRESS_RESPONSES = True
+ZAPIP_COMPRESS_MIN_SIZE = 1024
+ZAPIP_COMPRESS_GZIP_LEVEL = 6
+ZAPIP_COMPRESS_BROTLI_QUALITY = 4
+
+# Zoom webhook receiver at /zoom/webhooks, see zapip.webhooks. Set
+# ZOOM_WEBHOOK_SECRET_TOKEN to the secret token of the Zoom app sending meeting
+# events, None disables the receiver. Events signed more than MAX_AGE seconds
+# ago are refused. Events are applied in batches of BATCH_SIZE every INTERVAL
+# seconds, 0 applies them while Zoom waits. FORWARD_TIMEOUT is the timeout in
+# seconds of forwarding events to the webhook_url of applications.
+ZOOM_WEBHOOK_SECRET_TOKEN: Optional[str] = None
+ZAPIP_WEBHOOK_MAX_AGE = 300
+ZAPIP_WEBHOOK_BATCH_SIZE = 100
+ZAPIP_WEBHOOK_INTERVAL = 1.0
+ZAPIP_WEBHOOK_FORWARD_TIMEOUT = 5.0
+
+# Retention of meeting records, enforced by the purge_meetings command.
+# Meetings are purged MEETING_RETENTION_DAYS after creation, unless their
+# application sets its own retention_days, None keeps them. Meetings deleted
+# in Zoom are purged DELETED_MEETING_RETENTION_DAYS after deletion.
+# PURGE_BATCH_SIZE is the number of rows deleted per transaction.
+ZAPIP_MEETING_RETENTION_DAYS: Optional[int] = None
+ZAPIP_DELETED_MEETING_RETENTION_DAYS: Optional[int] = 30
+ZAPIP_PURGE_BATCH_SIZE = 1000
+
+# Coalesce identical concurrent GET /meetings/{meetingId} calls to Zoom, so
+# requests arriving while one is in flight share its response. None disables,
+# "process" coalesces within a worker, "shared" also across workers through a
+# lock in the Django cache named by COALESCE_CACHE_ALIAS, which must then be
+# shared by all workers (e.g. Redis or Memcached). COALESCE_TIMEOUT is how
+# long, in seconds, the lock is held at most and other workers wait for it.
+ZAPIP_COALESCE_READS: Optional[str] = None
+ZAPIP_COALESCE_CACHE_ALIAS = "default"
+ZAPIP_COALESCE_TIMEOUT = 10.0
+
+# Optional mirror of meeting details, stored with each ZoomMeeting. Proxied
+# GET /meetings/{meetingId} responses and `manage.py sync_meeting_mirror`
+# refresh it, a successful PATCH or DELETE clears it. GETs without query
+# parameters are served from the mirror if the client sends
+# `X-Zapip-Accept-Stale: <seconds>` and the mirror is at most that old, capped
+# at MEETING_MIRROR_MAX_STALE seconds.
+ZAPIP_MEETING_MIRROR = False
+ZAPIP_MEETING_MIRROR_MAX_STALE = 3600
+
+# Write-behind of new meetings. When enabled, the create endpoints append new
+# meetings to a local SQLite journal (WAL mode, fsynced) at
+# WRITE_BEHIND_JOURNAL instead of inserting them while the client waits. A
+# thread in each process moves them into the database in batches of
+# WRITE_BEHIND_BATCH_SIZE every WRITE_BEHIND_INTERVAL seconds. With an interval
+# of 0, run `manage.py flush_meeting_journal` instead, e.g. from cron. All
+# processes of a host must share the journal; processes on other hosts only
+# see a meeting once it is flushed.
+ZAPIP_WRITE_BEHIND = False
+ZAPIP_WRITE_BEHIND_JOURNAL = os.path.join(BASE_DIR, "meeting-journal.sqlite3")
+ZAPIP_WRITE_BEHIND_BATCH_SIZE = 500
+ZAPIP_WRITE_BEHIND_INTERVAL = 1.0
+
+# POST /zoom/v2/batch accepts up to BATCH_MAX_OPERATIONS operations, and
+# runs at most BATCH_CONCURRENCY upstream calls at a time per batch. Keep
+# BATCH_CONCURRENCY at or below ZOOM_API_POOL_MAXSIZE, so batches reuse
+# pooled connections.
+ZAPIP_BATCH_MAX_OPERATIONS = 100
+ZAPIP_BATCH_CONCURRENCY = 8
+
+# Paths whose views are called without the session, auth, CSRF, static file
+# and clickjacking middleware. Only list routes which authenticate through
+# headers and never use sessions.
+ZAPIP_LEAN_PATH_PREFIXES: List[str] = ["/zoom/", "/internal/"]
+
+# Clients allowed to read /internal/metrics. None allows everyone.
+ZAPIP_METRICS_ALLOWED_IPS: Optional[List[str]] = ["127.0.0.1", "::1"]
+
+# Behind a reverse proxy REMOTE_ADDR is the proxy's own address, so the
+# allowlist above is checked against this request.META header instead, such
+# as "HTTP_X_FORWARDED_FOR". Of a comma-separated list the last address, the
+# one added by the proxy, is used. Requests without the header, which have
+# connected to the app directly, are checked by REMOTE_ADDR. Only set this
+# when the proxy always sets the header; None checks REMOTE_ADDR alone, which
+# only works when clients connect to the app directly.
+ZAPIP_METRICS_CLIENT_IP_HEADER: Optional[str] = None
+
+# Serve the proxy routes with the native async views. Enabled by
+# zapipsite.asgi, since async views only pay off under an ASGI server.
+ZAPIP_ASYNC_VIEWS = os.getenv("ZAPIP_ASYNC_VIEWS", default="") == "1"
+
 # Request ID headers
 LOG_REQUEST_ID_HEADER = "HTTP_X_GRAVITEE_TRANSACTION_ID"
 REQUEST_ID_RESPONSE_HEADER = "X-Zapip-Response-For"
@@ -15,6 +15,7 @@ DEBUG = False
 # https://docs.djangoproject.com/en/3.1/topics/security/#ssl-https
 SECURE_SSL_REDIRECT = True
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+ZAPIP_METRICS_CLIENT_IP_HEADER = "HTTP_X_FORWARDED_FOR"
 SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 ALLOWED_HOSTS = (